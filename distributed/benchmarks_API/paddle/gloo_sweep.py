@@ -0,0 +1,269 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+"""
+gloo_sweep: CPU + gloo 多进程通信benchmark, 对config.yaml中的各个通信API及配置遍历消息大小
+用法: python gloo_sweep.py --nprocs 4 --apis all_reduce,broadcast --min_bytes 8 --max_bytes 268435456
+结果格式与GPU测试一致: {case_name: {size: {"time", "algbw", "busbw"}}}, 写入mylog/log_gloo
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import yaml
+
+import paddle
+import paddle.distributed as dist
+
+api_list = [
+    "all_gather",
+    "all_reduce",
+    "alltoall",
+    "broadcast",
+    "send_recv",
+    "reduce",
+    "reduce_scatter",
+    "scatter",
+]
+
+# 与nccl-tests一致, busbw = algbw * factor, 反映实际链路带宽, 可以跨进程数比较
+bus_factor = {
+    "all_gather": lambda n: (n - 1) / n,
+    "all_reduce": lambda n: 2 * (n - 1) / n,
+    "alltoall": lambda n: (n - 1) / n,
+    "broadcast": lambda n: 1,
+    "send_recv": lambda n: 1,
+    "reduce": lambda n: 1,
+    "reduce_scatter": lambda n: (n - 1) / n,
+    "scatter": lambda n: (n - 1) / n,
+}
+
+
+def size_name(b):
+    """消息大小的展示名称"""
+    if b < 1024:
+        return str(b) + "B"
+    elif b < 1048576:  # 1MB
+        return str(b // 1024) + "KB"
+    else:
+        return str(b // 1024 // 1024) + "MB"
+
+
+def numpy_tensor(n_ele, value):
+    """直接由numpy分配buffer, 避免python list构造tensor"""
+    return paddle.to_tensor(np.full([n_ele], value, dtype="float32"))
+
+
+def build_op(api, config, b, rank, nranks):
+    """
+    构造单次通信调用
+    :param b: 消息大小(字节), 对all_gather是输出总大小, 对reduce_scatter/alltoall/scatter是输入总大小
+    :return: op() -> task or None
+    """
+    is_legacy = config["is_legacy"]
+    sync_op = config["sync_op"]
+    use_calc_stream = config["use_calc_stream"]
+    is_tensor = config.get("is_tensor", False)
+    # 每个rank的分块元素数, 至少1个元素
+    chunk = max(1, b // 4 // nranks)
+    # 与GPU测试一致以rank 1为src, 单进程时只有rank 0
+    src_rank = 1 if nranks >= 2 else 0
+
+    if api == "all_reduce":
+        data = numpy_tensor(chunk * nranks, rank)
+        if is_legacy:
+            return lambda: dist.all_reduce(data)
+        return lambda: dist.stream.all_reduce(data, sync_op=sync_op, use_calc_stream=use_calc_stream)
+    elif api == "broadcast":
+        data = numpy_tensor(chunk * nranks, rank)
+        if is_legacy:
+            return lambda: dist.broadcast(data, src=src_rank)
+        return lambda: dist.stream.broadcast(data, src=src_rank, sync_op=sync_op, use_calc_stream=use_calc_stream)
+    elif api == "reduce":
+        data = numpy_tensor(chunk * nranks, rank)
+        if is_legacy:
+            return lambda: dist.reduce(data, dst=0)
+        return lambda: dist.stream.reduce(data, dst=0, sync_op=sync_op, use_calc_stream=use_calc_stream)
+    elif api == "all_gather":
+        data = numpy_tensor(chunk, rank)
+        if is_legacy:
+            tensor_list = [numpy_tensor(chunk, 0) for i in range(nranks)]
+            return lambda: dist.all_gather(tensor_list, data, sync_op=sync_op)
+        out = numpy_tensor(chunk * nranks, 0) if is_tensor else [numpy_tensor(chunk, 0) for i in range(nranks)]
+        return lambda: dist.stream.all_gather(out, data, sync_op=sync_op, use_calc_stream=use_calc_stream)
+    elif api == "reduce_scatter":
+        data = numpy_tensor(chunk, rank)
+        if is_legacy:
+            tensor_list = [numpy_tensor(chunk, rank) for i in range(nranks)]
+            return lambda: dist.reduce_scatter(data, tensor_list, sync_op=sync_op)
+        src = numpy_tensor(chunk * nranks, rank) if is_tensor else [numpy_tensor(chunk, rank) for i in range(nranks)]
+        return lambda: dist.stream.reduce_scatter(data, src, sync_op=sync_op, use_calc_stream=use_calc_stream)
+    elif api == "scatter":
+        data = numpy_tensor(chunk, rank)
+        if is_legacy:
+            tensor_list = [numpy_tensor(chunk, rank) for i in range(nranks)]
+            return lambda: dist.scatter(data, tensor_list, src=src_rank)
+        src = numpy_tensor(chunk * nranks, rank) if is_tensor else [numpy_tensor(chunk, rank) for i in range(nranks)]
+        return lambda: dist.stream.scatter(data, src, src=src_rank, sync_op=sync_op, use_calc_stream=use_calc_stream)
+    elif api == "alltoall":
+        if is_legacy:
+            tensor_list = [numpy_tensor(chunk, rank) for i in range(nranks)]
+            # 输出list每次重新创建, 避免多轮调用时不断extend
+            return lambda: dist.alltoall(tensor_list, [], sync_op=sync_op)
+        if is_tensor:
+            tensor = numpy_tensor(chunk * nranks, rank)
+            out_tensor = numpy_tensor(chunk * nranks, 0)
+            return lambda: dist.stream.alltoall(out_tensor, tensor, sync_op=sync_op, use_calc_stream=use_calc_stream)
+        tensor_list = [numpy_tensor(chunk, rank) for i in range(nranks)]
+        out_tensor_list = [numpy_tensor(chunk, 0) for i in range(nranks)]
+        return lambda: dist.stream.alltoall(
+            out_tensor_list, tensor_list, sync_op=sync_op, use_calc_stream=use_calc_stream
+        )
+    elif api == "send_recv":
+        data = numpy_tensor(chunk * nranks, rank)
+        if rank == nranks - 1 and nranks % 2 == 1:  # 奇数进程时最后一个rank不参与
+            return lambda: None
+        if is_legacy:
+            if rank % 2 == 0:
+                return lambda: dist.send(data, dst=rank + 1, sync_op=sync_op)
+            return lambda: dist.recv(data, src=rank - 1, sync_op=sync_op)
+        if rank % 2 == 0:
+            return lambda: dist.stream.send(data, dst=rank + 1, sync_op=sync_op, use_calc_stream=use_calc_stream)
+        return lambda: dist.stream.recv(data, src=rank - 1, sync_op=sync_op, use_calc_stream=use_calc_stream)
+    raise Exception(f"{api} not support in gloo sweep")
+
+
+def timed_run(op, warms, epochs):
+    """
+    计时, 异步调用返回的task统一在计时结束前wait
+    :return: epochs轮总耗时(秒)
+    """
+    for i in range(warms):
+        task = op()
+        if task is not None:
+            task.wait()
+    dist.barrier()
+    start = time.perf_counter()
+    tasks = []
+    for i in range(epochs):
+        task = op()
+        if task is not None:
+            tasks.append(task)
+    for task in tasks:
+        task.wait()
+    return time.perf_counter() - start
+
+
+def sync_max(*values):
+    """各rank取最大值"""
+    status = paddle.to_tensor(np.array(values, dtype="float64"))
+    dist.all_reduce(status, op=dist.ReduceOp.MAX)
+    return status.numpy()
+
+
+def get_res(api, case_name, config, byte_to_test, args):
+    """
+    单个case遍历全部消息大小, 耗时取各rank最大值
+    构造通信调用(分配buffer, 参数检查)失败时各rank一致地停止该case, 不影响其他case.
+    通信调用执行过程中某个rank出错时, 其余rank已阻塞在该次通信中, 无法恢复, 只能等待gloo超时退出
+    :return: (结果dict, 出错的消息大小or None)
+    """
+    rank = dist.get_rank()
+    nranks = dist.get_world_size()
+    time_list = {case_name: {}}
+    for b in byte_to_test:
+        # 小消息多跑几轮, 使计时远大于timer精度
+        epochs = int(min(args.max_epochs, max(args.min_epochs, args.bytes_per_case // b)))
+        warms = max(1, epochs // 5)
+        try:
+            op, failed = build_op(api, config, b, rank, nranks), 0.0
+        except Exception as e:
+            print(f"[rank {rank}] {case_name} {size_name(b)} build failed: {e!r}")
+            op, failed = None, 1.0
+        # 计时前同步构造是否失败, 保证所有rank一致地跳过, 不会有rank单独进入通信而阻塞
+        if sync_max(failed)[0] > 0:
+            return time_list, b
+        try:
+            cost, failed = timed_run(op, warms, epochs), 0.0
+        except Exception as e:
+            print(f"[rank {rank}] {case_name} {size_name(b)} failed: {e!r}")
+            cost, failed = 0.0, 1.0
+        # 通信发起前抛出的异常(例如参数检查)同步后各rank一致地停止该case
+        cost, failed = sync_max(cost, failed)
+        if failed > 0:
+            return time_list, b
+        cost = float(cost) / epochs
+        # 小消息时按分块取整后的实际字节数计算带宽
+        algbw = max(1, b // 4 // nranks) * nranks * 4 / 1_000_000_000 / cost
+        time_list[case_name][size_name(b)] = {
+            "time": cost,
+            "algbw": algbw,
+            "busbw": algbw * bus_factor[api](nranks),
+        }
+    return time_list, None
+
+
+def worker(args):
+    """单个进程: 依次执行所有API的所有配置"""
+    paddle.set_device("cpu")
+    dist.init_parallel_env()
+    rank = dist.get_rank()
+
+    with open("config.yaml", "rb") as f:
+        yaml_config = yaml.load(f, Loader=yaml.FullLoader)
+
+    byte_to_test = []
+    b = args.min_bytes
+    while b <= args.max_bytes:
+        byte_to_test.append(b)
+        b *= 2
+
+    for api in args.apis:
+        for case_name, config in yaml_config[api].items():
+            if args.case_name is not None and case_name != args.case_name:
+                continue
+            if config["use_calc_stream"] and not config["is_legacy"]:
+                # use_calc_stream仅对GPU计算流有效, gloo下跳过
+                continue
+            res, failed_bytes = get_res(api, case_name, config, byte_to_test, args)
+            if not res[case_name]:
+                if rank == 0:
+                    # 最小消息即失败, 视为gloo不支持该API的此配置
+                    print(f"{case_name} is not supported by gloo backend, skip")
+                continue
+            if failed_bytes is not None and rank == 0:
+                print(f"{case_name} failed at {size_name(failed_bytes)}, skip the larger sizes")
+            if rank == 0:
+                print(config["desc"])
+                for num, item in res[case_name].items():
+                    print(
+                        f"{case_name:<48}{num:>8}  time: {item['time'] * 1e6:>12.2f} us"
+                        f"  algbw: {item['algbw']:>8.3f} GB/s  busbw: {item['busbw']:>8.3f} GB/s"
+                    )
+                with open("mylog/log_gloo", "a", encoding="utf8") as f:
+                    f.write(str(res) + "\n")
+                    f.flush()
+
+
+def main():
+    """main"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nprocs", type=int, default=4, help="本地进程数")
+    parser.add_argument("--apis", default=",".join(api_list), help="逗号分隔的API列表")
+    parser.add_argument("--case_name", default=None, help="只执行config.yaml中的某个配置")
+    parser.add_argument("--min_bytes", type=int, default=8)
+    parser.add_argument("--max_bytes", type=int, default=268435456)  # 256MB
+    parser.add_argument("--min_epochs", type=int, default=5)
+    parser.add_argument("--max_epochs", type=int, default=1000)
+    parser.add_argument("--bytes_per_case", type=int, default=1073741824, help="每个消息大小的目标通信总量, 用于确定执行轮数")
+    args = parser.parse_args()
+    args.apis = [api for api in args.apis.split(",") if api]
+    for api in args.apis:
+        assert api in api_list, f"{api} not support in gloo sweep, support: {api_list}"
+
+    os.makedirs("mylog", exist_ok=True)
+    dist.spawn(worker, args=(args,), nprocs=args.nprocs, backend="gloo")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ linalg test base class
 """
 from inspect import isfunction
 import copy
+from collections import OrderedDict
 import logging
 import pytest
 import numpy as np
@@ -49,7 +50,14 @@ class APIBase(object):
         # calculate grad delta, You can rewrite these value
         self.delta = 1e-6
         self.gap = 0.001
+        # batched numeric grad, set batch_grad=False in hook if the api mixes samples along axis 0
+        self.batch_grad = True
+        self.grad_chunk = 128
         self.rtol = 1e-7
+        # cache built static programs, set static_cache=False in hook if the api graph depends on input values
+        self.static_cache = True
+        self.static_cache_size = 16
+        self._static_programs = OrderedDict()
         # choose layertypes [functional or classional]
         self._layertypes(func)
         # run hook, use user define vars and initials
@@ -484,6 +492,10 @@ class APIBase(object):
         if data is None:
             for k, v in self.kwargs.items():
                 if isinstance(v, paddle.Tensor):
+                    batch_grad = self._batch_numeric_grad(k)
+                    if batch_grad is not None:
+                        numeric_grad[k] = batch_grad
+                        continue
                     grad = []
                     shape = v.numpy().shape
                     for i in range(len(v.numpy().flatten())):
@@ -503,6 +515,11 @@ class APIBase(object):
                         self.kwargs[k] = v
                     numeric_grad[k] = np.array(grad).reshape(shape)
         else:
+            batch_grad = self._batch_numeric_grad("data")
+            if batch_grad is not None:
+                numeric_grad["data"] = batch_grad
+                paddle.enable_static()
+                return numeric_grad
             # change data to correct dtype
             data = data.astype(self.dtype)
             grad = []
@@ -524,6 +541,93 @@ class APIBase(object):
         paddle.enable_static()
         return numeric_grad
 
+    def _batch_numeric_grad(self, key):
+        """batched central difference numeric grad
+
+        perturbed copies of input `key` are concatenated along axis 0 and evaluated self.grad_chunk
+        elements per forward, only valid when the api is elementwise or batch-separable along axis 0.
+
+        Args:
+            key (str): [kwargs name of the input, "data" for class layer input]
+
+        Returns:
+            numpy grad with the same shape as input, None if the api is not batch-separable
+        """
+        if not self.batch_grad:
+            return None
+        value = self.data if key == "data" else self.kwargs[key]
+        value = value.numpy().astype(self.dtype)
+        if value.ndim == 0 or value.size < 2:
+            return None
+        flat = value.flatten()
+        numel = flat.size
+        # bound the batched input to about 4M elements
+        chunk = max(1, min(int(self.grad_chunk), 2**22 // numel))
+        grad = np.zeros(numel, dtype=np.float64)
+        # sentinel copies: the first is the input itself, the last is the reversed input, so that
+        # reorder (flip, roll) or mix (cumsum, batch norm) between copies along axis 0 changes their outputs
+        sentinel = flat[::-1].copy()
+        try:
+            base_out = self._batch_forward(key, value, 1)
+            if base_out.ndim == 0:
+                return None
+            expects = (base_out.numpy(), self._batch_forward(key, sentinel.reshape(value.shape), 1).numpy())
+            for start in range(0, numel, chunk):
+                idx = np.arange(start, min(start + chunk, numel))
+                n = len(idx)
+                batch = np.tile(flat, (2 * n + 2, 1))
+                batch[1 + np.arange(n), idx] += self.gap
+                batch[1 + n + np.arange(n), idx] -= self.gap
+                batch[-1] = sentinel
+                batch = batch.reshape((-1,) + value.shape[1:])
+                out = self._batch_forward(key, batch, 2 * n + 2)
+                if out.shape[0] != (2 * n + 2) * base_out.shape[0] or out.shape[1:] != base_out.shape[1:]:
+                    return None
+                copies = out.numpy().reshape([2 * n + 2] + list(base_out.shape))
+                for copy_out, expect in zip((copies[0], copies[-1]), expects):
+                    if not np.allclose(copy_out, expect, rtol=max(self.rtol, 1e-5), atol=self.delta, equal_nan=True):
+                        return None
+                losses = copies.reshape(2 * n + 2, -1).mean(axis=1)
+                grad[idx] = (losses[1 : 1 + n] - losses[1 + n : 1 + 2 * n]) / (2 * self.gap)
+        except ValueError:
+            # shape mismatch of the concatenated copies (paddle raises InvalidArgument as ValueError),
+            # the api is not batch-separable along axis 0
+            return None
+        # spot check some elements with single perturbation, fall back to per-element loop if mismatch
+        for i in sorted({0, numel // 2, numel - 1}):
+            loss_pair = []
+            for sign in (1, -1):
+                tmp = flat.copy()
+                tmp[i] = tmp[i] + sign * self.gap
+                loss_pair.append(self._batch_forward(key, tmp.reshape(value.shape), 1))
+            g = (paddle.mean(loss_pair[0]).numpy() - paddle.mean(loss_pair[1]).numpy()) / (2 * self.gap)
+            # absolute tolerance scales with the grad, small grads are not hidden by a fixed atol
+            if not np.allclose(grad[i], g, rtol=1e-2, atol=1e-3 * np.abs(grad).max() + self.delta):
+                return None
+        return grad.reshape(value.shape)
+
+    def _batch_forward(self, key, value, copies):
+        """forward with input `key` replaced by value, other inputs sharing axis 0 are tiled `copies` times
+
+        Returns:
+            output tensor
+        """
+        kwargs = dict(self.kwargs)
+        with paddle.no_grad():
+            if self.__layertype == "func":
+                n0 = self.kwargs[key].shape[0]
+                for k, v in self.kwargs.items():
+                    if k != key and copies > 1 and isinstance(v, paddle.Tensor) and v.ndim > 0 and v.shape[0] == n0:
+                        kwargs[k] = paddle.tile(v, [copies] + [1] * (v.ndim - 1))
+                kwargs[key] = to_tensor(value)
+                res = self.func(**kwargs)
+            else:
+                obj = self.func(**kwargs)
+                res = obj(to_tensor(value))
+        if isinstance(res, (list, tuple)):
+            res = res[0]
+        return res
+
     def _numeric_grad(self):
         """
         _numeric_grad
@@ -573,8 +677,58 @@ class APIBase(object):
 
     def _static_forward(self, res, data=None, **kwargs):
         """
-        _static_forward
+        _static_forward, 构建好的program和executor按输入签名缓存, 相同签名再次执行时只喂入新数据
+        """
+        key = self._static_cache_key(data, **kwargs)
+        runner = self._static_programs.get(key) if key is not None else None
+        if runner is None:
+            runner = self._static_build(data, **kwargs)
+            if key is not None:
+                self._static_programs[key] = runner
+                if len(self._static_programs) > self.static_cache_size:
+                    self._static_programs.popitem(last=False)
+        else:
+            self._static_programs.move_to_end(key)
+        return runner(data, **kwargs)
+
+    def _static_cache_key(self, data=None, **kwargs):
+        """
+        static program缓存key: api, place, dtype, 数组输入的shape/dtype以及其余参数取值, 返回None时不缓存
+        组网依赖输入取值的api在hook中设置static_cache=False
+        """
+        if not self.static_cache:
+            return None
+        kwargs_sig = []
+        for k, v in kwargs.items():
+            sig = _static_signature(v, feed=True)
+            if sig is None:
+                return None
+            kwargs_sig.append((k, sig))
+        key = (
+            self.func,
+            self.__layertype,
+            str(self.place),
+            str(self.dtype),
+            self.enable_backward,
+            tuple(self.no_grad_var or []),
+            self.seed,
+            _in_pir_mode(),
+            _static_signature(data, feed=True),
+            tuple(kwargs_sig),
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _static_build(self, data=None, **kwargs):
+        """
+        _static_build, 构建program并执行startup, 返回喂入数据执行的runner
         """
+        scope = paddle.framework.core.Scope()
+        exe = paddle.static.Executor(self.place)
+        enable_backward = self.enable_backward
         if self.__layertype == "func":
             paddle.seed(self.seed)
             main_program = paddle.static.Program()
@@ -582,15 +736,7 @@ class APIBase(object):
             params = copy.deepcopy(kwargs)
             with paddle.utils.unique_name.guard():
                 with paddle.static.program_guard(main_program=main_program, startup_program=startup_program):
-                    # PS:没有单列出一个函数做值传递，因为self.kwargs只有一个，就没单列出来
                     xyz = []
-                    for k, v in kwargs.items():
-                        if isinstance(v, (np.generic, np.ndarray)):
-                            # no_grad_Var不需要转换类型
-                            if self.no_grad_var is not None and k in self.no_grad_var:
-                                kwargs[k] = v
-                            else:
-                                kwargs[k] = v.astype(self.dtype)
                     for k, v in params.items():
                         if isinstance(v, (np.generic, np.ndarray)):
                             # no_grad_Var不需要转换类型
@@ -603,28 +749,32 @@ class APIBase(object):
                             if self.enable_backward is True:
                                 params[k].stop_gradient = False
                     output = self.func(**params)
-                    if self.enable_backward:
+                    fetch_list = [output]
+                    if enable_backward:
                         loss = paddle.mean(output)
                         grad_var = {}
                         for k in xyz:
                             grad_var[k] = paddle.static.gradients(loss, params[k])
-                        exe = paddle.static.Executor(self.place)
-                        exe.run(startup_program)
-                        # print(list(grad_var.values()))
-                        # print([output] + list(grad_var.values()))
-                        res = exe.run(
-                            main_program, feed=kwargs, fetch_list=[output] + list(grad_var.values()), return_numpy=True
-                        )
-                        # combine grad
-                        grad = dict(zip(xyz, res[1:]))
-                        return res[0], grad
-                    else:
-                        exe = paddle.static.Executor(self.place)
-                        exe.run(startup_program)
-                        # print(list(grad_var.values()))
-                        # print([output] + list(grad_var.values()))
-                        res = exe.run(main_program, feed=kwargs, fetch_list=[output], return_numpy=True)
-                        return res[0]
+                        fetch_list += list(grad_var.values())
+            with paddle.static.scope_guard(scope):
+                exe.run(startup_program)
+
+            def runner(data=None, **kwargs):
+                """喂入新数据执行"""
+                paddle.seed(self.seed)
+                for k, v in kwargs.items():
+                    if isinstance(v, (np.generic, np.ndarray)):
+                        # no_grad_Var不需要转换类型
+                        if self.no_grad_var is None or k not in self.no_grad_var:
+                            kwargs[k] = v.astype(self.dtype)
+                with paddle.static.scope_guard(scope):
+                    res = exe.run(main_program, feed=kwargs, fetch_list=fetch_list, return_numpy=True)
+                if enable_backward:
+                    # combine grad
+                    grad = dict(zip(xyz, res[1:]))
+                    return res[0], grad
+                return res[0]
+
         elif self.__layertype == "class":
             main_program = paddle.static.Program()
             startup_program = paddle.static.Program()
@@ -633,14 +783,6 @@ class APIBase(object):
             params = copy.deepcopy(kwargs)
             with paddle.utils.unique_name.guard():
                 with paddle.static.program_guard(main_program=main_program, startup_program=startup_program):
-                    # PS:没有单列出一个函数做值传递，因为self.kwargs只有一个，就没单列出来
-                    for k, v in kwargs.items():
-                        if isinstance(v, (np.generic, np.ndarray)):
-                            # no_grad_Var不需要转换类型
-                            if self.no_grad_var is not None and k in self.no_grad_var:
-                                kwargs[k] = v
-                            else:
-                                kwargs[k] = v.astype(self.dtype)
                     for k, v in params.items():
                         if isinstance(v, (np.generic, np.ndarray)):
                             # no_grad_Var不需要转换类型
@@ -652,26 +794,62 @@ class APIBase(object):
                             if self.enable_backward is True:
                                 params[k].stop_gradient = False
                     if data is not None:
-                        data = data.astype(self.dtype)
                         self.data = paddle.static.data(name="data", shape=data.shape, dtype=self.dtype)
                         if self.enable_backward is True:
                             self.data.stop_gradient = False
-                    data = dict({"data": data}, **kwargs)
+                    data_var = self.data
                     obj = self.func(**params)
-                    output = obj(self.data)
-                    if self.enable_backward:
+                    output = obj(data_var)
+                    fetch_list = [output]
+                    if enable_backward:
                         loss = paddle.mean(output)
-                        g = paddle.static.gradients(loss, self.data)
-                        exe = paddle.static.Executor(self.place)
-                        exe.run(startup_program)
-                        res = exe.run(main_program, feed=data, fetch_list=[output, g], return_numpy=True)
-                        grad = {"data": res[1]}
-                        return res[0], grad
-                    else:
-                        exe = paddle.static.Executor(self.place)
-                        exe.run(startup_program)
-                        res = exe.run(main_program, feed=data, fetch_list=[output], return_numpy=True)
-                        return res[0]
+                        fetch_list.append(paddle.static.gradients(loss, data_var))
+            with paddle.static.scope_guard(scope):
+                exe.run(startup_program)
+
+            def runner(data=None, **kwargs):
+                """喂入新数据执行"""
+                for k, v in kwargs.items():
+                    if isinstance(v, (np.generic, np.ndarray)):
+                        # no_grad_Var不需要转换类型
+                        if self.no_grad_var is None or k not in self.no_grad_var:
+                            kwargs[k] = v.astype(self.dtype)
+                if data is not None:
+                    data = data.astype(self.dtype)
+                self.data = data_var
+                feed = dict({"data": data}, **kwargs)
+                with paddle.static.scope_guard(scope):
+                    res = exe.run(main_program, feed=feed, fetch_list=fetch_list, return_numpy=True)
+                if enable_backward:
+                    grad = {"data": res[1]}
+                    return res[0], grad
+                return res[0]
+
+        return runner
+
+
+def _static_signature(value, feed=False):
+    """
+    static program缓存使用的参数签名, 作为feed输入的数组只记录shape和dtype, 其余参数记录取值
+    非feed的数组会作为常量固化在program中, 与无法识别的参数一样返回None, 不缓存
+    """
+    if isinstance(value, (np.generic, np.ndarray)):
+        return ("array", value.shape, str(value.dtype)) if feed else None
+    if value is None or isinstance(value, (bool, int, float, str, np.dtype, type, paddle.dtype)):
+        return (type(value).__name__, value)
+    if isinstance(value, (list, tuple)):
+        sig = tuple(_static_signature(i) for i in value)
+        return None if None in sig else (type(value).__name__, sig)
+    if isinstance(value, dict):
+        sig = tuple((k, _static_signature(v)) for k, v in value.items())
+        return None if None in [v for _, v in sig] else ("dict", sig)
+    return None
+
+
+def _in_pir_mode():
+    """当前是否为pir模式, 不同模式下构建的program不能复用"""
+    in_pir_mode = getattr(paddle.framework, "in_pir_mode", None)
+    return in_pir_mode() if in_pir_mode is not None else False
 
 
 def compare_grad(result, expect, delta=1e-6, rtol=0.001, mode=None, no_grad_var=None):
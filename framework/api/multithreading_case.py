@@ -17,7 +17,11 @@ parallel execute cases in paddle ci
 import re
 import time
 import queue
+import signal
 import threading
+import traceback
+import importlib
+import collections
 import os
 import json
 import sys
@@ -26,6 +30,14 @@ taskQueue = queue.Queue()
 lock = threading.RLock()
 
 failed_ce_case_list = []
+# fork: import paddle once in parent, then fork a child per case file; system: python -m pytest per case file
+executor = os.environ.get("CE_EXECUTOR", "fork" if hasattr(os, "fork") else "system")
+# per case file timeout in seconds for fork executor, 0 means no timeout
+case_timeout = float(os.environ.get("CE_CASE_TIMEOUT", "0"))
+worker_num = 13
+max_retry = 3
+# modules imported by parent process, forked children reuse them
+preload_modules = ["numpy", "scipy", "pytest", "paddle", "apibase"]
 ignore_case_dir = {
     "device": [],
     "fft": [],
@@ -82,8 +94,89 @@ def runCETest(params):
             val = 0
             final_result = "Failed"
     if final_result == "Failed":
-        failed_ce_case_list.append(case)
-        os.system('echo "%s" >> %s/result.txt' % (case, path))
+        record_failed(path, case)
+
+
+def record_failed(path, case):
+    """record failed case"""
+    failed_ce_case_list.append(case)
+    os.system('echo "%s" >> %s/result.txt' % (case, path))
+
+
+def preload(path):
+    """import heavy modules once in parent process, paddle only be imported without initializing devices"""
+    sys.path.insert(0, path)
+    for name in preload_modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            print("preload %s failed, it will be imported in each case" % name)
+
+
+def runForkedCase(path, case, retry):
+    """run one case file by pytest in forked child process, never return"""
+    code = 1
+    try:
+        os.chdir(path)
+        if retry > 0:
+            os.environ["FLAGS_call_stack_level"] = "2"
+            paddle = sys.modules.get("paddle")
+            if paddle is not None:
+                paddle.set_flags({"FLAGS_call_stack_level": 2})
+        args = [case]
+        junit_dir = os.environ.get("CE_JUNIT_DIR")
+        if junit_dir:
+            args.append("--junitxml=%s" % os.path.join(junit_dir, "%s.xml" % case[:-3]))
+        import pytest
+
+        # extra options such as --alluredir could be passed by PYTEST_ADDOPTS
+        code = int(pytest.main(args))
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def forkRun(path, cases):
+    """
+    run cases by forked children, at most worker_num children at the same time
+    failed case is retried by forking the warm parent again
+    """
+    preload(path)
+    pending = collections.deque((case, 0) for case in cases)
+    running = {}
+    while pending or running:
+        while pending and len(running) < worker_num:
+            case, retry = pending.popleft()
+            print("case: %s" % case)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                runForkedCase(path, case, retry)
+            running[pid] = (case, retry, time.time())
+
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if case_timeout > 0:
+                for child, (case, retry, start) in running.items():
+                    if time.time() - start > case_timeout:
+                        print("case: %s timeout after %s seconds" % (case, case_timeout))
+                        os.kill(child, signal.SIGKILL)
+                        running[child] = (case, retry, float("inf"))
+            time.sleep(0.05)
+            continue
+        if pid not in running:
+            continue
+        case, retry, _ = running.pop(pid)
+        if os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+            continue
+        if retry < max_retry:
+            pending.append((case, retry + 1))
+        else:
+            record_failed(path, case)
 
 
 def doFun(params):
@@ -99,13 +192,16 @@ def main(path):
     case_dir = path.split("/")[-1]
     os.system('echo "============ failed cases =============" >> %s/result.txt' % path)
     ignore_case_list = ignore_case_dir[case_dir]
-    pool = threadPool(13)
+    cases = [case for case in dirs if case.startswith("test") and case.endswith("py") and case not in ignore_case_list]
+    if executor == "fork":
+        forkRun(path, cases)
+        return
+    pool = threadPool(worker_num)
     for i in range(pool.__len__()):
         pool[i].start()
-    for case in dirs:
-        if case.startswith("test") and case.endswith("py") and case not in ignore_case_list:
-            params = [path, case]
-            taskQueue.put(params)
+    for case in cases:
+        params = [path, case]
+        taskQueue.put(params)
     taskQueue.join()
 
 
@@ -6,24 +6,58 @@
 db object
 """
 
+import os
 import json
+import sqlite3
 import traceback
 from datetime import datetime
 import yaml
-import pymysql
 
 # from utils.logger import logger
 
 ACCURACY = "%.6g"
 
+# sqlite本地库的表结构, 字段与线上mysql一致, 用于离线调试与单机运行
+SQLITE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS `layer_job` ("
+    "`id` INTEGER PRIMARY KEY AUTOINCREMENT, `comment` TEXT, `status` TEXT, `result` TEXT, `env_info` TEXT, "
+    "`framework` TEXT, `agile_pipeline_build_id` INTEGER, `testing_mode` TEXT, `testing` TEXT, "
+    "`plt_perf_content` TEXT, `layer_type` TEXT, `commit` TEXT, `version` TEXT, `hostname` TEXT, "
+    "`hardware` TEXT, `system` TEXT, `md5_id` TEXT, `base` INTEGER, `ci` INTEGER, "
+    "`create_time` TEXT, `update_time` TEXT)",
+    "CREATE TABLE IF NOT EXISTS `layer_case` ("
+    "`id` INTEGER PRIMARY KEY AUTOINCREMENT, `jid` INTEGER, `case_name` TEXT, `result` TEXT, `create_time` TEXT)",
+    "CREATE INDEX IF NOT EXISTS `idx_layer_job_baseline` "
+    "ON `layer_job` (`md5_id`, `testing`, `plt_perf_content`, `base`, `ci`, `comment`)",
+    "CREATE INDEX IF NOT EXISTS `idx_layer_case_jid` ON `layer_case` (`jid`, `case_name`)",
+]
+
 
 class DB(object):
-    """DB class"""
+    """
+    DB class
+    backend由环境变量PLT_DB_BACKEND指定: mysql(默认, 读取storage.yaml) 或 sqlite(本地文件, 路径由PLT_DB_SQLITE指定)
+    """
 
-    def __init__(self, storage="storage.yaml"):
+    def __init__(self, storage="storage.yaml", backend=None):
         self.storage = storage
-        host, port, user, password, database = self.load_storge()
-        self.db = pymysql.connect(host=host, port=port, user=user, password=password, database=database, charset="utf8")
+        self.backend = backend or os.environ.get("PLT_DB_BACKEND", "mysql")
+        if self.backend == "mysql":
+            import pymysql
+
+            host, port, user, password, database = self.load_storge()
+            self.db = pymysql.connect(
+                host=host, port=port, user=user, password=password, database=database, charset="utf8"
+            )
+            self.placeholder = "%s"
+        elif self.backend == "sqlite":
+            self.db = sqlite3.connect(os.environ.get("PLT_DB_SQLITE", "plt_benchmark.db"))
+            self.placeholder = "?"
+            for sql in SQLITE_SCHEMA:
+                self.db.execute(sql)
+            self.db.commit()
+        else:
+            raise Exception(f"unknown db backend: {self.backend}, only support mysql or sqlite")
         self.cursor = self.db.cursor()
         # self.now_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -48,36 +82,75 @@ class DB(object):
         """
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+    def ping(self):
+        """断线重连, sqlite无需处理"""
+        if self.backend == "mysql":
+            self.db.ping(True)
+
+    def _fetch_dicts(self):
+        """将查询结果按列名转为dict list"""
+        index_list = [column[0] for column in self.cursor.description]
+        return [dict(zip(index_list, row)) for row in self.cursor.fetchall()]
+
+    def _where(self, condition_dict):
+        """由condition_dict生成参数化的where子句"""
+        if not condition_dict:
+            return "", []
+        sql = " WHERE " + " AND ".join("`{}`={}".format(k, self.placeholder) for k in condition_dict)
+        return sql, list(condition_dict.values())
+
     def insert(self, table, data):
         """插入数据"""
         id = -1
         sql_table = "`" + table + "`"
         ls = [(k, data[k]) for k in data if data[k] is not None]
         keys = ",".join(("`" + i[0] + "`") for i in ls)
-        values = ",".join("%r" % i[1] for i in ls)
+        values = ",".join(self.placeholder for i in ls)
 
         sql = "INSERT INTO {table}({keys}) VALUES ({values})".format(table=sql_table, keys=keys, values=values)
         try:
-            self.cursor.execute(sql)
-            id = self.db.insert_id()
+            self.cursor.execute(sql, [i[1] for i in ls])
+            id = self.cursor.lastrowid
             self.db.commit()
         except Exception as e:
             # print(traceback.format_exc())
             print(e)
         return id
 
+    def insert_many(self, table, data_list):
+        """
+        批量插入数据, 单条executemany语句并在同一事务内提交
+        :param data_list: dict list, 各dict的key需一致
+        :return: 插入条数, 失败返回-1
+        """
+        if not data_list:
+            return 0
+        sql_table = "`" + table + "`"
+        key_list = list(data_list[0].keys())
+        keys = ",".join(("`" + k + "`") for k in key_list)
+        values = ",".join(self.placeholder for k in key_list)
+
+        sql = "INSERT INTO {table}({keys}) VALUES ({values})".format(table=sql_table, keys=keys, values=values)
+        try:
+            self.cursor.executemany(sql, [[data[k] for k in key_list] for data in data_list])
+            self.db.commit()
+        except Exception as e:
+            print(e)
+            try:
+                self.db.rollback()
+            except Exception as rollback_e:  # 连接已断开时rollback同样失败, 交由调用方ping重连后重试
+                print(rollback_e)
+            return -1
+        return len(data_list)
+
     def update(self, table, data, data_condition):
         """按照data_condition 更新数据"""
         sql_table = "`" + table + "`"
-        sql = (
-            "UPDATE %s SET " % sql_table
-            + ",".join("%s=%r" % (("`" + k + "`"), data[k]) for k in data)
-            + " WHERE "
-            + " AND ".join("%s=%r" % (("`" + k + "`"), data_condition[k]) for k in data_condition)
-        )
+        where, params = self._where(data_condition)
+        sql = "UPDATE %s SET " % sql_table + ",".join("`{}`={}".format(k, self.placeholder) for k in data) + where
 
         try:
-            self.cursor.execute(sql)
+            self.cursor.execute(sql, list(data.values()) + params)
             self.db.commit()
         except Exception as e:
             print(traceback.format_exc())
@@ -85,37 +158,42 @@ class DB(object):
 
     def update_by_id(self, table, data, id):
         """按照id 更新数据"""
+        self.update(table=table, data=data, data_condition={"id": id})
+
+    def select(self, table, condition_list):
+        """按照condition_list 查询数据, condition_list为sql条件字符串list, 新代码请使用select_where"""
+        results = []
         sql_table = "`" + table + "`"
-        sql = (
-            "UPDATE %s SET " % sql_table
-            + ",".join("%s=%r" % (("`" + k + "`"), data[k]) for k in data)
-            + " WHERE "
-            + "%s=%r" % ("`id`", id)
-        )
+        sql = "SELECT * FROM %s " % sql_table + " WHERE " + " AND ".join("%s" % k for k in condition_list)
 
         try:
             self.cursor.execute(sql)
-            self.db.commit()
+            results = self._fetch_dicts()
         except Exception as e:
             print(traceback.format_exc())
             print(e)
+        return results
 
-    def select(self, table, condition_list):
-        """按照condition_list 查询数据"""
+    def select_where(self, table, condition_dict, order_by=None, desc=False, limit=None):
+        """
+        按照condition_dict 参数化查询数据
+        :param condition_dict: {列名: 值}, 条件之间为AND
+        :param order_by: 排序列名
+        :param desc: 是否降序
+        :param limit: 返回条数上限
+        """
         results = []
         sql_table = "`" + table + "`"
-        sql = "SELECT * FROM %s " % sql_table + " WHERE " + " AND ".join("%s" % k for k in condition_list)
+        where, params = self._where(condition_dict)
+        sql = "SELECT * FROM %s" % sql_table + where
+        if order_by is not None:
+            sql += " ORDER BY `{}`{}".format(order_by, " DESC" if desc else "")
+        if limit is not None:
+            sql += " LIMIT %d" % int(limit)
 
         try:
-            self.cursor.execute(sql)
-            res = self.cursor.fetchall()
-
-            index_list = self.show_list(table=table)
-            for row in res:
-                tmp = {}
-                for i, v in enumerate(row):
-                    tmp[index_list[i]] = row[i]
-                results.append(tmp)
+            self.cursor.execute(sql, params)
+            results = self._fetch_dicts()
         except Exception as e:
             print(traceback.format_exc())
             print(e)
@@ -133,28 +211,21 @@ class DB(object):
         params = []
 
         # 添加日期条件
-        conditions.append("DATE(update_time) = %s")
+        conditions.append("DATE(update_time) = {}".format(self.placeholder))
         params.append(date_str)  # 确保date_str是"YYYY-MM-DD"格式的字符串
 
         # 添加其他条件
         for key, value in condition_dict.items():
             # 这里假设value已经是适合数据库查询的格式（如字符串、数字等）
             # 如果value是日期或时间，请确保它在这里被正确格式化
-            conditions.append(f"{key} = %s")
+            conditions.append("`{}` = {}".format(key, self.placeholder))
             params.append(value)
 
         # 构建完整的SQL查询语句
-        sql = "SELECT * FROM {} WHERE {}".format(table, " AND ".join(conditions))
+        sql = "SELECT * FROM `{}` WHERE {}".format(table, " AND ".join(conditions))
         try:
             self.cursor.execute(sql, tuple(params))
-            res = self.cursor.fetchall()
-
-            index_list = self.show_list(table=table)
-            for row in res:
-                tmp = {}
-                for i, v in enumerate(row):
-                    tmp[index_list[i]] = row[i]
-                results.append(tmp)
+            results = self._fetch_dicts()
         except Exception as e:
             print(traceback.format_exc())
             print(e)
@@ -162,24 +233,7 @@ class DB(object):
 
     def select_by_id(self, table, id):
         """按照id 查询数据"""
-        results = []
-        sql_table = "`" + table + "`"
-        sql = "SELECT * FROM %s " % sql_table + " WHERE " + "%s=%r" % ("`id`", id)
-
-        try:
-            self.cursor.execute(sql)
-            res = self.cursor.fetchall()
-
-            tmp = {}
-            index_list = self.show_list(table=table)
-            for row in res:
-                for i, v in enumerate(row):
-                    tmp[index_list[i]] = row[i]
-                results.append(tmp)
-        except Exception as e:
-            print(traceback.format_exc())
-            print(e)
-        return results
+        return self.select_where(table=table, condition_dict={"id": id})
 
     def insert_job(
         self,
@@ -244,7 +298,7 @@ class DB(object):
                 case_id = self.insert(table="layer_case", data=data)
                 if case_id == -1:
                     print("db ping again~~~")
-                    self.db.ping(True)
+                    self.ping()
                     continue
                 else:
                     break
@@ -253,23 +307,43 @@ class DB(object):
             print(traceback.format_exc())
             print(e)
 
+    def insert_cases(self, jid, case_dict, create_time):
+        """
+        向case表中批量录入数据, 全部case在一个事务内提交
+        :param case_dict: {case_name: result}, result为json字符串
+        """
+        data_list = [
+            {"jid": jid, "case_name": case_name, "result": result, "create_time": create_time}
+            for case_name, result in case_dict.items()
+        ]
+        retry = 3
+        for i in range(retry):
+            if self.insert_many(table="layer_case", data_list=data_list) != -1:
+                return len(data_list)
+            print("db ping again~~~")
+            self.ping()
+        raise Exception("insert layer_case failed after {} retries, jid: {}".format(retry, jid))
+
     def update_job(self, id, status, update_time):
         """数据录入完成后更新job表中的部分字段"""
         data = {"status": status, "update_time": update_time}
         self.update_by_id(table="layer_job", data=data, id=id)
 
-    def select_baseline_job(self, comment, testing, plt_perf_content, base, ci, md5_id):
-        """通过comment字段、ci字段、机器唯一标识码，查找baseline数据"""
-        condition_list = [
-            "comment = '{}'".format(comment),
-            "status = 'done'",
-            "testing = '{}'".format(testing),
-            "plt_perf_content = '{}'".format(plt_perf_content),
-            "base = '{}'".format(base),
-            "ci = '{}'".format(ci),
-            "md5_id = '{}'".format(md5_id),
-        ]
-        res = self.select(table="layer_job", condition_list=condition_list)
+    def select_baseline_job(self, comment, testing, plt_perf_content, base, ci, md5_id, hardware=None):
+        """通过comment字段、ci字段、机器唯一标识码，查找baseline数据, 设置hardware时只查找同一硬件的baseline"""
+        condition_dict = {
+            "md5_id": md5_id,
+            "testing": testing,
+            "plt_perf_content": plt_perf_content,
+            "base": base,
+            "ci": ci,
+            "comment": comment,
+            "status": "done",
+        }
+        if hardware is not None:
+            condition_dict["hardware"] = hardware
+        # 只取最新的一条, 避免拉取全部历史job
+        res = self.select_where(table="layer_job", condition_dict=condition_dict, order_by="id", desc=True, limit=1)
         baseline_job = res[-1]
         # job_id = baseline_job["id"]
         return baseline_job
@@ -278,10 +352,15 @@ class DB(object):
         """返回table中的列list"""
         results = []
         sql_table = "`" + table + "`"
-        sql = "SHOW COLUMNS from {}".format(sql_table)
+        if self.backend == "sqlite":
+            sql = "PRAGMA table_info({})".format(sql_table)
+            name_index = 1
+        else:
+            sql = "SHOW COLUMNS from {}".format(sql_table)
+            name_index = 0
         try:
             self.cursor.execute(sql)
-            results = [column[0] for column in self.cursor.fetchall()]
+            results = [column[name_index] for column in self.cursor.fetchall()]
         except Exception as e:
             print(traceback.format_exc())
             print(e)
@@ -140,9 +140,12 @@ class LayerBenchmarkDB(object):
             file.write(str(latest_id))
         self.logger.get_log().info("录入最新latest数据的job_id: {}".format(latest_id))
 
-        # 插入layer_case
-        for title, perf_dict in data_dict.items():
-            db.insert_case(jid=latest_id, case_name=title, result=json.dumps(perf_dict), create_time=self.now_time)
+        # 批量插入layer_case
+        db.insert_cases(
+            jid=latest_id,
+            case_dict={title: json.dumps(perf_dict) for title, perf_dict in data_dict.items()},
+            create_time=self.now_time,
+        )
 
         if bool(error_list):
             db.update_job(id=latest_id, status="done", update_time=self.now_time)
@@ -164,10 +167,11 @@ class LayerBenchmarkDB(object):
             base=1,
             ci=self.ci,
             md5_id=self.md5_id,
+            hardware=self.hardware,
         )
         baseline_id = baseline_job["id"]
         baseline_layer_type = baseline_job["layer_type"]
-        baseline_list = db.select(table="layer_case", condition_list=["jid = {}".format(baseline_id)])
+        baseline_list = db.select_where(table="layer_case", condition_dict={"jid": baseline_id})
         baseline_dict = {}
         for i in baseline_list:
             baseline_dict[i["case_name"]] = i
@@ -203,12 +207,12 @@ class LayerBenchmarkDB(object):
                     self.logger.get_log().error(e)
                     continue
             else:
-                condition_list = [
-                    "md5_id = '{}'".format(md5_id),
-                ]
-                res = db.select(table="layer_job", condition_list=condition_list)
-                baseline_job = res[-2]
-                latest_job = res[-1]
+                # 只取最新的两条job
+                res = db.select_where(
+                    table="layer_job", condition_dict={"md5_id": md5_id}, order_by="id", desc=True, limit=2
+                )
+                baseline_job = res[1]
+                latest_job = res[0]
 
             baseline_id = baseline_job["id"]
             latest_id = latest_job["id"]
@@ -219,8 +223,8 @@ class LayerBenchmarkDB(object):
             assert baseline_testing == latest_testing
             baseline_update_time = baseline_job["update_time"]
             latest_update_time = latest_job["update_time"]
-            baseline_list = db.select(table="layer_case", condition_list=["jid = {}".format(baseline_id)])
-            latest_list = db.select(table="layer_case", condition_list=["jid = {}".format(latest_id)])
+            baseline_list = db.select_where(table="layer_case", condition_dict={"jid": baseline_id})
+            latest_list = db.select_where(table="layer_case", condition_dict={"jid": latest_id})
             baseline_dict = {}
             for i in baseline_list:
                 file_name = i["case_name"].replace("^", "/") + ".py"
@@ -299,9 +303,12 @@ class LayerBenchmarkDB(object):
             file.write(str(basleine_id))
         self.logger.get_log().info("录入最新baseline数据的job_id: {}".format(basleine_id))
 
-        # 插入layer_case
-        for title, perf_dict in data_dict.items():
-            db.insert_case(jid=basleine_id, case_name=title, result=json.dumps(perf_dict), create_time=self.now_time)
+        # 批量插入layer_case
+        db.insert_cases(
+            jid=basleine_id,
+            case_dict={title: json.dumps(perf_dict) for title, perf_dict in data_dict.items()},
+            create_time=self.now_time,
+        )
 
         if bool(error_list):
             db.update_job(id=basleine_id, status="done", update_time=self.now_time)
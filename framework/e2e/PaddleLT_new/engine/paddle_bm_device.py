@@ -0,0 +1,123 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+# @author Zeref996
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+性能测试设备抽象: 设备同步与计时, cpu下支持线程数控制和绑核
+"""
+import os
+import time
+import paddle
+from pltools.logger import Logger
+
+
+class BMDevice(object):
+    """
+    性能测试设备基类
+    """
+
+    def __init__(self, device_place_id):
+        """
+        :param device_place_id: 设备编号
+        """
+        self.device_place_id = device_place_id
+        self.logger = Logger("BMDevice")
+
+    def synchronize(self):
+        """等待设备上已下发的计算全部完成"""
+        raise NotImplementedError
+
+    def timing(self, func, repeat, number=1):
+        """
+        计时, 每轮执行number次func后同步设备
+        :param func: 无参可调用对象
+        :param repeat: 轮数
+        :param number: 每轮执行次数
+        :return: 每轮耗时list, 单位s
+        """
+        time_list = []
+        for i in range(repeat):
+            start_time = time.perf_counter_ns()
+            for _ in range(number):
+                func()
+            self.synchronize()
+            time_list.append((time.perf_counter_ns() - start_time) / 1e9)
+        return time_list
+
+
+class GPUBMDevice(BMDevice):
+    """
+    gpu
+    """
+
+    def __init__(self, device_place_id):
+        """初始化"""
+        super(GPUBMDevice, self).__init__(device_place_id)
+        paddle.set_device(f"gpu:{device_place_id}")
+        self.place = paddle.CUDAPlace(device_place_id)
+
+    def synchronize(self):
+        """等待gpu计算完成"""
+        paddle.core._cuda_synchronize(self.place)
+
+
+class CPUBMDevice(BMDevice):
+    """
+    cpu, kernel同步执行, 无需设备同步
+    PLT_BM_CPU_THREADS: 计算线程数, 默认不设置
+    PLT_BM_CPU_CORES: 绑定的cpu核, 例如"0,1"或"0-3", 默认不绑核
+    """
+
+    def __init__(self, device_place_id):
+        """初始化"""
+        super(CPUBMDevice, self).__init__(device_place_id)
+        paddle.set_device("cpu")
+
+        threads = os.environ.get("PLT_BM_CPU_THREADS")
+        if threads:
+            set_num_threads = getattr(paddle.framework.core, "set_num_threads", None)
+            if set_num_threads is not None:
+                set_num_threads(int(threads))
+            else:
+                self.logger.get_log().warning("当前paddle不支持set_num_threads, 线程数以OMP_NUM_THREADS为准")
+
+        cores = os.environ.get("PLT_BM_CPU_CORES")
+        if cores and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, parse_cores(cores))
+
+    def synchronize(self):
+        """cpu无需同步"""
+        pass
+
+
+def parse_cores(cores):
+    """
+    解析cpu核列表
+    :param cores: 例如"0,1"或"0-3,6"
+    :return: set of int
+    """
+    res = set()
+    for item in cores.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "-" in item:
+            start, end = item.split("-")
+            res.update(range(int(start), int(end) + 1))
+        else:
+            res.add(int(item))
+    return res
+
+
+def bm_device(device, device_place_id):
+    """
+    根据PLT_SET_DEVICE构造性能测试设备
+    :param device: cpu or gpu
+    :param device_place_id: 设备编号
+    """
+    if device == "gpu":
+        return GPUBMDevice(device_place_id)
+    elif device == "cpu":
+        return CPUBMDevice(device_place_id)
+    else:
+        raise Exception("unknown hardware, PaddleLayerTest performance only support cpu or gpu")
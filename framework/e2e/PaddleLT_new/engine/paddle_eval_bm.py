@@ -7,14 +7,14 @@ eval 方法
 """
 import os
 import timeit
-import time
 import numpy as np
 import paddle
 from engine.paddle_xtools import reset
+from engine.paddle_bm_device import bm_device
 from generator.builder_layer import BuildLayer
 from generator.builder_data import BuildData
 from pltools.res_save import save_pickle
-from pltools.statistics import trimmean, mean, best, best_top_k, perf_by_step
+from pltools.statistics import trimmean, mean, best, best_top_k, latency_sketch, perf_by_step
 from pltools.logger import Logger
 
 
@@ -32,15 +32,16 @@ class LayerEvalBM(object):
         reset(self.seed)
 
         self.device = os.environ.get("PLT_SET_DEVICE")
-        # paddle.set_device(str(self.device))
-        paddle.set_device(f"{self.device}:{device_place_id}")
-        # paddle.set_device("{}:{}".format(str(self.device), str(device_id)))
+        # 设备同步与计时, cpu下不依赖cuda
+        self.bm_device = bm_device(device=self.device, device_place_id=device_place_id)
 
         self.perf_repeat = int(os.environ.get("PLT_BM_REPEAT", "100"))
         self.perf_statis = os.environ.get("PLT_BM_STATIS", "trimmean")
         self.timeit_num = int(os.environ.get("TIMEIT_NUM", "1"))
         self.statis_times = 100
         self.statis_round = 6
+        # 最近一次性能测试的耗时分布摘要
+        self.latency = None
 
         self.testing = testing
         self.upstream_net = upstream_net
@@ -85,18 +86,13 @@ class LayerEvalBM(object):
             logit = net(*input_data)
             return logit
 
-        total_time_list = []
         # 预热
         timeit.timeit(lambda: _perf(self.data), number=10)
         # timeit.timeit(lambda: _perf(self.data), number=int(self.perf_repeat * self.timeit_num * 0.2))
-        for i in range(self.perf_repeat):
-            start_time = time.time()
-            for _ in range(self.timeit_num):
-                _perf(self.data)
-            paddle.core._cuda_synchronize(paddle.CUDAPlace(0))
-            end_time = time.time()
-            total_time = end_time - start_time
-            total_time_list.append(total_time)
+        self.bm_device.synchronize()
+        total_time_list = self.bm_device.timing(
+            func=lambda: _perf(self.data), repeat=self.perf_repeat, number=self.timeit_num
+        )
 
         if os.environ.get("PLT_BM_PLOT") == "True":
             save_pickle(data=total_time_list, filename="dy_eval_perf_" + self.layerfile)
@@ -109,6 +105,7 @@ class LayerEvalBM(object):
 
         time_res = eval(self.perf_statis)(data_list=total_time_list)
         time_res = round(time_res * self.statis_times, self.statis_round)
+        self.latency = latency_sketch(data_list=total_time_list, scale=self.statis_times, ndigits=self.statis_round)
 
         return time_res
 
@@ -122,18 +119,13 @@ class LayerEvalBM(object):
             logit = st_net(*input_data)
             return logit
 
-        total_time_list = []
         # 预热
         timeit.timeit(lambda: _perf(self.data), number=10)
         # timeit.timeit(lambda: _perf(self.data), number=int(self.perf_repeat * self.timeit_num * 0.2))
-        for i in range(self.perf_repeat):
-            start_time = time.time()
-            for _ in range(self.timeit_num):
-                _perf(self.data)
-            paddle.core._cuda_synchronize(paddle.CUDAPlace(0))
-            end_time = time.time()
-            total_time = end_time - start_time
-            total_time_list.append(total_time)
+        self.bm_device.synchronize()
+        total_time_list = self.bm_device.timing(
+            func=lambda: _perf(self.data), repeat=self.perf_repeat, number=self.timeit_num
+        )
 
         if os.environ.get("PLT_BM_PLOT") == "True":
             save_pickle(data=total_time_list, filename="dy_eval_perf_" + self.layerfile)
@@ -146,6 +138,7 @@ class LayerEvalBM(object):
 
         time_res = eval(self.perf_statis)(data_list=total_time_list)
         time_res = round(time_res * self.statis_times, self.statis_round)
+        self.latency = latency_sketch(data_list=total_time_list, scale=self.statis_times, ndigits=self.statis_round)
 
         return time_res
 
@@ -162,18 +155,13 @@ class LayerEvalBM(object):
             logit = cinn_net(*input_data)
             return logit
 
-        total_time_list = []
         # 预热
         timeit.timeit(lambda: _perf(self.data), number=10)
         # timeit.timeit(lambda: _perf(self.data), number=int(self.perf_repeat * self.timeit_num * 0.2))
-        for i in range(perf_repeat):
-            start_time = time.time()
-            for _ in range(self.timeit_num):
-                _perf(self.data)
-            paddle.core._cuda_synchronize(paddle.CUDAPlace(0))
-            end_time = time.time()
-            total_time = end_time - start_time
-            total_time_list.append(total_time)
+        self.bm_device.synchronize()
+        total_time_list = self.bm_device.timing(
+            func=lambda: _perf(self.data), repeat=perf_repeat, number=self.timeit_num
+        )
 
         if os.environ.get("PLT_BM_PLOT") == "True":
             save_pickle(data=total_time_list, filename="dy_eval_perf_" + self.layerfile)
@@ -186,6 +174,7 @@ class LayerEvalBM(object):
 
         time_res = eval(self.perf_statis)(data_list=total_time_list)
         time_res = round(time_res * self.statis_times, self.statis_round)
+        self.latency = latency_sketch(data_list=total_time_list, scale=self.statis_times, ndigits=self.statis_round)
 
         return time_res
 
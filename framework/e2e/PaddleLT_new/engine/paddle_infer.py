@@ -39,16 +39,11 @@ class LayerInfer(object):
 
         self.path = os.path.join(os.getcwd(), "jit_save_export", layerfile.replace(".", "/"), self.jit_save_type)
 
-    def paddle_infer_gpu(self):
-        """infer load (layer)"""
-        reset(self.seed)
-        if not os.path.exists(self.path + ".pdiparams"):
-            Logger("paddle_infer_gpu").get_log().info("该子图export未产出pdiparams, 所以跳过infer测试")
-            return {"res": {"logit": None}}
-
-        config = paddle_infer.Config(self.path + ".pdmodel", self.path + ".pdiparams")
-        config.enable_use_gpu(1000, int(self.device_id))
-
+    def _infer(self, config):
+        """
+        构建predictor并执行预测
+        :param config: paddle_infer.Config
+        """
         predictor = paddle_infer.create_predictor(config)
         input_names = predictor.get_input_names()
         for i, name in enumerate(input_names):
@@ -68,6 +63,18 @@ class LayerInfer(object):
             infer_res = output_handle.copy_to_cpu()
         return {"res": {"logit": infer_res}}
 
+    def paddle_infer_gpu(self):
+        """infer load (layer)"""
+        reset(self.seed)
+        if not os.path.exists(self.path + ".pdiparams"):
+            Logger("paddle_infer_gpu").get_log().info("该子图export未产出pdiparams, 所以跳过infer测试")
+            return {"res": {"logit": None}}
+
+        config = paddle_infer.Config(self.path + ".pdmodel", self.path + ".pdiparams")
+        config.enable_use_gpu(1000, int(self.device_id))
+
+        return self._infer(config)
+
     def paddle_infer_cpu(self):
         """infer load (layer)"""
         reset(self.seed)
@@ -76,27 +83,9 @@ class LayerInfer(object):
             return {"res": {"logit": None}}
 
         config = paddle_infer.Config(self.path + ".pdmodel", self.path + ".pdiparams")
-
         config.disable_mkldnn()
 
-        predictor = paddle_infer.create_predictor(config)
-        input_names = predictor.get_input_names()
-        for i, name in enumerate(input_names):
-            input_handle = predictor.get_input_handle(name)
-            input_tmp = self.data[i]
-            input_handle.copy_from_cpu(input_tmp)
-
-        predictor.run()
-        output_names = predictor.get_output_names()
-        if len(output_names) > 1:
-            infer_res = []
-            for i, name in enumerate(output_names):
-                output_handle = predictor.get_output_handle(output_names[i])
-                infer_res.append(output_handle.copy_to_cpu())
-        else:
-            output_handle = predictor.get_output_handle(output_names[0])
-            infer_res = output_handle.copy_to_cpu()
-        return {"res": {"logit": infer_res}}
+        return self._infer(config)
 
     def paddle_infer_mkldnn(self):
         """infer load (layer)"""
@@ -106,29 +95,11 @@ class LayerInfer(object):
             return {"res": {"logit": None}}
 
         config = paddle_infer.Config(self.path + ".pdmodel", self.path + ".pdiparams")
-
         config.enable_mkldnn()
         config.set_cpu_math_library_num_threads(1)
         config.set_mkldnn_cache_capacity(1)
 
-        predictor = paddle_infer.create_predictor(config)
-        input_names = predictor.get_input_names()
-        for i, name in enumerate(input_names):
-            input_handle = predictor.get_input_handle(name)
-            input_tmp = self.data[i]
-            input_handle.copy_from_cpu(input_tmp)
-
-        predictor.run()
-        output_names = predictor.get_output_names()
-        if len(output_names) > 1:
-            infer_res = []
-            for i, name in enumerate(output_names):
-                output_handle = predictor.get_output_handle(output_names[i])
-                infer_res.append(output_handle.copy_to_cpu())
-        else:
-            output_handle = predictor.get_output_handle(output_names[0])
-            infer_res = output_handle.copy_to_cpu()
-        return {"res": {"logit": infer_res}}
+        return self._infer(config)
 
     def paddle_infer_ort(self):
         """infer load (layer)"""
@@ -138,28 +109,10 @@ class LayerInfer(object):
             return {"res": {"logit": None}}
 
         config = paddle_infer.Config(self.path + ".pdmodel", self.path + ".pdiparams")
-
         config.enable_onnxruntime()
         config.enable_ort_optimization()
 
-        predictor = paddle_infer.create_predictor(config)
-        input_names = predictor.get_input_names()
-        for i, name in enumerate(input_names):
-            input_handle = predictor.get_input_handle(name)
-            input_tmp = self.data[i]
-            input_handle.copy_from_cpu(input_tmp)
-
-        predictor.run()
-        output_names = predictor.get_output_names()
-        if len(output_names) > 1:
-            infer_res = []
-            for i, name in enumerate(output_names):
-                output_handle = predictor.get_output_handle(output_names[i])
-                infer_res.append(output_handle.copy_to_cpu())
-        else:
-            output_handle = predictor.get_output_handle(output_names[0])
-            infer_res = output_handle.copy_to_cpu()
-        return {"res": {"logit": infer_res}}
+        return self._infer(config)
 
     def paddle_infer_new_exc_pir(self):
         """infer load (layer)"""
@@ -170,27 +123,9 @@ class LayerInfer(object):
 
         config = paddle_infer.Config(self.path + ".json", self.path + ".pdiparams")
         # config = paddle_infer.Config(self.path, 'inference')
-
         config.enable_use_gpu(256, 0)
         config.switch_ir_optim(False)
         config.enable_new_executor()
         config.enable_new_ir()
 
-        predictor = paddle_infer.create_predictor(config)
-        input_names = predictor.get_input_names()
-        for i, name in enumerate(input_names):
-            input_handle = predictor.get_input_handle(name)
-            input_tmp = self.data[i]
-            input_handle.copy_from_cpu(input_tmp)
-
-        predictor.run()
-        output_names = predictor.get_output_names()
-        if len(output_names) > 1:
-            infer_res = []
-            for i, name in enumerate(output_names):
-                output_handle = predictor.get_output_handle(output_names[i])
-                infer_res.append(output_handle.copy_to_cpu())
-        else:
-            output_handle = predictor.get_output_handle(output_names[0])
-            infer_res = output_handle.copy_to_cpu()
-        return {"res": {"logit": infer_res}}
+        return self._infer(config)
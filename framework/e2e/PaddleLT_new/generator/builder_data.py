@@ -6,22 +6,19 @@ data builder
 """
 
 import os
+import math
 import itertools
 import numpy as np
 
 if os.environ.get("FRAMEWORK") == "paddle":
     import paddle
-    import diy
-    import layerApicase
-    import layercase
 
     if os.environ.get("USE_PADDLE_MODEL", "None") == "PaddleOCR":
-        import layerModelcase
         import PaddleOCR
 elif os.environ.get("FRAMEWORK") == "torch":
     import torch
-    import layerTorchcase
 
+from generator.layer_registry import layer_registry
 import pltools.np_tool as tool
 
 
@@ -31,7 +28,7 @@ class BuildData(object):
     def __init__(self, layerfile):
         """init"""
         self.layerfile = layerfile
-        self.layer_module = eval(self.layerfile)
+        self.layer_module = layer_registry.get_module(self.layerfile)
 
     def get_single_data(self):
         """get data"""
@@ -104,8 +101,8 @@ class BuildData(object):
         """get single inputspec"""
         spec_list = []
         data = self.get_single_data()
-        if hasattr(eval(self.layerfile), "create_inputspec"):  # 如果子图case中包含inputspec, 则直接使用接口获取
-            spec_list = eval(self.layerfile + ".create_inputspec()")
+        if hasattr(self.layer_module, "create_inputspec"):  # 如果子图case中包含inputspec, 则直接使用接口获取
+            spec_list = self.layer_module.create_inputspec()
         else:
             for v in data:
                 if isinstance(v, paddle.Tensor):
@@ -179,20 +176,33 @@ class SpecInfoMeta:
         """
         return paddle.static.InputSpec(shape=shape, dtype=self.dtype, stop_gradient=self.stop_gradient)
 
-    def maybe_shapes(self):
+    def static_axes(self):
         """
-        找到单个InputSpec中, 所有可能的shape
+        必须保持静态的维度, 目前为NCHW输入的channel维
         """
-        shape_eles = [[-1, s] for s in self.shape]
-        raw_shapes = itertools.product(*shape_eles)
-        has_channel = len(self.shape) == 4 and self.shape[1] == 3
+        if len(self.shape) == 4 and self.shape[1] == 3:
+            return {1}
+        return set()
 
+    def apply_mask(self, mask):
+        """
+        按动态掩码生成shape
+        :param mask: 与shape等长的bool序列, True表示该维为动态维-1
+        """
+        fixed = self.static_axes()
+        return tuple(
+            -1 if dynamic and axis not in fixed else s for axis, (s, dynamic) in enumerate(zip(self.shape, mask))
+        )
+
+    def maybe_shapes(self):
+        """
+        找到单个InputSpec中, 所有可能的shape(穷举, 随维数指数增长)
+        """
         maybe_shapes = []
-        for shape in raw_shapes:
-            # in case of channel
-            if has_channel and shape[1] is None:
-                continue
-            maybe_shapes.append(shape)
+        for mask in itertools.product([False, True], repeat=len(self.shape)):
+            shape = self.apply_mask(mask)
+            if shape not in maybe_shapes:
+                maybe_shapes.append(shape)
         return maybe_shapes
 
     def maybe_specs(self):
@@ -205,24 +215,52 @@ class SpecInfoMeta:
         return specs
 
 
+def pairwise_masks(num):
+    """
+    二值两两覆盖数组: 任意两个维度的(静态, 动态)四种组合均至少出现一次
+    第0行全静态, 其余N-1行中每列取不同的ceil(N/2)个动态位, 列两两不可比且必相交, 行数约为log2(num)
+    :param num: 维度总数
+    :return: list of tuple(bool)
+    """
+    if num == 0:
+        return []
+    rows = 2
+    while math.comb(rows - 1, (rows + 1) // 2) < num:
+        rows += 1
+    columns = itertools.islice(itertools.combinations(range(1, rows), (rows + 1) // 2), num)
+    masks = [[False] * num for _ in range(rows)]
+    for col, dynamic_rows in enumerate(columns):
+        for row in dynamic_rows:
+            masks[row][col] = True
+    return [tuple(mask) for mask in masks]
+
+
 class SpecStrategy:
     """
     SpecStrategy生成器
+    PLT_SPEC_STRATEGY: bounded: 在预算内选择有代表性的动态维组合; product: 穷举全部组合
+    PLT_SPEC_BUDGET: bounded策略下最多生成的InputSpec组合数
     """
 
-    def __init__(self, inputs_info):
+    def __init__(self, inputs_info, budget=None, strategy=None):
         """
         inputs_info: 是一个list, 包含多个SpecInfoMeta对象, 具体形式为[SpecInfoMeta(shape, dtype, stop_gradient), ...]
         """
         self.inputs_info = inputs_info
+        self.budget = int(budget if budget is not None else os.environ.get("PLT_SPEC_BUDGET", "16"))
+        self.strategy = strategy if strategy is not None else os.environ.get("PLT_SPEC_STRATEGY", "bounded")
 
     def next(self):
         """
         next
         """
-        strategy = self.parse_strategy()
-        for specs in itertools.product(*strategy):
-            yield specs
+        if self.strategy == "product":
+            strategy = self.parse_strategy()
+            for specs in itertools.product(*strategy):
+                yield specs
+        else:
+            for shapes in self.bounded_shapes():
+                yield tuple(info.as_spec(shape) for info, shape in zip(self.inputs_info, shapes))
 
     def parse_strategy(self):
         """
@@ -232,3 +270,39 @@ class SpecStrategy:
         for input_info in self.inputs_info:
             strategy.append(input_info.maybe_specs())
         return strategy
+
+    def candidate_masks(self):
+        """
+        全部输入拼接后各维度的动态掩码, 按优先级排列:
+        全静态, 全动态, 两两覆盖, 单个维度动态, 单个输入全动态, 行数随维度总数线性增长
+        """
+        sizes = [len(info.shape) for info in self.inputs_info]
+        num = sum(sizes)
+        masks = [(False,) * num, (True,) * num]
+        masks.extend(pairwise_masks(num))
+        masks.extend(tuple(i == axis for i in range(num)) for axis in range(num))
+        offset = 0
+        for size in sizes:
+            masks.append(tuple(offset <= i < offset + size for i in range(num)))
+            offset += size
+        return masks
+
+    def bounded_shapes(self):
+        """
+        在预算内生成各输入shape组合, 去掉必须静态的维度后相同的组合只保留一个
+        :return: list of tuple(shape)
+        """
+        res = []
+        for mask in self.candidate_masks():
+            shapes = []
+            offset = 0
+            for info in self.inputs_info:
+                shapes.append(info.apply_mask(mask[offset : offset + len(info.shape)]))
+                offset += len(info.shape)
+            shapes = tuple(shapes)
+            if shapes in res:
+                continue
+            res.append(shapes)
+            if len(res) >= self.budget:
+                break
+        return res
@@ -9,16 +9,13 @@ import os
 
 if os.environ.get("FRAMEWORK") == "paddle":
     import paddle
-    import diy
-    import layerApicase
-    import layercase
 
     if os.environ.get("USE_PADDLE_MODEL", "None") == "PaddleOCR":
-        import layerModelcase
         import PaddleOCR
 elif os.environ.get("FRAMEWORK") == "torch":
     import torch
-    import layerTorchcase
+
+from generator.layer_registry import layer_registry
 
 
 class BuildLayer(object):
@@ -26,9 +23,9 @@ class BuildLayer(object):
 
     def __init__(self, layerfile):
         """init"""
-        self.layername = layerfile + ".LayerCase"
+        self.layerfile = layerfile
 
     def get_layer(self):
         """get_layer"""
-        layer = eval(self.layername)()
+        layer = layer_registry.get_module(self.layerfile).LayerCase()
         return layer
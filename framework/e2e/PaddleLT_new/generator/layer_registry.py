@@ -0,0 +1,257 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+子图case注册表: 基于磁盘索引按需加载子图模块, 避免import整个layercase包
+"""
+
+import os
+import sys
+import ast
+import json
+import hashlib
+import importlib
+import importlib.util
+
+
+def module_to_path(layerfile):
+    """
+    子图模块名转py文件路径, 例如layercase.demo.SIR_101 -> layercase/demo/SIR_101.py
+    """
+    return layerfile.replace(".", os.sep) + ".py"
+
+
+def parse_header(py_path):
+    """
+    解析子图py文件首行的 # api:xxx||method:xxx 调用序列
+    :return: list, 例如 ["api:paddle.tensor.manipulation.concat", "method:reshape"]
+    """
+    with open(py_path, "r", encoding="utf-8") as f:
+        first_line = f.readline().strip()
+    if not first_line.startswith("#"):
+        return []
+    header = first_line.lstrip("#").strip()
+    if not (header.startswith("api:") or header.startswith("method:")):
+        return []
+    return [item.strip() for item in header.split("||") if item.strip()]
+
+
+def file_md5(py_path):
+    """计算文件md5"""
+    md5 = hashlib.md5()
+    with open(py_path, "rb") as f:
+        md5.update(f.read())
+    return md5.hexdigest()
+
+
+def parse_source(py_path):
+    """
+    解析子图源码
+    :return: ast.Module, 源码无法解析时返回None
+    """
+    with open(py_path, "r", encoding="utf-8") as f:
+        source = f.read()
+    try:
+        return ast.parse(source)
+    except SyntaxError:
+        return None
+
+
+def layer_fingerprint(py_path, tree=None):
+    """
+    子图结构指纹: 对源码AST(不含注释、空白与行号)求hash, api调用序列、参数shape、输入spec与dtype相同的子图指纹相同
+    引用__file__的子图行为与路径相关, 指纹中加入路径, 不与其他子图合并
+    :return: str, 源码无法解析时返回None
+    """
+    tree = tree or parse_source(py_path)
+    if tree is None:
+        return None
+    canonical = ast.dump(tree, annotate_fields=False, include_attributes=False)
+    if any(isinstance(node, ast.Name) and node.id == "__file__" for node in ast.walk(tree)):
+        canonical = py_path + canonical
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _dotted_name(node):
+    """ast.Attribute/ast.Name转为a.b.c形式, 无法转换时返回None"""
+    names = []
+    while isinstance(node, ast.Attribute):
+        names.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    names.append(node.id)
+    return ".".join(reversed(names))
+
+
+def parse_calls(py_path, tree=None):
+    """
+    解析子图forward中的调用, 与首行调用序列格式一致
+    :return: list, 例如 ["api:paddle.nn.functional.norm.layer_norm", "method:reshape"]
+    """
+    tree = tree or parse_source(py_path)
+    if tree is None:
+        return []
+    calls = set()
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.FunctionDef) and node.name == "forward"):
+            continue
+        for call in ast.walk(node):
+            if not isinstance(call, ast.Call) or not isinstance(call.func, ast.Attribute):
+                continue
+            name = _dotted_name(call.func)
+            if name is not None and name.startswith("paddle."):
+                calls.add("api:" + name)
+            elif name is not None and name.startswith("self.") and name.count(".") == 1:
+                continue  # 子layer调用
+            else:
+                calls.add("method:" + call.func.attr)
+    return sorted(calls)
+
+
+class LayerRegistry(object):
+    """
+    子图注册表
+    索引内容为 {module_name: {"path", "api", "calls", "mtime", "size", "md5", "fingerprint"}}, 文件变化时自动失效重建
+    子图模块仅在首次访问时通过importlib直接从文件加载, 不会触发上层__init__.py的全量import
+    """
+
+    def __init__(self, index_file=None):
+        """init"""
+        self.index_file = index_file or os.environ.get("PLT_LAYER_INDEX", "plt_layer_index.json")
+        self.index = None
+        self.dirty = False
+        self.modules = {}
+
+    def _load_index(self):
+        """加载磁盘索引"""
+        if self.index is not None:
+            return
+        self.index = {}
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, "r") as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError):
+                self.index = {}
+
+    def save(self):
+        """索引落盘, 先写临时文件再替换, 兼容多进程并发写"""
+        if not self.dirty:
+            return
+        tmp_file = f"{self.index_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump(self.index, f)
+            os.replace(tmp_file, self.index_file)
+            self.dirty = False
+        except OSError:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def _fresh_entry(self, layerfile, py_path):
+        """生成单个子图的索引项"""
+        stat = os.stat(py_path)
+        tree = parse_source(py_path)
+        return {
+            "path": py_path,
+            "api": parse_header(py_path),
+            "calls": parse_calls(py_path, tree=tree),
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "md5": file_md5(py_path),
+            "fingerprint": layer_fingerprint(py_path, tree=tree),
+        }
+
+    def get_entry(self, layerfile):
+        """
+        获取单个子图索引项, 文件mtime/size变化时重建
+        仅mtime变化(例如重新checkout)时比较md5, 内容未变化则只更新mtime
+        :param layerfile: 子图模块名, 例如layercase.demo.SIR_101
+        :return: dict, 子图文件不存在时返回None
+        """
+        self._load_index()
+        py_path = module_to_path(layerfile)
+        if not os.path.exists(py_path):
+            return None
+        stat = os.stat(py_path)
+        entry = self.index.get(layerfile)
+        if (
+            entry is not None
+            and "calls" in entry
+            and entry["size"] == stat.st_size
+            and entry["mtime"] != stat.st_mtime
+            and entry.get("md5") == file_md5(py_path)
+        ):
+            entry["mtime"] = stat.st_mtime
+            self.dirty = True
+        if (
+            entry is None
+            or entry["mtime"] != stat.st_mtime
+            or entry["size"] != stat.st_size
+            or "calls" not in entry  # 旧版本索引
+        ):
+            entry = self._fresh_entry(layerfile, py_path)
+            self.index[layerfile] = entry
+            self.dirty = True
+            if self.modules.pop(layerfile, None) is not None:  # 文件已变化, 丢弃旧模块
+                sys.modules.pop(layerfile, None)
+        return entry
+
+    def build_index(self, py_list):
+        """
+        批量建立索引
+        :param py_list: 子图py文件路径list, 例如CaseSelect.get_py_list的结果
+        """
+        for py_file in py_list:
+            self.get_entry(py_file.replace(".py", "").replace("/", ".").lstrip("."))
+        self.save()
+        return self.index
+
+    def group_by_fingerprint(self, py_list):
+        """
+        按结构指纹对子图分组, 每组只需执行代表子图
+        :param py_list: 子图py文件路径list
+        :return: dict, {代表子图py文件: [同组其余子图py文件]}, 按py_list顺序, 代表子图为组内第一个
+        """
+        groups = {}
+        fingerprint_to_rep = {}
+        for py_file in py_list:
+            entry = self.get_entry(py_file.replace(".py", "").replace("/", ".").lstrip("."))
+            fingerprint = entry.get("fingerprint") if entry is not None else None
+            if fingerprint is not None and fingerprint in fingerprint_to_rep:
+                groups[fingerprint_to_rep[fingerprint]].append(py_file)
+                continue
+            if fingerprint is not None:
+                fingerprint_to_rep[fingerprint] = py_file
+            groups[py_file] = []
+        self.save()
+        return groups
+
+    def get_module(self, layerfile):
+        """
+        按需加载子图模块
+        :param layerfile: 子图模块名, 例如layercase.demo.SIR_101
+        """
+        entry = self.get_entry(layerfile)
+        if layerfile in self.modules:
+            return self.modules[layerfile]
+
+        if entry is None:  # 非py文件形式的子图(如包内定义), 回退到标准import
+            module = importlib.import_module(layerfile)
+        else:
+            spec = importlib.util.spec_from_file_location(layerfile, entry["path"])
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[layerfile] = module
+            try:
+                spec.loader.exec_module(module)
+            except Exception:
+                sys.modules.pop(layerfile, None)
+                raise
+        self.save()
+        self.modules[layerfile] = module
+        return module
+
+
+# 进程内共享的注册表
+layer_registry = LayerRegistry()
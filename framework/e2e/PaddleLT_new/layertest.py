@@ -14,6 +14,7 @@ from strategy.compare import base_compare, infer_compare
 from pltools.yaml_loader import YamlLoader
 from pltools.logger import Logger
 from pltools.res_save import save_tensor, load_tensor, save_pickle
+from pltools.gt_store import save_gt, load_gt, exists_gt
 
 
 class LayerTest(object):
@@ -37,6 +38,8 @@ class LayerTest(object):
 
         self.logger = Logger("PaddleLT")
         self.report_dir = os.path.join(os.getcwd(), "report")
+        # 最近一次性能执行器的耗时分布摘要
+        self.latency = None
 
         self.logger.get_log().info(f"LayerTest.__init__ 中 device_place_id is: {self.device_place_id}")
 
@@ -83,7 +86,9 @@ class LayerTest(object):
             device_place_id=device_place_id,
             upstream_net=upstream_net,
         )
+        self.latency = None
         res = getattr(layer_test, engine)()
+        self.latency = getattr(layer_test, "latency", None)
         return res
 
     def _case_run(self):
@@ -115,7 +120,10 @@ class LayerTest(object):
                     gt_path = os.path.join("plt_gt", os.environ.get("PLT_SET_DEVICE"), testing)
                     if not os.path.exists(gt_path):
                         os.makedirs(gt_path)
-                    save_tensor(res, os.path.join(gt_path, self.title))
+                    if os.environ.get("PLT_GT_FORMAT", "npk") == "tensor":
+                        save_tensor(res, os.path.join(gt_path, self.title))
+                    else:
+                        save_gt(res, os.path.join(gt_path, self.title))
             except Exception:
                 bug_trace = traceback.format_exc()
                 exc_func += 1
@@ -143,7 +151,10 @@ class LayerTest(object):
                 gt_device = baseline_info.get("device")
                 baseline = baseline_info.get("testing")
                 gt_path = os.path.join(gt_dir, gt_device, baseline, self.title)
-                expect = load_tensor(gt_path)
+                if exists_gt(gt_path):  # .npk格式按mmap加载, 无需反序列化
+                    expect = load_gt(gt_path)
+                else:
+                    expect = load_tensor(gt_path)
             else:  # 使用res_dict中的测试结果作为基线
                 baseline = comparing.get("baseline")
                 expect = res_dict[baseline]
@@ -210,6 +221,8 @@ class LayerTest(object):
                 self.logger.get_log().info("性能测试执行器: {}".format(testing))
                 res = self._single_run(testing=testing, layerfile=self.layerfile)
                 res_dict[testing] = res
+                if self.latency is not None:
+                    res_dict[testing + "-latency"] = self.latency
             except Exception:
                 bug_trace = traceback.format_exc()
                 exc += 1
@@ -232,6 +245,8 @@ class LayerTest(object):
                 self.logger.get_log().info("性能测试执行器: {}".format(plt_exc))
                 res = self._single_run(testing=plt_exc, layerfile=self.layerfile)
                 res_dict[plt_exc] = res
+                if self.latency is not None:
+                    res_dict[plt_exc + "-latency"] = self.latency
             except Exception:
                 bug_trace = traceback.format_exc()
                 exc += 1
@@ -0,0 +1,120 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+# @author Zeref996
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+allure结果索引: 每个result json只解析一次, 按子图建立passed/failed/skipped索引, 可随worker执行增量刷新
+"""
+
+import os
+import json
+import threading
+
+FAIL_STATUS = ("failed", "broken")
+
+
+class AllureIndex(object):
+    """
+    allure结果索引
+    同一子图多次执行时(例如double check), 每个测试项只保留最后一次执行结果
+    """
+
+    def __init__(self, report_path, layer_type):
+        """
+        :param report_path: allure结果目录
+        :param layer_type: 子图类型, layerE2Ecase与其他子图在allure结果中的名称字段不同
+        """
+        self.report_path = report_path
+        self.layer_type = layer_type
+        self._lock = threading.Lock()
+        self._parsed_files = set()
+        # {py_file: {test_id: (stop, status)}}
+        self._results = {}
+        self.passed = set()
+        self.failed = set()
+        self.skipped = set()
+
+    def _py_file(self, result):
+        """由allure结果解析出子图路径, 无法识别时返回None"""
+        if self.layer_type == "layerE2Ecase":
+            # layerE2Ecase中allure报告需要抓取的关键字, 与其他子图不一样
+            if "fullName" in result:
+                case_name = result["fullName"]
+                return case_name[: case_name.rfind(".")].replace(".", "/") + ".py"
+            elif "labels" in result:
+                return result["labels"][-1]["value"].replace(".", "/") + ".py"
+            return None
+        if "name" not in result:
+            return None
+        return result["name"].replace("^", "/") + ".py"
+
+    def _add(self, result):
+        """录入单个allure结果, 并更新该子图的状态索引"""
+        py_file = self._py_file(result)
+        if py_file is None:
+            return
+        test_id = result.get("historyId") or result.get("fullName") or result.get("name")
+        stop = result.get("stop") or 0
+        tests = self._results.setdefault(py_file, {})
+        if test_id in tests and tests[test_id][0] > stop:
+            return
+        tests[test_id] = (stop, result.get("status", "unknown"))
+
+        self.passed.discard(py_file)
+        self.failed.discard(py_file)
+        self.skipped.discard(py_file)
+        status_list = [status for _, status in tests.values()]
+        if any(status in FAIL_STATUS for status in status_list):
+            self.failed.add(py_file)
+        elif all(status == "skipped" for status in status_list):
+            self.skipped.add(py_file)
+        else:
+            self.passed.add(py_file)
+
+    def refresh(self):
+        """
+        增量刷新, 只解析上次刷新之后新生成的result json
+        :return: 本次新解析的文件数
+        """
+        if not os.path.exists(self.report_path):
+            return 0
+        count = 0
+        with self._lock:
+            with os.scandir(self.report_path) as it:
+                for entry in it:
+                    if not entry.name.endswith("-result.json") or entry.name in self._parsed_files:
+                        continue
+                    try:
+                        with open(entry.path, "r") as f:
+                            result = json.load(f)
+                    except (OSError, ValueError):
+                        # 文件可能仍在写入, 下次刷新时重试
+                        continue
+                    self._parsed_files.add(entry.name)
+                    self._add(result)
+                    count += 1
+        return count
+
+    def __contains__(self, py_file):
+        """子图是否出现在allure结果中"""
+        return py_file in self._results
+
+    def core_dumps(self, py_list):
+        """
+        allure结果中不包含的子图, 说明该子图出现了core dumps
+        :param py_list: 全部子图列表
+        :return: core dumps子图列表, 保持py_list中的顺序
+        """
+        self.refresh()
+        return [py_file for py_file in py_list if py_file not in self._results]
+
+    def status(self, py_file):
+        """
+        子图状态
+        :return: pass/fail/skip, 未出现在allure结果中(core dumps)时为fail
+        """
+        if py_file in self.failed or py_file not in self._results:
+            return "fail"
+        if py_file in self.skipped:
+            return "skip"
+        return "pass"
@@ -7,12 +7,18 @@ nn.Layer配置相关
 """
 
 import os
+import math
+import hashlib
+import random
+import fnmatch
 
 # import platform
 # import time
 # import pytest
 # import allure
-# from pltools.yaml_loader import YamlLoader
+from generator.layer_registry import layer_registry
+from pltools.logger import Logger
+from pltools.yaml_loader import YamlLoader
 
 
 class CaseSelect(object):
@@ -43,29 +49,162 @@ class CaseSelect(object):
                     yaml_list.append(yaml_path)
         return yaml_list
 
-    def get_py_list(self, base_path, py_list=[]):
+    def get_py_list(self, base_path, py_list=None):
         """递归寻找文件夹内所有的子图py文件路径"""
-        file_list = os.listdir(base_path)
+        if py_list is None:
+            py_list = []
+        ignore_set = set(self.ignore_list) if self.ignore_list else set()
+        self._walk_py(base_path, ignore_set, py_list)
+        return py_list
 
-        for file in file_list:
-            py_path = os.path.join(base_path, file)
+    def _walk_py(self, base_path, ignore_set, py_list):
+        """按目录顺序递归收集子图py文件"""
+        with os.scandir(base_path) as it:
+            entries = list(it)
+        for entry in entries:
+            py_path = os.path.join(base_path, entry.name)
+            if entry.is_dir():
+                self._walk_py(py_path, ignore_set, py_list)
+            elif (
+                entry.name.endswith(".py")
+                and not entry.name.endswith("__init__.py")
+                and not entry.name.endswith("utils.py")
+                and py_path not in ignore_set
+            ):
+                py_list.append(py_path)
+
+
+class ImpactSelect(object):
+    """
+    变更影响选择: 由子图首行调用序列和forward中的调用建立api到子图的倒排索引,
+    只选择受变更api影响的子图, 另外随机抽样少量其余子图保证覆盖
+    """
+
+    def __init__(self, changes, mapping_file=None, sample=0.05, seed=None, commit=""):
+        """
+        :param changes: 变更list, 元素为api(api:paddle.xxx, method:xxx或paddle.xxx)或源码文件路径
+        :param mapping_file: 源码文件到api的映射yaml, {源码文件通配符: [api通配符]}, api为"*"表示全部子图
+        :param sample: 随机抽样的其余子图, 小于1为比例, 大于等于1为个数
+        :param seed: 随机抽样种子, 默认由变更list与commit生成
+        :param commit: 变更对应的commit, 参与生成抽样种子
+        """
+        self.changes = changes
+        self.mapping = {}
+        if mapping_file and os.path.exists(mapping_file):
+            self.mapping = YamlLoader(yml=mapping_file).yml or {}
+        self.sample = sample
+        if seed is None:
+            # 同一变更重复执行时抽样一致, 不同变更抽样不同的其余子图, 多次CI轮换覆盖全部子图
+            key = "\n".join(sorted(changes) + [commit])
+            seed = int(hashlib.md5(key.encode("utf-8")).hexdigest()[:8], 16)
+        self.seed = seed
+        self.logger = Logger("ImpactSelect")
+
+    def build_index(self, py_list):
+        """
+        api到子图的倒排索引
+        :return: {api: [子图py文件]}
+        """
+        index = {}
+        for py_file in py_list:
+            entry = layer_registry.get_entry(py_file.replace(".py", "").replace("/", ".").lstrip("."))
+            if entry is None:
+                continue
+            for api in set(entry["api"]) | set(entry["calls"]):
+                index.setdefault(api, []).append(py_file)
+        layer_registry.save()
+        return index
+
+    def _file_apis(self, file_path):
+        """
+        源码文件对应的api通配符, 先查映射文件, python/paddle下的文件按模块名推导
+        :return: list, 无法推导时返回None
+        """
+        for pattern, apis in self.mapping.items():
+            if fnmatch.fnmatch(file_path, pattern):
+                return list(apis)
+        if file_path.startswith("python/paddle/") and file_path.endswith(".py"):
+            module = file_path[len("python/") : -len(".py")].replace("/", ".")
+            if module.endswith(".__init__"):
+                module = module[: -len(".__init__")]
+            return ["api:" + module + ".*"]
+        return None
 
-            if os.path.isdir(py_path):
-                self.get_py_list(py_path, py_list)
+    def changed_apis(self):
+        """
+        变更对应的api通配符
+        :return: (set, list), 无法推导api的源码文件list
+        """
+        apis = set()
+        unknown = []
+        for change in self.changes:
+            if change.startswith("api:") or change.startswith("method:"):
+                apis.add(change)
+            elif change.startswith("paddle.") and not change.endswith(".py"):
+                apis.add("api:" + change)
             else:
-                if self.ignore_list:
-                    if (
-                        not file.endswith(".py")
-                        or file.endswith("__init__.py")
-                        or file.endswith("utils.py")
-                        or py_path in self.ignore_list
-                    ):
-                        continue
-                    else:
-                        py_list.append(py_path)
+                file_apis = self._file_apis(change)
+                if file_apis is None:
+                    unknown.append(change)
                 else:
-                    if not file.endswith(".py") or file.endswith("__init__.py") or file.endswith("utils.py"):
-                        continue
-                    else:
-                        py_list.append(py_path)
-        return py_list
+                    apis.update(file_apis)
+        return apis, unknown
+
+    def _match_keys(self, api, index):
+        """
+        变更api在索引中匹配的key. 通配符按fnmatch匹配; 否则先精确匹配,
+        再按最后一级名称匹配其他路径下的同名api和同名方法, 例如paddle.matmul匹配api:paddle.tensor.linalg.matmul和method:matmul
+        :return: list
+        """
+        if any(c in api for c in "*?["):
+            return fnmatch.filter(index.keys(), api)
+        if api in index:
+            return [api]
+        name = api.split(":", 1)[-1].split(".")[-1]
+        return [
+            key for key in index if key == "method:" + name or (key.startswith("api:") and key.endswith("." + name))
+        ]
+
+    def select(self, py_list):
+        """
+        选择受影响的子图, 未给出变更, 存在无法推导api的变更或变更api在索引中无匹配时保守地选择全部子图
+        :param py_list: 全部子图py文件list
+        :return: list, 保持py_list中的顺序
+        """
+        apis, unknown = self.changed_apis()
+        if not self.changes or unknown or "*" in apis:
+            self.logger.get_log().warning(f"变更影响选择: 无法确定影响范围的变更{unknown}, 执行全部{len(py_list)}个子图")
+            return py_list
+
+        index = self.build_index(py_list)
+        affected = set()
+        unmatched = []
+        for api in apis:
+            keys = self._match_keys(api, index)
+            if not keys:
+                unmatched.append(api)
+            for key in keys:
+                affected.update(index[key])
+        if unmatched:
+            # 索引中记录的是子图源码中的调用路径, 公开别名与内部路径不一致时无法确定影响范围
+            self.logger.get_log().warning(f"变更影响选择: 变更api{sorted(unmatched)}在索引中无匹配, 执行全部{len(py_list)}个子图")
+            return py_list
+
+        rest = sorted(py_file for py_file in py_list if py_file not in affected)
+        num = int(self.sample) if self.sample >= 1 else math.ceil(len(rest) * self.sample)
+        sampled = set(random.Random(self.seed).sample(rest, min(num, len(rest))))
+        self.logger.get_log().info(
+            f"变更影响选择: 变更api {sorted(apis)}, 受影响{len(affected)}个, 抽样{len(sampled)}个, 共{len(py_list)}个子图"
+        )
+        return [py_file for py_file in py_list if py_file in affected or py_file in sampled]
+
+
+def read_changes(changes):
+    """
+    读取变更list
+    :param changes: 变更文件路径(每行一个api或源码文件)或逗号分隔的变更
+    """
+    if os.path.isfile(changes):
+        with open(changes, "r") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [item.strip() for item in changes.split(",") if item.strip()]
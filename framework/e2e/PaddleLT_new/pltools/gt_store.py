@@ -0,0 +1,167 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+# @author Zeref996
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+ground truth存储: 每个子图的嵌套输出打包为一个.npk文件, 无需反序列化pickle, 加载时按偏移量mmap映射各个数组
+文件格式: MAGIC(8B) + 头长度(uint64, 8B) + json头 + 按ALIGN对齐的各数组原始数据
+json头: {"version", "tree": 嵌套结构, 数组位置以{"__array__": i}占位, "arrays": [{"offset", "nbytes", "dtype", "shape", "checksum"}]}
+"""
+
+import os
+import json
+import struct
+import hashlib
+
+import numpy as np
+
+MAGIC = b"PLTGT\x00\x01\x00"
+VERSION = 1
+ALIGN = 64
+SUFFIX = ".npk"
+
+
+class GTStoreError(Exception):
+    """ground truth文件损坏或者校验失败"""
+
+
+def _aligned(n):
+    """向上对齐到ALIGN"""
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _raw_bytes(array):
+    """数组的原始字节视图, 不拷贝"""
+    return np.ascontiguousarray(array).reshape(-1).view(np.uint8)
+
+
+def _checksum(array):
+    """数组内容校验和"""
+    return hashlib.blake2b(_raw_bytes(array), digest_size=16).hexdigest()
+
+
+def _to_numpy(obj):
+    """paddle/torch Tensor转为numpy, 非Tensor返回None"""
+    if isinstance(obj, np.ndarray):
+        return obj
+    if isinstance(obj, np.generic):
+        return np.asarray(obj)
+    if hasattr(obj, "numpy") and hasattr(obj, "shape"):
+        if hasattr(obj, "detach"):
+            obj = obj.detach()
+        if hasattr(obj, "cpu"):
+            obj = obj.cpu()
+        return np.asarray(obj.numpy())
+    return None
+
+
+def _encode(obj, arrays):
+    """嵌套结构编码为可json序列化的tree, 数组追加到arrays中"""
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if isinstance(obj, list):
+        return [_encode(item, arrays) for item in obj]
+    if isinstance(obj, tuple):
+        return {"__tuple__": [_encode(item, arrays) for item in obj]}
+    if isinstance(obj, dict):
+        return {"__dict__": [[_encode(k, arrays), _encode(v, arrays)] for k, v in obj.items()]}
+    array = _to_numpy(obj)
+    if array is None or array.dtype.hasobject:
+        raise TypeError(f"ground truth not support data type: {type(obj)}")
+    arrays.append(np.require(array, requirements="C"))  # ascontiguousarray会把0维数组变为1维
+    return {"__array__": len(arrays) - 1}
+
+
+def _decode(tree, arrays):
+    """由tree还原嵌套结构"""
+    if isinstance(tree, list):
+        return [_decode(item, arrays) for item in tree]
+    if isinstance(tree, dict):
+        if "__array__" in tree:
+            return arrays[tree["__array__"]]
+        if "__tuple__" in tree:
+            return tuple(_decode(item, arrays) for item in tree["__tuple__"])
+        return {_decode(k, arrays): _decode(v, arrays) for k, v in tree["__dict__"]}
+    return tree
+
+
+def save_gt(data, filename):
+    """
+    保存ground truth, 先写临时文件再替换, 多进程同时写同一子图时结果完整
+    :param data: 嵌套输出, 支持dict/list/tuple/Tensor/np.ndarray/标量/str/None
+    :param filename: 不含后缀的文件路径
+    """
+    arrays = []
+    tree = _encode(data, arrays)
+    meta = []
+    offset = 0
+    for array in arrays:
+        meta.append(
+            {
+                "offset": offset,
+                "nbytes": array.nbytes,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "checksum": _checksum(array),
+            }
+        )
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({"version": VERSION, "tree": tree, "arrays": meta}).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    save_name = filename + SUFFIX
+    tmp_name = f"{save_name}.{os.getpid()}.tmp"
+    with open(tmp_name, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for array, item in zip(arrays, meta):
+            f.seek(data_start + item["offset"])
+            f.write(_raw_bytes(array))
+    os.replace(tmp_name, save_name)
+
+
+def _read_header(load_name):
+    """读取json头以及数据区起始位置"""
+    with open(load_name, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise GTStoreError(f"{load_name} is not a PaddleLT ground truth file")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    if header.get("version") != VERSION:
+        raise GTStoreError(f"{load_name} version {header.get('version')} not support")
+    return header, _aligned(len(MAGIC) + 8 + header_len)
+
+
+def load_gt(filename, verify=None):
+    """
+    加载ground truth, 数组为只读mmap, 不会整体读入内存
+    :param filename: 不含后缀的文件路径
+    :param verify: 是否校验数组checksum, 默认读取PLT_GT_VERIFY
+    :return: 与保存时结构一致的数据, Tensor还原为np.ndarray
+    """
+    if verify is None:
+        verify = os.environ.get("PLT_GT_VERIFY", "True") == "True"
+    load_name = filename + SUFFIX
+    header, data_start = _read_header(load_name)
+    file_size = os.path.getsize(load_name)
+    arrays = []
+    for i, item in enumerate(header["arrays"]):
+        dtype = np.dtype(item["dtype"])
+        shape = tuple(item["shape"])
+        if item["nbytes"] == 0:
+            array = np.empty(shape, dtype=dtype)
+        else:
+            if data_start + item["offset"] + item["nbytes"] > file_size:
+                raise GTStoreError(f"{load_name} array {i} is truncated")
+            array = np.memmap(load_name, dtype=dtype, mode="r", offset=data_start + item["offset"], shape=shape or (1,))
+            array = array.reshape(shape)  # 0维数组memmap不支持, 映射后再reshape
+        if verify and _checksum(array) != item["checksum"]:
+            raise GTStoreError(f"{load_name} array {i} checksum mismatch")
+        arrays.append(array)
+    return _decode(header["tree"], arrays)
+
+
+def exists_gt(filename):
+    """是否存在.npk格式的ground truth"""
+    return os.path.exists(filename + SUFFIX)
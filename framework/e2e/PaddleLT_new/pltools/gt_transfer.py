@@ -0,0 +1,365 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+# @author Zeref996
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+ground truth传输: 基于manifest.json中的文件hash只传输有变化的文件, 有界线程池并发, 下载支持断点续传
+远端可以是本地目录(或file://), http(s)地址, 或bos路径(上传走UploadBos, 读取走对应的https地址)
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+PART_SUFFIX = ".part"
+CHUNK_SIZE = 1 << 20
+
+
+def file_md5(file_path):
+    """文件md5, 与bos简单上传的ETag一致"""
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def file_sha256(file_path):
+    """文件sha256"""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def local_manifest(local_dir):
+    """
+    本地目录的manifest, 文件hash按(mtime, size)缓存在目录下的.gt_manifest_cache.json中, 未变化的文件不重复计算
+    :return: {name: {"size", "sha256"}}, 忽略.开头的文件以及未完成的.part文件
+    """
+    cache_file = os.path.join(local_dir, ".gt_manifest_cache.json")
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    files = {}
+    new_cache = {}
+    with os.scandir(local_dir) as it:
+        for entry in it:
+            if not entry.is_file() or entry.name.startswith(".") or entry.name.endswith(PART_SUFFIX):
+                continue
+            stat = entry.stat()
+            stamp = cache.get(entry.name)
+            if stamp is not None and stamp[0] == stat.st_mtime and stamp[1] == stat.st_size:
+                sha = stamp[2]
+            else:
+                sha = file_sha256(entry.path)
+            new_cache[entry.name] = [stat.st_mtime, stat.st_size, sha]
+            files[entry.name] = {"size": stat.st_size, "sha256": sha}
+    if new_cache != cache:
+        _atomic_write(cache_file, json.dumps(new_cache).encode("utf-8"))
+    return files
+
+
+def _atomic_write(file_path, content):
+    """先写临时文件再替换"""
+    tmp_file = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(content)
+    os.replace(tmp_file, file_path)
+
+
+class LocalRemote(object):
+    """
+    本地目录作为远端, 用于离线测试或共享盘
+    """
+
+    def __init__(self, root):
+        """:param root: 远端目录"""
+        self.root = root[len("file://") :] if root.startswith("file://") else root
+
+    def read(self, name):
+        """读取小文件(manifest), 不存在时返回None"""
+        try:
+            with open(os.path.join(self.root, name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def stat(self, name):
+        """远端文件信息, 不存在时返回None"""
+        file_path = os.path.join(self.root, name)
+        if not os.path.isfile(file_path):
+            return None
+        return {"size": os.path.getsize(file_path), "etag": None}
+
+    def fetch(self, name, part_path):
+        """从part_path已有的长度处续传"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        with open(os.path.join(self.root, name), "rb") as src, open(part_path, "ab") as dst:
+            src.seek(offset)
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+    def push(self, file_path, name):
+        """上传单个文件, 先写临时文件再替换, 中断时远端不会出现不完整的文件"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_file = os.path.join(self.root, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copyfile(file_path, tmp_file)
+        os.replace(tmp_file, os.path.join(self.root, name))
+
+
+class HttpRemote(object):
+    """
+    http(s)远端, 下载时通过Range请求续传; 配置bos_path时通过UploadBos上传
+    """
+
+    def __init__(self, base_url, bos_path=None, timeout=60):
+        """
+        :param base_url: 例如https://paddle-qa.bj.bcebos.com/PaddleLT/PaddleLTGroundTruth/latest/gpu/dy_eval
+        :param bos_path: 上传使用的bos路径, 例如paddle-qa/PaddleLT/PaddleLTGroundTruth/latest/gpu/dy_eval
+        """
+        self.base_url = base_url.rstrip("/")
+        self.bos_path = bos_path
+        self.timeout = timeout
+        self._uploader = None
+
+    def read(self, name):
+        """读取小文件(manifest), 不存在时返回None"""
+        r = requests.get(f"{self.base_url}/{name}", timeout=self.timeout)
+        if r.status_code in (403, 404):
+            return None
+        r.raise_for_status()
+        return r.content
+
+    def stat(self, name):
+        """HEAD获取远端文件大小和ETag, 不存在时返回None"""
+        r = requests.head(f"{self.base_url}/{name}", timeout=self.timeout)
+        if r.status_code in (403, 404):
+            return None
+        r.raise_for_status()
+        size = r.headers.get("Content-Length")
+        return {"size": int(size) if size is not None else None, "etag": r.headers.get("ETag", "").strip('"')}
+
+    def fetch(self, name, part_path):
+        """从part_path已有的长度处续传, 服务端不支持Range时重新下载"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset > 0 else {}
+        with requests.get(f"{self.base_url}/{name}", headers=headers, stream=True, timeout=self.timeout) as r:
+            if r.status_code == 416:  # part文件已完整
+                return
+            r.raise_for_status()
+            mode = "ab" if offset > 0 and r.status_code == 206 else "wb"
+            with open(part_path, mode) as f:
+                for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+
+    def push(self, file_path, name):
+        """通过UploadBos上传, bos的object key为文件名"""
+        if self.bos_path is None:
+            raise Exception(f"{self.base_url} is read only, bos_path is not set")
+        if self._uploader is None:
+            from pltools.upload_bos import UploadBos
+
+            self._uploader = UploadBos()
+        if os.path.basename(file_path) != name:
+            tmp_dir = tempfile.mkdtemp()
+            try:
+                tmp_file = os.path.join(tmp_dir, name)
+                shutil.copyfile(file_path, tmp_file)
+                self._uploader.upload_to_bos(bos_path=self.bos_path, file_path=tmp_file)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        else:
+            self._uploader.upload_to_bos(bos_path=self.bos_path, file_path=file_path)
+
+
+def open_remote(path):
+    """
+    根据路径构造远端
+    :param path: 本地目录/file://目录, http(s)地址, 或者bos路径(bucket/key前缀)
+    """
+    if path.startswith("http://") or path.startswith("https://"):
+        return HttpRemote(base_url=path)
+    if path.startswith("file://") or os.path.isabs(path) or os.path.isdir(path):
+        return LocalRemote(root=path)
+    bucket, _, key = path.partition("/")
+    return HttpRemote(base_url=f"https://{bucket}.bj.bcebos.com/{key}", bos_path=path)
+
+
+def read_manifest(remote):
+    """读取远端manifest, 不存在时返回None"""
+    content = remote.read(MANIFEST)
+    if content is None:
+        return None
+    return json.loads(content.decode("utf-8"))["files"]
+
+
+def _run_pool(func, items, workers):
+    """
+    有界线程池执行, 单个文件失败不影响其他文件
+    :return: (成功list, {name: 异常})
+    """
+    done = []
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(func, item): item for item in items}
+        for future, item in futures.items():
+            try:
+                future.result()
+                done.append(item)
+            except Exception as e:
+                failed[item] = e
+    return done, failed
+
+
+def _workers(workers):
+    """并发数, 默认读取PLT_GT_TRANSFER_WORKERS"""
+    if workers is None:
+        workers = int(os.environ.get("PLT_GT_TRANSFER_WORKERS", 8))
+    return workers
+
+
+def _check_legacy(remote, local_dir, name, local_info):
+    """
+    无manifest时检查本地文件是否与远端一致, 不一致时抛出异常
+    ETag为32位md5时比较内容(bos简单上传), 否则只比较大小
+    """
+    info = remote.stat(name)
+    if info is None:  # 远端已不存在, 保留本地文件
+        return
+    if info["size"] is not None and info["size"] != local_info["size"]:
+        raise Exception(f"{name} size mismatch")
+    etag = info["etag"]
+    if etag and len(etag) == 32 and "-" not in etag and etag != file_md5(os.path.join(local_dir, name)):
+        raise Exception(f"{name} etag mismatch")
+
+
+def sync_download(remote, local_dir, names=None, workers=None, retry=3):
+    """
+    下载远端有变化的文件到local_dir
+    远端有manifest时, 只下载本地缺失或者hash不一致的文件并校验hash;
+    无manifest时(旧版本真值)没有hash, 本地已有的文件与远端大小/ETag一致时才跳过, 否则重新下载names
+    下载先写入.part文件, 中断后重跑从.part处续传, 完成后再改名; 无manifest时无法校验续传结果, 不续传上次残留的.part
+    :param remote: LocalRemote/HttpRemote
+    :param names: 需要的文件名过滤函数或list, None表示全部
+    :return: {"transferred": [...], "skipped": [...], "failed": {name: 异常}}
+    """
+    os.makedirs(local_dir, exist_ok=True)
+    remote_files = read_manifest(remote)
+    local_files = local_manifest(local_dir)
+
+    if remote_files is None:
+        if names is None or callable(names):
+            raise Exception("remote has no manifest, names list is needed")
+        wanted = list(names)
+        expect = {}
+        fresh, _ = _run_pool(
+            lambda name: _check_legacy(remote, local_dir, name, local_files[name]),
+            [name for name in wanted if name in local_files],
+            _workers(workers),
+        )
+        fresh = set(fresh)
+        todo = [name for name in wanted if name not in fresh]
+    else:
+        if callable(names):
+            wanted = [name for name in remote_files if names(name)]
+        elif names is not None:
+            wanted = [name for name in names if name in remote_files]
+        else:
+            wanted = list(remote_files)
+        expect = {name: remote_files[name]["sha256"] for name in wanted}
+        todo = [name for name in wanted if local_files.get(name, {}).get("sha256") != expect[name]]
+    todo_set = set(todo)
+    skipped = [name for name in wanted if name not in todo_set]
+
+    def _download(name):
+        """单个文件下载, 失败后从断点处重试"""
+        part_path = os.path.join(local_dir, name + PART_SUFFIX)
+        if name not in expect and os.path.exists(part_path):
+            os.remove(part_path)
+        for i in range(retry):
+            try:
+                remote.fetch(name, part_path)
+            except Exception:
+                if i == retry - 1:
+                    raise
+                continue
+            if name in expect and file_sha256(part_path) != expect[name]:
+                os.remove(part_path)  # 内容错误则不再续传, 从头下载
+                if i == retry - 1:
+                    raise Exception(f"{name} sha256 mismatch")
+                continue
+            os.replace(part_path, os.path.join(local_dir, name))
+            return
+
+    transferred, failed = _run_pool(_download, todo, _workers(workers))
+    return {"transferred": transferred, "skipped": skipped, "failed": failed}
+
+
+def sync_upload(local_dir, remote, workers=None, retry=3):
+    """
+    上传local_dir中相对远端manifest有变化的文件, 全部成功后再更新远端manifest
+    已上传成功的文件记录在本地.gt_upload_journal中, 中断后重跑不会重复上传
+    :return: {"transferred": [...], "skipped": [...], "failed": {name: 异常}}
+    """
+    local_files = local_manifest(local_dir)
+    remote_files = read_manifest(remote) or {}
+
+    journal_file = os.path.join(local_dir, ".gt_upload_journal")
+    remote_id = getattr(remote, "bos_path", None) or getattr(remote, "base_url", None) or remote.root
+    uploaded = {}
+    if os.path.exists(journal_file):
+        with open(journal_file, "r") as f:
+            for line in f:
+                item = line.rstrip("\n").split("\t")
+                if len(item) == 3 and item[0] == remote_id:
+                    uploaded[item[1]] = item[2]
+
+    todo = []
+    skipped = []
+    for name, info in local_files.items():
+        if remote_files.get(name, {}).get("sha256") == info["sha256"] or uploaded.get(name) == info["sha256"]:
+            skipped.append(name)
+        else:
+            todo.append(name)
+
+    lock = threading.Lock()
+
+    def _upload(name):
+        """单个文件上传, 成功后写入journal"""
+        for i in range(retry):
+            try:
+                remote.push(os.path.join(local_dir, name), name)
+                break
+            except Exception:
+                if i == retry - 1:
+                    raise
+        with lock:
+            with open(journal_file, "a") as f:
+                f.write(f"{remote_id}\t{name}\t{local_files[name]['sha256']}\n")
+
+    transferred, failed = _run_pool(_upload, todo, _workers(workers))
+    if not failed:
+        # manifest最后上传, 远端manifest中的文件一定已经上传完整
+        manifest = {"version": MANIFEST_VERSION, "files": {**remote_files, **local_files}}
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            manifest_file = os.path.join(tmp_dir, MANIFEST)
+            with open(manifest_file, "w") as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            remote.push(manifest_file, MANIFEST)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        if os.path.exists(journal_file):
+            os.remove(journal_file)
+    return {"transferred": transferred, "skipped": skipped, "failed": failed}
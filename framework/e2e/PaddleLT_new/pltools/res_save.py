@@ -7,10 +7,8 @@
 """
 
 import os
-import shutil
 import tarfile
 import pickle
-import requests
 import wget
 import pandas as pd
 
@@ -37,7 +35,11 @@ def xlsx_save(sublayer_dict, excel_file):
     for key, sub_dict in sublayer_dict.items():
         row = {"sub_layer": key}
         for subkey, value in sub_dict.items():
-            row[subkey] = value
+            if isinstance(value, dict):  # 耗时分布摘要等字典展开为多列
+                for item_key, item_value in value.items():
+                    row[subkey + "^" + item_key] = item_value
+            else:
+                row[subkey] = value
         data.append(row)
 
     # 创建 DataFrame
@@ -120,20 +122,6 @@ def wget_sth(gt_url):
     wget.download(gt_url)
 
 
-def download_sth(gt_url, output_path):
-
-    """
-    下载文件到指定路径
-
-    :param gt_url: 文件URL
-    :param output_path: 文件保存路径
-    """
-    with requests.get(gt_url, stream=True) as r:
-        r.raise_for_status()
-        with open(output_path, "wb") as f:
-            shutil.copyfileobj(r.raw, f)
-
-
 def create_tar_gz(file_path, source_dir):
     """
     创建一个gzip压缩的tar文件(.tar.gz)
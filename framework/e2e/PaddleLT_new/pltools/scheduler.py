@@ -0,0 +1,238 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+# @author Zeref996
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+基于历史耗时的子图调度: 有历史的子图按LPT(最长耗时优先)装箱分配到各个worker, 无历史的子图放入共享队列动态领取
+"""
+
+import os
+import json
+import time
+import heapq
+import multiprocessing
+from collections import deque
+
+
+class CaseHistory(object):
+    """
+    子图历史耗时记录, 按测试项目(testing yaml)区分
+    文件格式: {testing: {py_file: {"time": 平滑后耗时(s), "peak_mem": 峰值内存(MB), "count": 记录次数}}}
+    """
+
+    def __init__(self, testing, path=None, alpha=0.5):
+        """
+        :param testing: 测试项目yaml, 不同测试项目的子图耗时分开记录
+        :param path: 历史记录文件路径, 默认读取PLT_CASE_HISTORY
+        :param alpha: 新耗时的平滑权重
+        """
+        self.testing = testing
+        self.path = path or os.environ.get("PLT_CASE_HISTORY", "plt_case_history.json")
+        self.alpha = alpha
+        self.records = self._load().get(self.testing, {})
+
+    def _load(self):
+        """读取历史记录文件, 文件不存在或损坏时视为无历史"""
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get_time(self, py_file):
+        """获取子图历史耗时, 无历史时返回None"""
+        record = self.records.get(py_file)
+        if record is None:
+            return None
+        return record["time"]
+
+    def update(self, timing_dict):
+        """
+        合并本轮子图耗时
+        :param timing_dict: {py_file: {"time": 耗时(s), "peak_mem": 峰值内存(MB) or None}}
+        """
+        for py_file, timing in timing_dict.items():
+            record = self.records.get(py_file)
+            if record is None:
+                self.records[py_file] = {"time": timing["time"], "peak_mem": timing.get("peak_mem"), "count": 1}
+                continue
+            record["time"] = self.alpha * timing["time"] + (1 - self.alpha) * record["time"]
+            if timing.get("peak_mem") is not None:
+                record["peak_mem"] = max(record.get("peak_mem") or 0, timing["peak_mem"])
+            record["count"] += 1
+
+    def save(self):
+        """写回历史记录文件, 保留其他测试项目的记录, 先写临时文件再替换"""
+        all_records = self._load()
+        all_records[self.testing] = self.records
+        tmp_file = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump(all_records, f, indent=1, sort_keys=True)
+            os.replace(tmp_file, self.path)
+        except OSError:
+            pass
+
+
+def lpt_assign(py_list, n, history):
+    """
+    LPT装箱: 有历史耗时的子图按耗时从大到小, 依次分配给当前总耗时最小的worker
+    :param py_list: 子图列表
+    :param n: worker数
+    :param history: CaseHistory
+    :return: (bins, unknown_list)
+        bins: 长度为n的list, 每个元素为分配给该worker的子图list, 按耗时从大到小排列
+        unknown_list: 无历史耗时的子图, 由各worker从共享队列中动态领取
+    """
+    known_list = []
+    unknown_list = []
+    for py_file in py_list:
+        cost = history.get_time(py_file)
+        if cost is None:
+            unknown_list.append(py_file)
+        else:
+            known_list.append((cost, py_file))
+    known_list.sort(key=lambda item: item[0], reverse=True)
+
+    bins = [[] for _ in range(n)]
+    heap = [(0.0, i) for i in range(n)]
+    for cost, py_file in known_list:
+        load, i = heapq.heappop(heap)
+        bins[i].append(py_file)
+        heapq.heappush(heap, (load + cost, i))
+    return bins, unknown_list
+
+
+class SharedCaseQueue(object):
+    """
+    跨进程共享的子图队列, 子进程fork后通过共享计数器领取下一个子图, 同时支持进程内多线程领取
+    """
+
+    def __init__(self, py_list):
+        """
+        :param py_list: 子图列表, 需在fork子进程之前创建
+        """
+        self.py_list = list(py_list)
+        self.index = multiprocessing.Value("i", 0)
+
+    def pop(self):
+        """领取下一个子图, 队列为空时返回None"""
+        with self.index.get_lock():
+            i = self.index.value
+            if i >= len(self.py_list):
+                return None
+            self.index.value = i + 1
+        return self.py_list[i]
+
+
+class CaseScheduler(object):
+    """
+    单个worker的子图来源: 先执行LPT分配给自己的子图, 再从共享队列中领取无历史的子图
+    """
+
+    def __init__(self, assigned_list, shared_queue):
+        """
+        :param assigned_list: LPT分配给该worker的子图list
+        :param shared_queue: SharedCaseQueue
+        """
+        self.assigned = deque(assigned_list)
+        self.shared_queue = shared_queue
+
+    def next_case(self):
+        """获取下一个子图, 全部执行完毕时返回None"""
+        try:
+            return self.assigned.popleft()
+        except IndexError:
+            return self.shared_queue.pop()
+
+
+def schedule(py_list, n, history):
+    """
+    生成n个worker的调度器, 需在fork子进程之前调用
+    PLT_CASE_SCHEDULE=round_robin时退化为原有的按顺序轮流划分
+    :return: list of CaseScheduler
+    """
+    if os.environ.get("PLT_CASE_SCHEDULE", "lpt") == "round_robin":
+        bins = [py_list[i::n] for i in range(n)]
+        unknown_list = []
+    else:
+        bins, unknown_list = lpt_assign(py_list=py_list, n=n, history=history)
+    shared_queue = SharedCaseQueue(unknown_list)
+    return [CaseScheduler(assigned_list=bins[i], shared_queue=shared_queue) for i in range(n)]
+
+
+def reset_peak_mem():
+    """
+    重置当前进程的峰值内存(VmHWM), 需要linux 4.0及以上
+    :return: 是否重置成功
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def read_peak_mem():
+    """当前进程自上次重置以来的峰值内存(MB), 无法获取时返回None"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def wait_child(proc, timeout=None):
+    """
+    等待子进程结束, 通过os.wait4只回收该子进程并获取其rusage, 多个线程并发执行子进程时互不影响
+    linux下ru_maxrss包含该子进程已回收的后代进程(例如shell启动的pytest)
+    :param proc: subprocess.Popen
+    :param timeout: 超时时间(秒), None表示不限时
+    :return: (exit_code, 峰值内存(MB)), 超时返回(None, None), 此时子进程仍在运行
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        pid, status, rusage = os.wait4(proc.pid, 0 if deadline is None else os.WNOHANG)
+        if pid != 0:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return proc.returncode, rusage.ru_maxrss / 1024  # linux下ru_maxrss单位为KB
+        if time.monotonic() >= deadline:
+            return None, None
+        time.sleep(0.05)
+
+
+class CaseTimer(object):
+    """
+    记录单个子图的耗时以及峰值内存
+    子图在子进程中执行时由调用方根据wait_child的结果设置peak_mem;
+    在当前进程内依次执行时(in_process=True)进入时重置进程峰值内存, 退出时读取
+    """
+
+    def __init__(self, in_process=False):
+        """
+        :param in_process: 子图是否在当前进程内执行, 同一进程内不能并发执行多个子图
+        """
+        self.in_process = in_process
+        self.start = None
+        self.cost = None
+        self.peak_mem = None
+
+    def __enter__(self):
+        if self.in_process and not reset_peak_mem():
+            self.in_process = False  # 无法重置时进程峰值内存不能反映单个子图, 不记录
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cost = time.perf_counter() - self.start
+        if self.in_process:
+            self.peak_mem = read_peak_mem()
+        return False
+
+    def record(self):
+        """返回可合并进CaseHistory的记录"""
+        return {"time": self.cost, "peak_mem": self.peak_mem}
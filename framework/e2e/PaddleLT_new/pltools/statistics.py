@@ -6,6 +6,7 @@
 常用统计学计算策略
 """
 
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 from strategy.compare import base_compare
@@ -54,6 +55,30 @@ def best_top_k(data_list, ratio=0.2):
     return res
 
 
+def latency_sketch(data_list, scale=1, ndigits=6):
+    """
+    耗时分布的定长摘要, 与单值统计结果一同保存, 用于对比尾部耗时
+    :param data_list: 输入的data list, 多次试验的结果集合
+    :param scale: 缩放倍数, 与单值统计结果保持同一量纲
+    :param ndigits: 保留小数位数
+    :return: {"n", "mean", "std", "p50", "p90", "p99", "max"}
+    """
+    data = np.asarray(data_list, dtype="float64") * scale
+    p50, p90, p99 = np.percentile(data, [50, 90, 99])
+    res = {
+        "n": len(data_list),
+        "mean": float(data.mean()),
+        "std": float(data.std()),
+        "p50": float(p50),
+        "p90": float(p90),
+        "p99": float(p99),
+        "max": float(data.max()),
+    }
+    for key in ("mean", "std", "p50", "p90", "p99", "max"):
+        res[key] = round(res[key], ndigits)
+    return res
+
+
 # list等分
 def split_list(lst, n):
     """
@@ -176,6 +201,39 @@ def gsb_count_rule(res, single_gsb_dict={"G": 0, "S": 0, "B": 0, "error": 0}):
     return single_gsb_dict
 
 
+def tail_compare_keys(compare):
+    """
+    对比项对应的尾部耗时对比key, 分位点由PLT_BM_TAIL设定
+    :param compare: yaml配置中的单个对比项目
+    :return: list, 例如['dy2st_eval_cinn_perf^dy_eval_perf^p99_compare']
+    """
+    if compare["baseline"] == "ground_truth":
+        prefix = compare["latest"] + "^"
+    else:
+        prefix = compare["latest"] + "^" + compare["baseline"] + "^"
+    return [prefix + tail.strip() + "_compare" for tail in os.environ.get("PLT_BM_TAIL", "p99").split(",")]
+
+
+def sublayer_tail_gate(compare_dict, compare_list, gate):
+    """
+    尾部耗时门禁, 找出尾部耗时下降超过gate的子图
+    :param compare_dict: perf_compare_dict结果
+    :param gate: 可容忍的尾部耗时下降比例, 例如0.3表示尾部耗时增加30%以上判为不通过
+    :return: {尾部耗时对比key: [子图]}, 只包含有不通过子图的key
+    """
+    gate_dict = {}
+    for layer_name, perf_dict in compare_dict.items():
+        for compare in compare_list:
+            for tail_key in tail_compare_keys(compare):
+                try:
+                    res = float(perf_dict[tail_key].rstrip("%")) / 100
+                except Exception:
+                    continue
+                if res <= -gate:
+                    gate_dict.setdefault(tail_key, []).append(layer_name)
+    return gate_dict
+
+
 def sublayer_perf_gsb_gen(compare_dict, compare_list):
     """
     性能比率gsb生成
@@ -212,6 +270,13 @@ def sublayer_perf_gsb_gen(compare_dict, compare_list):
                 )
                 gsb_dict[compare["latest"] + "^" + compare["baseline"] + "^" + "compare"] = single_gsb_dict
 
+            # 尾部耗时gsb, 只统计有耗时分布摘要的子图
+            for tail_key in tail_compare_keys(compare):
+                if tail_key in perf_dict:
+                    if tail_key not in gsb_dict:
+                        gsb_dict[tail_key] = {"G": 0, "S": 0, "B": 0, "error": 0}
+                    gsb_dict[tail_key] = gsb_ratio_rule(res=perf_dict[tail_key], single_gsb_dict=gsb_dict[tail_key])
+
     for key, value in gsb_dict.items():
         all_num = value["G"] + value["S"] + value["B"]
         gsb_dict[key]["G_ratio"] = f"{round(value['G'] / all_num * 100, 2)}%"
@@ -0,0 +1,182 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+# @author Zeref996
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+常驻预热进程池: 每个worker只import一次框架, 之后通过管道接收子图并在进程内执行pytest
+"""
+
+import os
+import queue
+import shutil
+import multiprocessing
+
+from pltools.logger import Logger
+from pltools.scheduler import reset_peak_mem, read_peak_mem
+
+
+def _warm_up():
+    """
+    worker启动时预先加载框架以及pytest相关模块, 后续case无需重复import
+    """
+    if os.environ.get("FRAMEWORK") == "paddle":
+        import paddle  # noqa: F401
+    elif os.environ.get("FRAMEWORK") == "torch":
+        import torch  # noqa: F401
+
+    import pytest  # noqa: F401
+    import allure  # noqa: F401
+    import layertest  # noqa: F401
+
+
+def _worker_main(conn):
+    """
+    worker主循环, 从管道中读取pytest参数, 进程内执行后把exit code以及该子图的峰值内存写回
+    :param conn: multiprocessing.Pipe的子进程端
+    """
+    import pytest
+
+    _warm_up()
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        copy_src, copy_dst, pytest_args = job
+        # 每个子图执行前重置进程峰值内存, 执行后读取即为该子图的峰值内存
+        track_mem = reset_peak_mem()
+        try:
+            if copy_src is not None:
+                shutil.copy(copy_src, copy_dst)
+            exit_code = int(pytest.main(pytest_args))
+        except BaseException:  # pytest.main内部异常也视为失败, 但保持worker存活
+            exit_code = 1
+        conn.send((exit_code, read_peak_mem() if track_mem else None))
+    conn.close()
+
+
+class WarmWorker(object):
+    """
+    单个常驻worker进程
+    """
+
+    def __init__(self, ctx):
+        """init"""
+        self.ctx = ctx
+        self.task_count = 0
+        self.peak_mem = None
+        self.proc = None
+        self.conn = None
+        self.start()
+
+    def start(self):
+        """启动worker并等待其完成预热"""
+        parent_conn, child_conn = self.ctx.Pipe()
+        self.proc = self.ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.proc.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.task_count = 0
+        self.conn.recv()  # 阻塞至worker import完成
+
+    def alive(self):
+        """worker是否存活"""
+        return self.proc is not None and self.proc.is_alive()
+
+    def kill(self):
+        """强制结束worker"""
+        if self.proc is not None and self.proc.is_alive():
+            self.proc.kill()
+        if self.proc is not None:
+            self.proc.join()
+        if self.conn is not None:
+            self.conn.close()
+
+    def stop(self):
+        """正常关闭worker"""
+        try:
+            self.conn.send(None)
+            self.proc.join(timeout=10)
+        except (BrokenPipeError, OSError):
+            pass
+        self.kill()
+
+    def run(self, job, timeout=None):
+        """
+        执行单个pytest任务
+        :param job: (copy_src, copy_dst, pytest_args)
+        :param timeout: 超时时间(秒), None表示不限时
+        :return: exit_code, worker崩溃时返回子进程退出码, 超时返回-1. 正常结束时peak_mem为该子图的峰值内存(MB)
+        """
+        self.task_count += 1
+        self.peak_mem = None
+        try:
+            self.conn.send(job)
+            if self.conn.poll(timeout):
+                exit_code, self.peak_mem = self.conn.recv()
+                return exit_code
+            self.kill()
+            return -1
+        except (EOFError, BrokenPipeError, OSError):
+            # worker崩溃(如core dump), 用其退出码标记失败
+            self.proc.join()
+            exit_code = self.proc.exitcode
+            return exit_code if exit_code else 1
+
+
+class WarmWorkerPool(object):
+    """
+    常驻预热worker池, 配合ThreadPoolExecutor使用, 每个线程独占一个worker执行单个子图
+    worker崩溃或超时后会被重新拉起, 对应子图记为失败, 不会出现在allure报告中, 仍按core dumps统计
+    隔离性: 同一worker内的子图在同一进程中执行pytest.main, 框架全局状态(flags, 默认dtype, 随机种子,
+    静态图/动态图模式, 显存池, 已加载的模块等)会残留到后续子图, 一个子图的修改可能影响之后子图的结果.
+    max_tasks越小隔离越好, 但重启worker需要重新import框架; 需要完全隔离时关闭常驻worker池, 每个子图独立启动进程
+    """
+
+    def __init__(self, worker_num, max_tasks=0):
+        """
+        :param worker_num: worker进程数
+        :param max_tasks: 单个worker最多执行的子图数, 超过后重启以释放显存/内存以及残留的全局状态, 0表示不限制
+        """
+        self.logger = Logger("PLTWorkerPool")
+        self.ctx = multiprocessing.get_context("spawn")
+        self.max_tasks = max_tasks
+        self.workers = queue.Queue()
+        self.all_workers = []
+        for _ in range(worker_num):
+            worker = WarmWorker(self.ctx)
+            self.all_workers.append(worker)
+            self.workers.put(worker)
+        self.logger.get_log().info(f"常驻worker池启动完成, worker数量: {worker_num}")
+
+    def submit(self, job, timeout=None):
+        """
+        借用一个空闲worker执行任务, 执行完归还
+        :return: (exit_code, 峰值内存(MB) or None)
+        """
+        worker = self.workers.get()
+        try:
+            exit_code = worker.run(job, timeout=timeout)
+            peak_mem = worker.peak_mem
+            if not worker.alive():
+                self.logger.get_log().warning(f"worker异常退出, exit code: {exit_code}, 重新拉起worker")
+                self._respawn(worker)
+            elif self.max_tasks and worker.task_count >= self.max_tasks:
+                worker.stop()
+                self._respawn(worker)
+        finally:
+            self.workers.put(worker)
+        return exit_code, peak_mem
+
+    def _respawn(self, worker):
+        """重新拉起worker"""
+        worker.kill()
+        worker.start()
+
+    def close(self):
+        """关闭所有worker"""
+        for worker in self.all_workers:
+            worker.stop()
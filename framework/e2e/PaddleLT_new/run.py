@@ -6,7 +6,9 @@
 测试执行器
 """
 import os
+import copy
 import shutil
+import tempfile
 import subprocess
 from subprocess import TimeoutExpired
 import multiprocessing
@@ -16,16 +18,21 @@ from datetime import datetime
 import pandas as pd
 import layertest
 from db.layer_db import LayerBenchmarkDB
+from generator.layer_registry import layer_registry
 from strategy.compare import perf_compare_dict, perf_compare_kernel_dict
-from pltools.case_select import CaseSelect
+from pltools.case_select import CaseSelect, ImpactSelect, read_changes
 from pltools.logger import Logger
 from pltools.yaml_loader import YamlLoader
-from pltools.json_loader import JSONLoader
-from pltools.res_save import xlsx_save, download_sth, create_tar_gz, extract_tar_gz, load_pickle, save_txt
+from pltools.res_save import xlsx_save, create_tar_gz, extract_tar_gz, load_pickle, save_txt
 from pltools.nv_tool import get_nv_memory
 from pltools.upload_bos import UploadBos
-from pltools.statistics import split_list, sublayer_perf_gsb_gen, kernel_perf_gsb_gen, sublayer_perf_ratio_gen
+from pltools.statistics import sublayer_perf_gsb_gen, kernel_perf_gsb_gen, sublayer_perf_ratio_gen, sublayer_tail_gate
 from pltools.alarm import Alarm
+from pltools.worker_pool import WarmWorkerPool
+from pltools.scheduler import CaseHistory, CaseTimer, schedule, wait_child
+from pltools.allure_index import AllureIndex
+from pltools.gt_transfer import open_remote, read_manifest, sync_download, sync_upload
+from pltools.gt_store import SUFFIX as GT_SUFFIX
 
 
 class Run(object):
@@ -56,16 +63,46 @@ class Run(object):
             if not item in self.py_list:
                 self.py_list.append(item)
 
+        # 预先建立子图索引, 各worker按需加载子图模块
+        layer_registry.build_index(self.py_list)
+
+        # 变更影响选择: 只执行受变更api影响的子图以及少量随机抽样子图
+        if os.environ.get("PLT_CASE_SELECT", "all") == "impact":
+            self.py_list = ImpactSelect(
+                changes=read_changes(os.environ.get("PLT_IMPACT_CHANGES", "")),
+                mapping_file=os.environ.get("PLT_IMPACT_MAP", os.path.join("yaml", "impact_map.yml")),
+                sample=float(os.environ.get("PLT_IMPACT_SAMPLE", "0.05")),
+                commit=os.environ.get("PLT_IMPACT_COMMIT", ""),
+            ).select(self.py_list)
+
+        # 结构指纹相同的子图只执行代表子图, 结果扩展到同组其余子图. run_py_list为实际执行的子图
+        self.case_groups = {}
+        self.run_py_list = self.py_list
+        if os.environ.get("PLT_CASE_DEDUP", "False") == "True":
+            groups = layer_registry.group_by_fingerprint(self.py_list)
+            self.case_groups = {py_file: dup_list for py_file, dup_list in groups.items() if dup_list}
+            self.run_py_list = list(groups)
+
         self.testing = os.environ.get("TESTING")
         self.py_cmd = os.environ.get("python_ver")
         self.report_dir = os.path.join(os.getcwd(), "report")
+        # allure结果索引, 每个result json只解析一次, 随子图执行增量刷新
+        self.allure_index = AllureIndex(report_path=self.report_dir, layer_type=self.layer_type)
 
         self.logger = Logger("PaddleLTRun")
+        if self.case_groups:
+            self.logger.get_log().info(
+                f"子图结构去重: 共{len(self.py_list)}个子图, 实际执行{len(self.run_py_list)}个, "
+                f"{len(self.case_groups)}组重复子图复用代表子图结果"
+            )
         self.AGILE_PIPELINE_BUILD_ID = os.environ.get("AGILE_PIPELINE_BUILD_ID", 0)
         self.now_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         self.storage = "apibm_config.yml"
 
+        # 常驻预热worker池, 仅在多线程精度测试且PLT_WARM_WORKER=True时启用
+        self.worker_pool = None
+
         if os.environ.get("FRAMEWORK") == "paddle":
             import paddle
 
@@ -86,17 +123,48 @@ class Run(object):
             plt_gt_device = plt_gt_download_url.split("/")[-1]
             # if not os.path.exists(os.path.join("plt_gt_baseline", plt_gt_device)):
             #     os.makedirs(os.path.join("plt_gt_baseline", plt_gt_device))
+            # 每个测试项目按manifest增量并发下载, 远端无manifest(旧版本真值)时按子图名下载本地缺失的文件
+            # 子图去重时下载同组全部子图的真值, 代表子图缺少真值时使用同组其余子图的真值
+            case_names = set()
+            for py_file in self.py_list:
+                case_names.add(py_file.replace(".py", "").replace("/", "^").replace(".", "^"))
             for testing in YamlLoader(yml=self.testing).get_junior_name("testings"):
-                if not os.path.exists(os.path.join("plt_gt_baseline", plt_gt_device, testing)):
-                    os.makedirs(os.path.join("plt_gt_baseline", plt_gt_device, testing))
-                for py_file in self.py_list:
-                    case_name = py_file.replace(".py", "").replace("/", "^").replace(".", "^")
-                    self.logger.get_log().info(f"开始下载plt_gt: {case_name}")
-                    gt_url = f"{plt_gt_download_url}/{testing}/{case_name}.tensor"
-                    download_sth(
-                        gt_url=gt_url,
-                        output_path=os.path.join("plt_gt_baseline", plt_gt_device, testing, f"{case_name}.tensor"),
-                    )
+                gt_dir = os.path.join("plt_gt_baseline", plt_gt_device, testing)
+                remote = open_remote(f"{plt_gt_download_url}/{testing}")
+                manifest = read_manifest(remote)
+                if manifest is None:
+                    # 旧版本远端只有逐个子图的.tensor文件, LayerTest在缺少.npk时回退到load_tensor
+                    names = sorted(case_name + ".tensor" for case_name in case_names)
+                else:
+                    names = [name for name in manifest if os.path.splitext(name)[0] in case_names]
+                res = sync_download(remote=remote, local_dir=gt_dir, names=names)
+                self.logger.get_log().info(
+                    f"plt_gt {testing} 下载{len(res['transferred'])}个, 无变化跳过{len(res['skipped'])}个"
+                )
+                for name, e in res["failed"].items():
+                    self.logger.get_log().warning(f"plt_gt {testing}/{name} 下载失败: {e}")
+                self._gt_group_copy(gt_dir=gt_dir, to_members=False)
+
+    def _gt_group_copy(self, gt_dir, to_members):
+        """
+        结构指纹相同的子图共享真值, 代表子图变化(增删子图, 子图修改)后真值仍然可用
+        :param to_members: True时将代表子图的真值复制给同组其余子图(上传前), 远端按子图保存完整真值;
+                           False时代表子图缺少真值, 从同组其余子图复制(下载后)
+        """
+        for py_file, dup_list in self.case_groups.items():
+            title = py_file.replace(".py", "").replace("/", "^").replace(".", "^")
+            dup_titles = [dup_file.replace(".py", "").replace("/", "^").replace(".", "^") for dup_file in dup_list]
+            for suffix in (GT_SUFFIX, ".tensor"):
+                src = os.path.join(gt_dir, title + suffix)
+                if to_members:
+                    if os.path.exists(src):
+                        for dup_title in dup_titles:
+                            shutil.copyfile(src, os.path.join(gt_dir, dup_title + suffix))
+                elif not os.path.exists(src):
+                    for dup_title in dup_titles:
+                        if os.path.exists(os.path.join(gt_dir, dup_title + suffix)):
+                            shutil.copyfile(os.path.join(gt_dir, dup_title + suffix), src)
+                            break
 
     def _exit_code_txt(self, error_count, error_list):
         """"""
@@ -118,6 +186,27 @@ class Run(object):
             self.logger.get_log().info("测试通过, 无报错子图-。-")
             os.system("echo 0 > exit_code.txt")
 
+    def _fan_out(self, error_count, error_list, sublayer_dict=None):
+        """
+        将代表子图的结果扩展到结构指纹相同的其余子图, 报告与数据库中每个子图仍单独记录
+        :return: error_count, error_list, sublayer_dict
+        """
+        if not self.case_groups:
+            return error_count, error_list, sublayer_dict
+        fan_error_list = list(error_list)
+        for py_file in error_list:
+            fan_error_list.extend(self.case_groups.get(py_file, []))
+        if sublayer_dict is not None:
+            sublayer_dict = dict(sublayer_dict)
+            for py_file, dup_list in self.case_groups.items():
+                title = py_file.replace(".py", "").replace("/", "^").replace(".", "^")
+                if title not in sublayer_dict:
+                    continue
+                for dup_file in dup_list:
+                    dup_title = dup_file.replace(".py", "").replace("/", "^").replace(".", "^")
+                    sublayer_dict[dup_title] = copy.deepcopy(sublayer_dict[title])
+        return error_count + len(fan_error_list) - len(error_list), fan_error_list, sublayer_dict
+
     def _db_interact(self, sublayer_dict, error_list):
         """Database interaction"""
         # 数据库交互
@@ -159,17 +248,21 @@ class Run(object):
         """精度groundtruth上传"""
         upload_url = os.environ.get("PLT_GT_UPLOAD_URL")
         if not upload_url == "None":
-            _upload = UploadBos()
             self.logger.get_log().info(f"上传plt_gt的路径为: {os.environ.get('PLT_GT_UPLOAD_URL')}")
             for device in os.listdir("plt_gt"):
                 device_path = os.path.join("plt_gt", device)
                 for testing in os.listdir(device_path):
-                    testing_path = os.path.join(device_path, testing)
-                    for tensor in os.listdir(testing_path):
-                        _upload.upload_to_bos(
-                            bos_path=os.path.join(upload_url, device, testing),
-                            file_path=os.path.join(testing_path, tensor),
-                        )
+                    self._gt_group_copy(gt_dir=os.path.join(device_path, testing), to_members=True)
+                    # 只上传相对远端manifest有变化的文件, 中断后重跑从未完成的文件继续
+                    res = sync_upload(
+                        local_dir=os.path.join(device_path, testing),
+                        remote=open_remote(os.path.join(upload_url, device, testing)),
+                    )
+                    self.logger.get_log().info(
+                        f"plt_gt {device}/{testing} 上传{len(res['transferred'])}个, 无变化跳过{len(res['skipped'])}个"
+                    )
+                    for name, e in res["failed"].items():
+                        self.logger.get_log().warning(f"plt_gt {device}/{testing}/{name} 上传失败: {e}")
 
     def _perf_upload(self):
         """性能表格/图表/原始数据上传"""
@@ -211,22 +304,76 @@ class Run(object):
                 # f"pickle下载链接: https://paddle-qa.bj.bcebos.com/{bos_path}/pickle.tar",
             )
 
-    def _single_pytest_run(self, py_file, testing, device_place_id=0):
-        """run one test"""
+    def _warm_pool_start(self):
+        """启动常驻预热worker池"""
+        if os.environ.get("PLT_WARM_WORKER", "False") == "True":
+            self.worker_pool = WarmWorkerPool(
+                worker_num=int(os.environ.get("MULTI_WORKER", 13)),
+                max_tasks=int(os.environ.get("PLT_WARM_WORKER_MAX_TASKS", 20)),
+            )
+
+    def _warm_pool_close(self):
+        """关闭常驻预热worker池"""
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+            self.worker_pool = None
+
+    def _warm_pytest_run(self, py_file, title, testing, device_place_id=0):
+        """
+        通过常驻预热worker执行单个子图, 省去每个子图的python解释器启动和import开销
+        :return: (exit_code, 峰值内存(MB) or None)
+        """
+        timeout = os.environ.get("PLT_PYTEST_TIMEOUT")
+        if self.layer_type == "layerE2Ecase":
+            copy_src, copy_dst = None, None
+            pytest_args = [py_file, f"--alluredir={self.report_dir}"]
+        else:
+            copy_src, copy_dst = "PaddleLT.py", f"{title}.py"
+            pytest_args = [
+                f"{title}.py",
+                f"--title={title}",
+                f"--layerfile={py_file}",
+                f"--testing={testing}",
+                f"--device_place_id={device_place_id}",
+                f"--alluredir={self.report_dir}",
+            ]
+        if timeout == "None":
+            timeout = None
+        else:
+            pytest_args.append(f"--timeout={timeout}")
+            timeout = float(timeout)
+
+        exit_code, peak_mem = self.worker_pool.submit(job=(copy_src, copy_dst, pytest_args), timeout=timeout)
+        if exit_code == -1:
+            self.logger.get_log().warning(f"{py_file} Command timed out after {timeout} seconds")
+        elif exit_code != 0:
+            self.logger.get_log().warning(f"{py_file} Command failed with return code {exit_code}")
+        return exit_code, peak_mem
+
+    def _single_pytest_run(self, py_file, testing, device_place_id=0, timer=None):
+        """
+        run one test
+        :param timer: CaseTimer, 不为None时记录该子图进程的峰值内存
+        """
         title = py_file.replace(".py", "").replace("/", "^").replace(".", "^")
         self.logger.get_log().info(f"开始测试子图 {title}, 准备执行pytest命令~~")
 
-        if os.environ.get("PLT_PYTEST_TIMEOUT") == "None":
+        # 子进程通过wait_child回收, 峰值内存只统计本子图的进程, 不受其他线程并发执行的子图影响
+        peak_mem = None
+        if self.worker_pool is not None:
+            exit_code, peak_mem = self._warm_pytest_run(
+                py_file=py_file, title=title, testing=testing, device_place_id=device_place_id
+            )
+        elif os.environ.get("PLT_PYTEST_TIMEOUT") == "None":
             if self.layer_type == "layerE2Ecase":
-                exit_code = os.system(f"{self.py_cmd} -m pytest {py_file} --alluredir={self.report_dir}")
+                cmd = f"{self.py_cmd} -m pytest {py_file} --alluredir={self.report_dir}"
             else:
-                exit_code = os.system(
+                cmd = (
                     "cp -r PaddleLT.py {}.py && "
                     "{} -m pytest {}.py --title={} --layerfile={} --testing={} "
-                    "--device_place_id={} --alluredir={}".format(
-                        title, self.py_cmd, title, title, py_file, testing, device_place_id, self.report_dir
-                    )
-                )
+                    "--device_place_id={} --alluredir={}"
+                ).format(title, self.py_cmd, title, title, py_file, testing, device_place_id, self.report_dir)
+            exit_code, peak_mem = wait_child(subprocess.Popen(cmd, shell=True))
         else:
             timeout = os.environ.get("PLT_PYTEST_TIMEOUT")
             if self.layer_type == "layerE2Ecase":
@@ -238,24 +385,30 @@ class Run(object):
                     "--device_place_id={} --alluredir={} --timeout={}"
                 ).format(title, self.py_cmd, title, title, py_file, testing, device_place_id, self.report_dir, timeout)
 
-            # 使用subprocess执行命令并设置超时
-            proc = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            try:
-                stdout, stderr = proc.communicate(timeout=float(timeout))
-                exit_code = proc.returncode
-                self.logger.get_log().warning(f"{py_file} Command failed with return code {exit_code}")
-                # 如果进程正常结束，stdout 和 stderr 将包含输出
-                if stdout:
-                    self.logger.get_log().info(stdout.decode())  # 注意：输出是字节串，需要解码为字符串
-                if stderr:
-                    self.logger.get_log().warning(stderr.decode())  # 注意：错误输出也是字节串，需要解码为字符串
-                if exit_code != 0:
+            # 使用subprocess执行命令并设置超时, 输出写入临时文件, 由wait_child回收子进程以获取峰值内存
+            with tempfile.TemporaryFile() as out_file, tempfile.TemporaryFile() as err_file:
+                proc = subprocess.Popen(cmd, shell=True, stdout=out_file, stderr=err_file)
+                exit_code, peak_mem = wait_child(proc, timeout=float(timeout))
+                if exit_code is not None:
                     self.logger.get_log().warning(f"{py_file} Command failed with return code {exit_code}")
-            except subprocess.TimeoutExpired:
-                self.logger.get_log().warning(f"{py_file} Command timed out after {timeout} seconds")
-                proc.terminate()  # 发送 SIGTERM 信号到进程
-                exit_code = -1
+                    out_file.seek(0)
+                    stdout = out_file.read()
+                    err_file.seek(0)
+                    stderr = err_file.read()
+                    # 如果进程正常结束，stdout 和 stderr 将包含输出
+                    if stdout:
+                        self.logger.get_log().info(stdout.decode())  # 注意：输出是字节串，需要解码为字符串
+                    if stderr:
+                        self.logger.get_log().warning(stderr.decode())  # 注意：错误输出也是字节串，需要解码为字符串
+                    if exit_code != 0:
+                        self.logger.get_log().warning(f"{py_file} Command failed with return code {exit_code}")
+                else:
+                    self.logger.get_log().warning(f"{py_file} Command timed out after {timeout} seconds")
+                    proc.terminate()  # 发送 SIGTERM 信号到进程
+                    exit_code = -1
 
+        if timer is not None:
+            timer.peak_mem = peak_mem
         self.logger.get_log().info(f"完成测试子图 {title}, 完成执行pytest命令~~")
         if exit_code != 0:
             return py_file, exit_code
@@ -266,6 +419,7 @@ class Run(object):
         error_list = []
         error_count = 0
 
+        self._warm_pool_start()
         with ThreadPoolExecutor(max_workers=int(os.environ.get("MULTI_WORKER", 13))) as executor:
             # 提交任务给线程池
             futures = [executor.submit(self._single_pytest_run, py_file, self.testing) for py_file in py_list]
@@ -276,10 +430,13 @@ class Run(object):
                 if _exit_code is not None:
                     error_list.append(_py_file)
                     error_count += 1
+                self.allure_index.refresh()
+        self._warm_pool_close()
 
         if os.environ.get("MULTI_DOUBLE_CHECK") == "False":
             if not os.environ.get("PLT_GT_UPLOAD_URL") == "None":
                 self._gt_upload()
+            error_count, error_list, _ = self._fan_out(error_count=error_count, error_list=error_list)
             self._exit_code_txt(error_count=error_count, error_list=error_list)
         else:
             self.logger.get_log().info("对于多线程失败case, 进入double check环节: ")
@@ -288,32 +445,36 @@ class Run(object):
     def _multi_gpu_multithread_test_run(self, py_list):
         """multithread run some test"""
         ######################################################
-        def _queue_run(py_list, device_place_id, result_queue):
+        def _queue_run(scheduler, device_place_id, result_queue):
             # def _queue_run(py_list, py_dict, result_queue):
             """
             multi run main
             """
             error_list = []
             error_count = 0
+            timing_dict = {}
+
+            def _thread_run():
+                """单个线程持续领取子图, 直至本卡分配的子图以及共享队列均执行完毕"""
+                py_file = scheduler.next_case()
+                while py_file is not None:
+                    with CaseTimer() as timer:
+                        _py_file, _exit_code = self._single_pytest_run(py_file, self.testing, 0, timer=timer)
+                    timing_dict[py_file] = timer.record()
+                    if _exit_code is not None:
+                        error_list.append(_py_file)
+                    py_file = scheduler.next_case()
 
             os.environ["CUDA_VISIBLE_DEVICES"] = str(device_place_id)
+            self._warm_pool_start()  # worker在设定CUDA_VISIBLE_DEVICES后拉起, 以绑定到当前卡
             with ThreadPoolExecutor(max_workers=int(os.environ.get("MULTI_WORKER", 13))) as executor:
-                # 提交任务给线程池
-                # futures = [
-                #     executor.submit(self._single_pytest_run, py_file, self.testing, py_dict[py_file])
-                #     for py_file in py_list
-                # ]
-
-                futures = [executor.submit(self._single_pytest_run, py_file, self.testing, 0) for py_file in py_list]
-
-                # 等待任务完成，并收集返回值
+                futures = [executor.submit(_thread_run) for _ in range(int(os.environ.get("MULTI_WORKER", 13)))]
                 for future in futures:
-                    _py_file, _exit_code = future.result()
-                    if _exit_code is not None:
-                        error_list.append(_py_file)
-                        error_count += 1
+                    future.result()
+            self._warm_pool_close()
+            error_count = len(error_list)
 
-            result_queue.put((error_list, error_count))
+            result_queue.put((error_list, error_count, timing_dict))
 
         ######################################################
 
@@ -323,32 +484,38 @@ class Run(object):
 
         # py_dict = {item: i % len(device_list) for i, item in enumerate(py_list)}
 
-        multiprocess_cases = split_list(lst=self.py_list, n=len(device_list))
+        # 有历史耗时的子图按LPT分配到各卡, 无历史的子图由各卡从共享队列中动态领取
+        history = CaseHistory(testing=self.testing)
+        schedulers = schedule(py_list=self.run_py_list, n=len(device_list), history=history)
         processes = []
         result_queue = multiprocessing.Queue()
 
-        for i, cases_list in enumerate(multiprocess_cases):
+        for i, scheduler in enumerate(schedulers):
             self.logger.get_log().info(f"multiprocess_cases中i: {i}")
             self.logger.get_log().info(f"multiprocess_cases中device_list: {device_list}")
             self.logger.get_log().info(f"multiprocess_cases中device_list[i]: {device_list[i]}")
-            process = multiprocessing.Process(target=_queue_run, args=(cases_list, device_list[i], result_queue))
+            process = multiprocessing.Process(target=_queue_run, args=(scheduler, device_list[i], result_queue))
             # process = multiprocessing.Process(target=_queue_run, args=(cases_list, py_dict, result_queue))
             process.start()
             processes.append(process)
 
-        for process in processes:
-            process.join()
-
+        # 先取结果再join, 避免队列数据较大时子进程阻塞在put上
         error_list = []
         error_count = 0
-        while not result_queue.empty():
-            single_error_list, single_error_count = result_queue.get()
+        for _ in processes:
+            single_error_list, single_error_count, single_timing_dict = result_queue.get()
             error_list.extend(single_error_list)
             error_count += single_error_count
+            history.update(single_timing_dict)
+
+        for process in processes:
+            process.join()
+        history.save()
 
         if os.environ.get("MULTI_DOUBLE_CHECK") == "False":
             if not os.environ.get("PLT_GT_UPLOAD_URL") == "None":
                 self._gt_upload()
+            error_count, error_list, _ = self._fan_out(error_count=error_count, error_list=error_list)
             self._exit_code_txt(error_count=error_count, error_list=error_list)
         else:
             self.logger.get_log().info("对于多线程失败case, 进入double check环节: ")
@@ -387,7 +554,6 @@ class Run(object):
 
     def _test_run(self, py_list):
         """run some test"""
-        sublayer_dict = {}
         error_list = []
         error_count = 0
         for py_file in py_list:
@@ -397,12 +563,21 @@ class Run(object):
             if _exit_code is not None:
                 error_list.append(_py_file)
                 error_count += 1
-                prec_dict = {self.testing: "fail"}
-            else:
-                prec_dict = {self.testing: "pass"}
+            self.allure_index.refresh()
 
+        # 精度结果由allure索引给出, 进程返回码非0或allure结果为失败/缺失(core dumps)均判为fail
+        error_set = set(error_list)
+        sublayer_dict = {}
+        for py_file in py_list:
             title = py_file.replace(".py", "").replace("/", "^").replace(".", "^")
-            sublayer_dict[title] = prec_dict
+            if py_file in error_set or self.allure_index.status(py_file) == "fail":
+                sublayer_dict[title] = {self.testing: "fail"}
+            else:
+                sublayer_dict[title] = {self.testing: "pass"}
+
+        error_count, error_list, sublayer_dict = self._fan_out(
+            error_count=error_count, error_list=error_list, sublayer_dict=sublayer_dict
+        )
 
         if not os.environ.get("PLT_GT_UPLOAD_URL") == "None":
             self._gt_upload()
@@ -418,7 +593,7 @@ class Run(object):
         需要处理cpu绑核以及gpu并行
         """
 
-        def _queue_run(py_list, device_id, result_queue):
+        def _queue_run(scheduler, device_id, result_queue):
             """
             multi run main
             """
@@ -426,50 +601,63 @@ class Run(object):
             sublayer_dict = {}
             error_count = 0
             error_list = []
-            for py_file in py_list:
+            timing_dict = {}
+            py_file = scheduler.next_case()
+            while py_file is not None:
                 title = py_file.replace(".py", "").replace("/", "^").replace(".", "^")
-                single_test = layertest.LayerTest(title=title, layerfile=py_file, testing=self.testing)
-                perf_dict, exit_code = single_test._perf_case_run()
+                with CaseTimer(in_process=True) as timer:  # 每个进程内依次执行子图
+                    single_test = layertest.LayerTest(title=title, layerfile=py_file, testing=self.testing)
+                    perf_dict, exit_code = single_test._perf_case_run()
+                timing_dict[py_file] = timer.record()
 
                 # 报错的子图+engine将不会收录进sublayer_dict
                 if exit_code != 0:
                     error_list.append(py_file)
                     error_count += 1
-                    continue
-
-                sublayer_dict[title] = perf_dict
+                else:
+                    sublayer_dict[title] = perf_dict
+                py_file = scheduler.next_case()
 
             # error_dict = self._run_main(all_cases=all_cases, loops=loops, base_times=base_times)
 
-            result_queue.put(sublayer_dict, error_list, error_count)
+            result_queue.put((sublayer_dict, error_list, error_count, timing_dict))
 
-        multiprocess_cases = split_list(lst=self.py_list, n=int(os.environ.get("MULTI_WORKER")))
+        # 有历史耗时的子图按LPT分配到各进程, 无历史的子图由各进程从共享队列中动态领取
+        history = CaseHistory(testing=self.testing)
+        schedulers = schedule(py_list=self.run_py_list, n=int(os.environ.get("MULTI_WORKER")), history=history)
         processes = []
         result_queue = multiprocessing.Queue()
 
-        for i, cases_list in enumerate(multiprocess_cases):
-            process = multiprocessing.Process(target=_queue_run, args=(cases_list, i, result_queue))
+        for i, scheduler in enumerate(schedulers):
+            process = multiprocessing.Process(target=_queue_run, args=(scheduler, i, result_queue))
             process.start()
             # os.sched_setaffinity(process.pid, {self.core_index + i})
             processes.append(process)
 
-        for process in processes:
-            process.join()
-
+        # 先取结果再join, 避免队列数据较大时子进程阻塞在put上
         sublayer_dict = {}
         error_list = []
         error_count = 0
         compare_list = YamlLoader(yml=self.testing).yml.get("compare")
-        while not result_queue.empty():
-            single_sublayer_dict, single_error_list, single_error_count = result_queue.get()
+        for _ in processes:
+            single_sublayer_dict, single_error_list, single_error_count, single_timing_dict = result_queue.get()
             sublayer_dict.update(single_sublayer_dict)
             error_list.extend(single_error_list)
             error_count += single_error_count
+            history.update(single_timing_dict)
+
+        for process in processes:
+            process.join()
+        history.save()
+
+        error_count, error_list, sublayer_dict = self._fan_out(
+            error_count=error_count, error_list=error_list, sublayer_dict=sublayer_dict
+        )
 
         self._exit_code_txt(error_count=error_count, error_list=error_list)
 
         baseline_dict, baseline_layer_type = self._db_interact(sublayer_dict=sublayer_dict, error_list=error_list)
-        self._perf_report_gen(
+        tail_gate_count = self._perf_report_gen(
             compare_list=compare_list,
             baseline_dict=baseline_dict,
             sublayer_dict=sublayer_dict,
@@ -479,7 +667,7 @@ class Run(object):
         )
 
         self._perf_upload()
-        self._pts_callback(error_count)
+        self._pts_callback(error_count + tail_gate_count)
 
     def _perf_test_run(self):
         """run some test"""
@@ -487,7 +675,7 @@ class Run(object):
         error_count = 0
         error_list = []
         compare_list = YamlLoader(yml=self.testing).yml.get("compare")
-        for py_file in self.py_list:
+        for py_file in self.run_py_list:
             if os.environ.get("PLT_BM_ERROR_CHECK") == "True":  # 先跑功能看是否能通过
                 _py_file, _exit_code = self._single_pytest_run(
                     py_file=py_file, testing="yaml/pre-dy2stcinn_train_bm.yml"
@@ -509,10 +697,14 @@ class Run(object):
 
             sublayer_dict[title] = perf_dict
 
+        error_count, error_list, sublayer_dict = self._fan_out(
+            error_count=error_count, error_list=error_list, sublayer_dict=sublayer_dict
+        )
+
         self._exit_code_txt(error_count=error_count, error_list=error_list)
 
         baseline_dict, baseline_layer_type = self._db_interact(sublayer_dict=sublayer_dict, error_list=error_list)
-        self._perf_report_gen(
+        tail_gate_count = self._perf_report_gen(
             compare_list=compare_list,
             baseline_dict=baseline_dict,
             sublayer_dict=sublayer_dict,
@@ -522,7 +714,7 @@ class Run(object):
         )
 
         self._perf_upload()
-        self._pts_callback(error_count)
+        self._pts_callback(error_count + tail_gate_count)
 
     def _perf_unit_test_run(self):
         """run some test"""
@@ -536,7 +728,7 @@ class Run(object):
         error_list = []
         testings_list = YamlLoader(yml=self.testing).get_junior_name("testings")
         compare_list = YamlLoader(yml=self.testing).yml.get("compare")
-        for py_file in self.py_list:
+        for py_file in self.run_py_list:
             perf_dict = {}
             for plt_exc in testings_list:
                 title = py_file.replace(".py", "").replace("/", "^").replace(".", "^")
@@ -612,13 +804,19 @@ class Run(object):
                     self.logger.get_log().info(f"kernel count is {kernel_count}")
                 else:
                     perf_dict[plt_exc] = loaded_data[0][plt_exc]
+                    if plt_exc + "-latency" in loaded_data[0]:
+                        perf_dict[plt_exc + "-latency"] = loaded_data[0][plt_exc + "-latency"]
 
             sublayer_dict[title] = perf_dict
 
+        error_count, error_list, sublayer_dict = self._fan_out(
+            error_count=error_count, error_list=error_list, sublayer_dict=sublayer_dict
+        )
+
         self._exit_code_txt(error_count=error_count, error_list=error_list)
 
         baseline_dict, baseline_layer_type = self._db_interact(sublayer_dict=sublayer_dict, error_list=error_list)
-        self._perf_report_gen(
+        tail_gate_count = self._perf_report_gen(
             compare_list=compare_list,
             baseline_dict=baseline_dict,
             sublayer_dict=sublayer_dict,
@@ -628,14 +826,16 @@ class Run(object):
         )
 
         self._perf_upload()
-        self._pts_callback(error_count)
+        self._pts_callback(error_count + tail_gate_count)
 
     def _perf_report_gen(
         self, compare_list, baseline_dict, sublayer_dict, error_list, baseline_layer_type, latest_layer_type
     ):
         """
         精度对比策略
+        :return: 尾部耗时门禁未通过的子图数
         """
+        tail_gate_list = []
         if baseline_layer_type != "none" and (
             os.environ.get("PLT_BM_MODE") == "latest_as_baseline" or os.environ.get("PLT_BM_MODE") == "latest"
         ):
@@ -661,7 +861,19 @@ class Run(object):
                 gsb_dict = sublayer_perf_gsb_gen(compare_dict=compare_dict, compare_list=compare_list)
                 ratio_dict = sublayer_perf_ratio_gen(compare_dict=compare_dict, compare_list=compare_list)
                 for key, value in gsb_dict.items():
-                    gsb_dict[key] = {**gsb_dict[key], **ratio_dict[key]}
+                    gsb_dict[key] = {**gsb_dict[key], **ratio_dict.get(key, {})}
+                if os.environ.get("PLT_BM_TAIL_GATE", "None") != "None":
+                    tail_gate_dict = sublayer_tail_gate(
+                        compare_dict=compare_dict,
+                        compare_list=compare_list,
+                        gate=float(os.environ.get("PLT_BM_TAIL_GATE")),
+                    )
+                    save_txt(data=tail_gate_dict, filename="tail_gate_dict")
+                    tail_gate_list = sorted({layer for layer_list in tail_gate_dict.values() for layer in layer_list})
+                    if tail_gate_list:
+                        # 尾部耗时门禁未通过时任务失败, 未通过的子图计入失败子图数
+                        self.logger.get_log().warning(f"尾部耗时门禁未通过的子图: {tail_gate_dict}")
+                        os.system("echo 7 > exit_code.txt")
             save_txt(data=gsb_dict, filename="gsb_dict")
             xlsx_save(
                 sublayer_dict=compare_dict,
@@ -672,6 +884,7 @@ class Run(object):
                 sublayer_dict=sublayer_dict,
                 excel_file=os.environ.get("TESTING").replace("yaml/", "").replace(".yml", "") + ".xlsx",
             )
+        return len(tail_gate_list)
 
     def _core_dumps_case_count(self, report_path):
         """
@@ -681,43 +894,12 @@ class Run(object):
         if not os.path.exists(report_path):
             return []
 
-        allure_case_list = []
-        # sub_case_list = [] # 用于单个py文件中多个case统计
-        for json_file in os.listdir(report_path):
-            if json_file.endswith("-result.json"):
-                # layerE2Ecase中allure报告需要抓取的关键字, 与其他子图不一样
-                if self.layer_type == "layerE2Ecase":
-                    if "fullName" in JSONLoader(os.path.join(report_path, json_file)).json_dict():
-                        case_name = JSONLoader(os.path.join(report_path, json_file)).json_dict()["fullName"]
-                        layer_name = case_name[: case_name.rfind(".")]
-                        allure_case_list.append(layer_name.replace(".", "/") + ".py")
-                    elif "labels" in JSONLoader(os.path.join(report_path, json_file)).json_dict():
-                        layer_name = JSONLoader(os.path.join(report_path, json_file)).json_dict()["labels"][-1]["value"]
-                        allure_case_list.append(layer_name.replace(".", "/") + ".py")
-
-                    # # layer_name = JSONLoader(os.path.join(report_path, json_file)).json_dict()["labels"][-1]["value"]
-                    # # allure_case_list.append(layer_name.replace(".", "/") + ".py")
-                    # case_name = JSONLoader(os.path.join(report_path, json_file)).json_dict()["fullName"]
-                    # layer_name = case_name[:case_name.rfind('.')]
-                    # allure_case_list.append(layer_name.replace(".", "/") + ".py")
-                    # # sub_case_list.append(case_name)
-                else:
-                    layer_name = JSONLoader(os.path.join(report_path, json_file)).json_dict()["name"]
-                    allure_case_list.append(layer_name.replace("^", "/") + ".py")
-
-        all_case_list = []
-        # 将./layercase/sublayer1000/Det_cases/gfl_gflv2_r50_fpn_1x_coco/SIR_173.py
-        # 转换为layercase^sublayer1000^Det_cases^gfl_gflv2_r50_fpn_1x_coco^SIR_173
-        for py_file in self.py_list:
-            all_case_list.append(py_file)
-
+        if report_path == self.allure_index.report_path:
+            allure_index = self.allure_index
+        else:
+            allure_index = AllureIndex(report_path=report_path, layer_type=self.layer_type)
         # 如果allure报告中不包含某个case, 说明这个case出现了core dumps
-        core_dumps_list = []
-        for case in all_case_list:
-            if case not in allure_case_list:
-                core_dumps_list.append(case)
-
-        return core_dumps_list
+        return allure_index.core_dumps(self.run_py_list)
 
     def _pts_callback(self, error_count):
         """
@@ -745,9 +927,9 @@ if __name__ == "__main__":
     tes = Run()
     if os.environ.get("TESTING_MODE") == "precision":
         if os.environ.get("MULTI_WORKER") == "0":
-            tes._test_run(py_list=tes.py_list)
+            tes._test_run(py_list=tes.run_py_list)
         else:
-            tes._multithread_test_run(py_list=tes.py_list)
+            tes._multithread_test_run(py_list=tes.run_py_list)
     elif os.environ.get("TESTING_MODE") == "performance":
         if os.environ.get("PLT_PERF_MODE") == "unit-python":
             tes._perf_unit_test_run()
@@ -757,6 +939,6 @@ if __name__ == "__main__":
             else:
                 tes._multiprocess_perf_test_run()
     elif os.environ.get("TESTING_MODE") == "precision_multi_gpu":
-        tes._multi_gpu_multithread_test_run(py_list=tes.py_list)
+        tes._multi_gpu_multithread_test_run(py_list=tes.run_py_list)
     else:
         raise Exception("unknown testing mode, PaddleLayerTest only support test precision or performance")
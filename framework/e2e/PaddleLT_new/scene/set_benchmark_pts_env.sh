@@ -14,6 +14,7 @@ export PLT_DEVICE_ID="${PLT_DEVICE_ID:-6}"  # 设备编号
 export CUDA_VISIBLE_DEVICES="${PLT_DEVICE_ID:-6}"
 export FRAMEWORK="${FRAMEWORK:-paddle}"  # 框架种类
 export MULTI_WORKER="${MULTI_WORKER:-0}"  # 并行数
+export PLT_CASE_DEDUP="${PLT_CASE_DEDUP:-False}"  # 结构指纹相同的子图只执行代表子图, 结果复用到同组其余子图
 
 export PLT_PYTEST_TIMEOUT="${PLT_PYTEST_TIMEOUT:-200}"  # 超时10分钟则判为失败. 设置为None则不限时
 
@@ -26,6 +27,10 @@ export TIMEIT_NUM="${TIMEIT_NUM:-1}"  # timeit number数
 export PLT_BM_STATIS="${PLT_BM_STATIS:-trimmean}"  # 统计策略trimmean, mean, best, best_top_k
 export PLT_BM_ERROR_CHECK="${PLT_BM_ERROR_CHECK:-True}"  # True: 执行性能测试前先执行一次精度测试
 export PLT_BM_PLOT="${PLT_BM_PLOT:-False}"  # True: 执行性能测试后生成性能图表
+export PLT_BM_TAIL="${PLT_BM_TAIL:-p99}"  # 尾部耗时对比的分位点, 可选p50, p90, p99, max, 多个用逗号分隔
+export PLT_BM_TAIL_GATE="${PLT_BM_TAIL_GATE:-None}"  # 尾部耗时门禁, 例如0.3表示尾部耗时增加30%以上判为不通过, 不通过时任务失败, None则不开启
+export PLT_BM_CPU_THREADS="${PLT_BM_CPU_THREADS:-}"  # PLT_SET_DEVICE=cpu时的计算线程数, 为空则不设置
+export PLT_BM_CPU_CORES="${PLT_BM_CPU_CORES:-}"  # PLT_SET_DEVICE=cpu时绑定的cpu核, 例如0-3, 为空则不绑核
 
 echo "wheel_url=${wheel_url}"
 echo "python_ver=${python_ver}"
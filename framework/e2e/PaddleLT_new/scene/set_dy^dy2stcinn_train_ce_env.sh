@@ -16,8 +16,10 @@ export PLT_PYTEST_TIMEOUT="${PLT_PYTEST_TIMEOUT:-600}"  # 超时10分钟则判
 export PLT_SPEC_USE_MULTI="${PLT_SPEC_USE_MULTI:-False}"  # 开启动态InputSpec搜索遍历
 export PLT_SAVE_SPEC="${PLT_SAVE_SPEC:-False}"  # 是否保存InputSpec搜索遍历结果
 export PLT_SAVE_GT="${PLT_SAVE_GT:-False}"  # 是否保存精度ground truth, 也就是plt_gt
+export PLT_GT_FORMAT="${PLT_GT_FORMAT:-npk}"  # plt_gt保存格式, npk: 清单+数组打包, 按mmap加载并校验checksum; tensor: 原paddle.save格式
 export PLT_GT_UPLOAD_URL="${PLT_GT_UPLOAD_URL:-None}"  # plt_gt的上传路径, paddle-qa/PaddleLT/PaddleLTGroundTruth/latest
 export PLT_GT_DOWNLOAD_URL="${PLT_GT_DOWNLOAD_URL:-None}"  # plt_gt的下载url, https://paddle-qa.bj.bcebos.com/PaddleLT/PaddleLTGroundTruth/latest/gpu
+export PLT_GT_TRANSFER_WORKERS="${PLT_GT_TRANSFER_WORKERS:-8}"  # plt_gt上传/下载并发数
 
 echo "wheel_url is: ${wheel_url}"
 echo "python_ver is: ${python_ver}"
@@ -15,17 +15,34 @@ export FRAMEWORK="${FRAMEWORK:-paddle}"
 export USE_PADDLE_MODEL="${USE_PADDLE_MODEL:-None}"  # 设定是否使用paddle模型库, 可选PaddleOCR
 export MULTI_WORKER="${MULTI_WORKER:-0}"
 export MULTI_DOUBLE_CHECK="${MULTI_DOUBLE_CHECK:-True}"
+export PLT_WARM_WORKER="${PLT_WARM_WORKER:-False}"  # 多线程测试时使用常驻预热worker池执行子图, 避免每个子图重复启动解释器
+export PLT_WARM_WORKER_MAX_TASKS="${PLT_WARM_WORKER_MAX_TASKS:-20}"  # 单个worker执行子图数上限, 达到后重启worker以清除进程内残留的框架全局状态, 0为不限制
+export PLT_CASE_SCHEDULE="${PLT_CASE_SCHEDULE:-lpt}"  # 多卡/多进程子图分配策略, lpt: 按历史耗时装箱+共享队列动态领取; round_robin: 按顺序轮流划分
+export PLT_CASE_HISTORY="${PLT_CASE_HISTORY:-plt_case_history.json}"  # 子图历史耗时记录文件
+export PLT_CASE_DEDUP="${PLT_CASE_DEDUP:-False}"  # 结构指纹相同的子图只执行代表子图, 结果复用到同组其余子图
+export PLT_CASE_SELECT="${PLT_CASE_SELECT:-all}"  # 子图选择方式, all: 全部子图; impact: 只执行受变更影响的子图并随机抽样少量其余子图
+export PLT_IMPACT_CHANGES="${PLT_IMPACT_CHANGES:-}"  # impact选择的变更, 变更文件路径(每行一个api或源码文件)或逗号分隔的api/源码文件
+export PLT_IMPACT_MAP="${PLT_IMPACT_MAP:-yaml/impact_map.yml}"  # 源码文件到api的映射
+export PLT_IMPACT_SAMPLE="${PLT_IMPACT_SAMPLE:-0.05}"  # 随机抽样的其余子图, 小于1为比例, 大于等于1为个数
+export PLT_IMPACT_COMMIT="${PLT_IMPACT_COMMIT:-}"  # 变更对应的commit, 与变更list一起生成随机抽样种子
 
 export PLT_PYTEST_TIMEOUT="${PLT_PYTEST_TIMEOUT:-600}"  # 超时10分钟则判为失败. 设置为None则不限时
 export PLT_SPEC_USE_MULTI="${PLT_SPEC_USE_MULTI:-False}"  # 开启动态InputSpec搜索遍历
+export PLT_SPEC_STRATEGY="${PLT_SPEC_STRATEGY:-bounded}"  # 动态InputSpec搜索策略, bounded: 预算内选择全静态/全动态/两两覆盖/单维动态等组合; product: 穷举全部组合
+export PLT_SPEC_BUDGET="${PLT_SPEC_BUDGET:-16}"  # bounded策略下每个子图最多搜索的InputSpec组合数
 export PLT_SAVE_SPEC="${PLT_SAVE_SPEC:-False}"  # 是否保存InputSpec搜索遍历结果
 export PLT_SAVE_GT="${PLT_SAVE_GT:-False}"  # 是否保存精度ground truth, 也就是plt_gt
+export PLT_GT_FORMAT="${PLT_GT_FORMAT:-npk}"  # plt_gt保存格式, npk: 清单+数组打包, 按mmap加载并校验checksum; tensor: 原paddle.save格式
 export PLT_GT_UPLOAD_URL="${PLT_GT_UPLOAD_URL:-None}"  # plt_gt的上传路径, paddle-qa/PaddleLT/PaddleLTGroundTruth/latest
 export PLT_GT_DOWNLOAD_URL="${PLT_GT_DOWNLOAD_URL:-None}"  # plt_gt的下载url, https://paddle-qa.bj.bcebos.com/PaddleLT/PaddleLTGroundTruth/latest/gpu
+export PLT_GT_TRANSFER_WORKERS="${PLT_GT_TRANSFER_WORKERS:-8}"  # plt_gt上传/下载并发数
+export PLT_COMPARE_THREADS="${PLT_COMPARE_THREADS:-1}"  # 精度对比时并行对比多个输出tensor的线程数, 1为串行
 
 # 精度结果入库
 export PLT_BM_MODE="${PLT_BM_MODE:-baseline}"  #基线任务为baseline, 测试任务为latest, 测试并设为新基线任务为latest_as_baseline
 export PLT_BM_DB="${PLT_BM_DB:-non-db}"  # insert: 存入数据, 作为基线或对比; select: 不存数据, 仅拉取之前结果; non-db: 不加载数据库
+export PLT_DB_BACKEND="${PLT_DB_BACKEND:-mysql}"  # mysql: 读取storage配置连接线上库; sqlite: 使用本地文件库, 无需数据库服务
+export PLT_DB_SQLITE="${PLT_DB_SQLITE:-plt_benchmark.db}"  # sqlite本地库文件路径
 
 echo "wheel_url=${wheel_url}"
 echo "python_ver=${python_ver}"
@@ -10,7 +10,7 @@ import os
 import json
 
 # import logging
-import traceback
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
 from pltools.logger import Logger
@@ -26,14 +26,26 @@ elif os.environ.get("FRAMEWORK") == "torch":
     framework = "torch"
 
 
-def base_compare(result, expect, res_name, exp_name, logger, delta=1e-10, rtol=1e-10, exc_dict={}):
+if framework == "paddle":
+    TENSOR_TYPES = (np.ndarray, paddle.Tensor)
+elif framework == "torch":
+    TENSOR_TYPES = (np.ndarray, torch.Tensor)
+else:
+    TENSOR_TYPES = (np.ndarray,)
+
+
+def _to_numpy(data):
+    """Tensor转为numpy, 非Tensor直接返回"""
+    if not isinstance(data, TENSOR_TYPES) or isinstance(data, np.ndarray):
+        return data
+    if framework == "torch":
+        return data.detach().numpy()
+    return data.numpy()
+
+
+def _flatten(result, expect, res_name, exp_name, leaves):
     """
-    比较函数
-    :param result: 待测值
-    :param expect: 基线值
-    :param delta: 误差值
-    :param rtol: 相对误差
-    :return:
+    一次遍历嵌套输出, 收集需要对比的叶子节点(res_name, result, expect), 遍历规则与原递归对比一致
     """
     if isinstance(result, str):
         raise Exception("result is exception !!!")
@@ -45,110 +57,115 @@ def base_compare(result, expect, res_name, exp_name, logger, delta=1e-10, rtol=1
             Logger("PLT_compare").get_log().info(f"{exp_name} 结果为None, 所以跳过 {exp_name} 和 {res_name} 精度对比")
         if result is None:
             Logger("PLT_compare").get_log().info(f"{res_name} 结果为None, 所以跳过 {exp_name} 和 {res_name} 精度对比")
-        pass
-    elif isinstance(expect, eval(f"{framework}.Tensor")) or isinstance(expect, np.ndarray):
-        if isinstance(result, eval(f"{framework}.Tensor")):
-            if framework == "torch":
-                result = result.detach().numpy()
-            elif framework == "paddle":
-                result = result.numpy()
-            else:
-                result = result.numpy()
-        if isinstance(expect, eval(f"{framework}.Tensor")):
-            if framework == "torch":
-                expect = expect.detach().numpy()
-            elif framework == "paddle":
-                expect = expect.numpy()
-            else:
-                expect = expect.numpy()
-        # res = np.allclose(result, expect, atol=delta, rtol=rtol, equal_nan=True)
-        # # 出错打印错误数据
-        # if res is False:
-        #     diff = abs(result - expect)
-        #     # logger.error("{} is: {}".format(exp_name, expect))
-        #     # logger.error("{} is: {}".format(res_name, result))
-        #     logger.error("{} and {} has diff! max diff: {}".format(exp_name, res_name, np.amax(diff)))
-
-        try:
-            np.testing.assert_allclose(actual=result, desired=expect, atol=delta, rtol=rtol, equal_nan=True)
-
-            if result.dtype != expect.dtype:
-                logger.warn(
-                    "Different output data types! res type is: {}, and expect type is: {}".format(
-                        result.dtype, expect.dtype
-                    )
-                )
-            # assert res
-            assert result.shape == expect.shape
-            assert result.dtype == expect.dtype
-        except Exception:
-            exc_dict[res_name] = traceback.format_exc()
-            logger.warn(traceback.format_exc())
-
+    elif isinstance(expect, TENSOR_TYPES):
+        leaves.append((res_name, result, expect))
     elif isinstance(expect, dict):
         if "multi_result" in result:
             # 专用于多个结果比较, 例如多种inputspec. 只有result会有多个结果, 想法expect固定为一个
             for i, logit_dict in enumerate(result["multi_result"]):
-                base_compare(
-                    result=logit_dict,
-                    expect=expect,
-                    res_name=res_name + f"multi_result[{i}]",
-                    exp_name=exp_name,
-                    logger=logger,
-                    delta=delta,
-                    rtol=rtol,
-                    exc_dict=exc_dict,
-                )
+                _flatten(logit_dict, expect, res_name + f"multi_result[{i}]", exp_name, leaves)
         else:
             for k, v in expect.items():
                 if k in result:
-                    base_compare(
-                        result=result[k],
-                        expect=expect[k],
-                        res_name=res_name + "[{}]".format(str(k)),
-                        exp_name=exp_name + "[{}]".format(str(k)),
-                        logger=logger,
-                        delta=delta,
-                        rtol=rtol,
-                        exc_dict=exc_dict,
-                    )
+                    _flatten(result[k], v, res_name + "[{}]".format(str(k)), exp_name + "[{}]".format(str(k)), leaves)
                 else:
                     Logger("PLT_compare").get_log().info(f"{exp_name} 有 {k}, 但是 {res_name} 没有 {k}, 所以跳过 {k} 精度对比")
     elif isinstance(expect, list) or isinstance(expect, tuple):
         for i, element in enumerate(expect):
-            if isinstance(result, (np.generic, np.ndarray)) or isinstance(result, eval(f"{framework}.Tensor")):
+            if isinstance(result, (np.generic,) + TENSOR_TYPES):
                 if i > 0:
                     break
-                base_compare(
-                    result=result,
-                    expect=expect[i],
-                    res_name=res_name + "[{}]".format(str(i)),
-                    exp_name=exp_name + "[{}]".format(str(i)),
-                    logger=logger,
-                    delta=delta,
-                    rtol=rtol,
-                    exc_dict=exc_dict,
-                )
+                _flatten(result, element, res_name + "[{}]".format(str(i)), exp_name + "[{}]".format(str(i)), leaves)
             else:
-                base_compare(
-                    result=result[i],
-                    expect=expect[i],
-                    res_name=res_name + "[{}]".format(str(i)),
-                    exp_name=exp_name + "[{}]".format(str(i)),
-                    logger=logger,
-                    delta=delta,
-                    rtol=rtol,
-                    exc_dict=exc_dict,
-                )
+                _flatten(result[i], element, res_name + "[{}]".format(str(i)), exp_name + "[{}]".format(str(i)), leaves)
     elif isinstance(expect, (bool, int, float)):
         assert expect == result
     else:
         raise Exception("expect is unknown data struction in compare_tool!!!")
 
+
+def allclose_leaf(result, expect, delta, rtol):
+    """
+    单个叶子节点对比, 判定规则与np.testing.assert_allclose(equal_nan=True)一致, 并要求shape和dtype相同
+    通过时只做一次差值计算, 不构造任何报错信息
+    :return: None表示通过, 否则为报错信息
+    """
+    result = np.asarray(_to_numpy(result))
+    expect = np.asarray(_to_numpy(expect))
+    if result.shape != expect.shape:
+        return f"shape mismatch, result shape: {result.shape}, expect shape: {expect.shape}"
+
+    dtype = np.result_type(result, expect, 1.0)
+    actual = result.astype(dtype, copy=False)
+    desired = expect.astype(dtype, copy=False)
+    with np.errstate(invalid="ignore", over="ignore"):
+        abs_err = np.abs(actual - desired)
+        tol = delta + rtol * np.abs(desired)
+        mismatch = ~(abs_err <= tol)  # nan和inf的差值均判为不通过, 下面再豁免
+    inf_mask = np.isinf(tol)
+    if inf_mask.any():
+        # 基线为inf时容差也为inf, 需要单独要求inf的位置和符号一致
+        mismatch |= inf_mask & (actual != desired)
+    if mismatch.any():
+        # 两侧同为nan, 或者同为相同符号的inf时视为相等
+        mismatch &= ~((np.isnan(actual) & np.isnan(desired)) | (actual == desired))
+    if not mismatch.any():
+        if result.dtype != expect.dtype:
+            return "Different output data types! res type is: {}, and expect type is: {}".format(
+                result.dtype, expect.dtype
+            )
+        return None
+
+    bad_err = abs_err[mismatch]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel_err = bad_err / np.abs(desired[mismatch])
+    return (
+        "Not equal to tolerance rtol={}, atol={}\n"
+        "Mismatched elements: {} / {} ({:.3g}%)\n"
+        "Max absolute difference: {}\n"
+        "Max relative difference: {}".format(
+            rtol,
+            delta,
+            int(mismatch.sum()),
+            mismatch.size,
+            100.0 * mismatch.sum() / mismatch.size,
+            np.max(bad_err) if bad_err.size else np.nan,
+            np.max(rel_err) if rel_err.size else np.nan,
+        )
+    )
+
+
+def base_compare(result, expect, res_name, exp_name, logger, delta=1e-10, rtol=1e-10, exc_dict=None):
+    """
+    比较函数, 先展开嵌套输出, 再逐个叶子节点对比
+    PLT_COMPARE_THREADS大于1时, 多个叶子节点在线程池中并行对比
+    :param result: 待测值
+    :param expect: 基线值
+    :param delta: 误差值
+    :param rtol: 相对误差
+    :param exc_dict: 对比失败的叶子节点, {res_name: 报错信息}
+    :return: exc_dict
+    """
+    if exc_dict is None:
+        exc_dict = {}
+    leaves = []
+    _flatten(result, expect, res_name, exp_name, leaves)
+
+    threads = int(os.environ.get("PLT_COMPARE_THREADS", 1))
+    if threads > 1 and len(leaves) > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            msg_list = list(executor.map(lambda leaf: allclose_leaf(leaf[1], leaf[2], delta, rtol), leaves))
+    else:
+        msg_list = [allclose_leaf(leaf[1], leaf[2], delta, rtol) for leaf in leaves]
+
+    for (name, _, _), msg in zip(leaves, msg_list):
+        if msg is not None:
+            exc_dict[name] = msg
+            logger.warning(f"{name} 精度对比失败: {msg}")
     return exc_dict
 
 
-def infer_compare(result, expect, res_name, exp_name, logger, delta=1e-10, rtol=1e-10, exc_dict={}):
+def infer_compare(result, expect, res_name, exp_name, logger, delta=1e-10, rtol=1e-10, exc_dict=None):
     """
     比较函数
     :param result: 待测值
@@ -226,6 +243,23 @@ def perf_compare(baseline, latest):
     return "{:.2f}%".format(res * 100)
 
 
+def perf_tail_compare(baseline, latest):
+    """
+    尾部耗时对比, 对比的分位点由PLT_BM_TAIL设定, 例如"p99"或"p90,p99,max"
+    :param baseline: 基线耗时分布摘要, 即latency_sketch结果
+    :param latest: 待测耗时分布摘要
+    :return: {分位点: 比例值}, 任一方没有耗时分布摘要时返回空dict
+    """
+    if not isinstance(baseline, dict) or not isinstance(latest, dict):
+        return {}
+    res = {}
+    for tail in os.environ.get("PLT_BM_TAIL", "p99").split(","):
+        tail = tail.strip()
+        if tail in baseline and tail in latest:
+            res[tail] = perf_compare(baseline=baseline[tail], latest=latest[tail])
+    return res
+
+
 def perf_compare_dict_legacy(baseline_dict, data_dict, error_list, baseline_layer_type, latest_layer_type):
     """
     生成对比dict
@@ -291,6 +325,14 @@ def perf_compare_dict(compare_list, baseline_dict, data_dict, error_list, baseli
                             baseline=json.loads(baseline_dict[baseline_title]["result"])[latest_engine],
                             latest=perf_dict[latest_engine],
                         )
+                        tail_res = perf_tail_compare(
+                            baseline=json.loads(baseline_dict[baseline_title]["result"]).get(
+                                latest_engine + "-latency"
+                            ),
+                            latest=perf_dict.get(latest_engine + "-latency"),
+                        )
+                        for tail, res in tail_res.items():
+                            compare_dict[layer_case][latest_engine + "^" + tail + "_compare"] = res
                     else:
                         compare_dict[layer_case][latest_engine + "^" + latest_layer_type] = perf_dict[latest_engine]
                         compare_dict[layer_case][latest_engine + "^" + baseline_layer_type + "^baseline"] = "None"
@@ -301,6 +343,12 @@ def perf_compare_dict(compare_list, baseline_dict, data_dict, error_list, baseli
                     compare_dict[layer_case][latest_engine + "^" + baseline_engine + "^compare"] = perf_compare(
                         baseline=perf_dict[baseline_engine], latest=perf_dict[latest_engine]
                     )
+                    tail_res = perf_tail_compare(
+                        baseline=perf_dict.get(baseline_engine + "-latency"),
+                        latest=perf_dict.get(latest_engine + "-latency"),
+                    )
+                    for tail, res in tail_res.items():
+                        compare_dict[layer_case][latest_engine + "^" + baseline_engine + "^" + tail + "_compare"] = res
 
     return compare_dict
 
@@ -96,14 +96,15 @@ class CIdb(DB):
 
     def ci_select_baseline_job(self, comment, routine, ci, md5_id):
         """通过comment字段、ci字段、机器唯一标识码，查找baseline数据"""
-        condition_list = [
-            "comment = '{}'".format(comment),
-            "status = 'done'",
-            "routine = '{}'".format(routine),
-            "ci = '{}'".format(ci),
-            "md5_id = '{}'".format(md5_id),
-        ]
-        res = self.select(table="job", condition_list=condition_list)
+        condition_dict = {
+            "md5_id": md5_id,
+            "routine": routine,
+            "ci": ci,
+            "comment": comment,
+            "status": "done",
+        }
+        # 只取最新的一条, 避免拉取全部历史job
+        res = self.select_where(table="job", condition_dict=condition_dict, order_by="id", desc=True, limit=1)
         baseline_job = res[-1]
         job_id = baseline_job["id"]
         return job_id
@@ -139,9 +140,7 @@ class CIdb(DB):
         else:
             time_now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             try:
-                for case_name, data_dict in cases_dict.items():
-                    # print('data_dict is: ', data_dict)
-                    self.insert_case(jid=job_id, data_dict=data_dict, create_time=time_now)
+                self.insert_cases(jid=job_id, data_list=list(cases_dict.values()), create_time=time_now)
                 self.ci_update_job(id=job_id, status="done", update_time=time_now)
             except Exception as e:
                 self.ci_update_job(id=job_id, status="error", update_time=time_now)
@@ -6,24 +6,57 @@
 db object
 """
 
+import os
 import json
+import sqlite3
 import traceback
 from datetime import datetime
 import yaml
-import pymysql
 
 # from utils.logger import logger
 
 ACCURACY = "%.6g"
 
+# sqlite本地库的表结构, 字段与线上mysql一致, 用于离线调试与单机运行
+SQLITE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS `job` ("
+    "`id` INTEGER PRIMARY KEY AUTOINCREMENT, `framework` TEXT, `status` TEXT, `mode` TEXT, `commit` TEXT, "
+    "`version` TEXT, `hostname` TEXT, `place` TEXT, `system` TEXT, `cuda` TEXT, `cudnn` TEXT, `snapshot` TEXT, "
+    "`md5_id` TEXT, `uid` INTEGER, `routine` INTEGER, `ci` INTEGER, `comment` TEXT, `enable_backward` INTEGER, "
+    "`python` TEXT, `yaml_info` TEXT, `wheel_link` TEXT, `description` TEXT, `create_time` TEXT, `update_time` TEXT)",
+    "CREATE TABLE IF NOT EXISTS `case` ("
+    "`id` INTEGER PRIMARY KEY AUTOINCREMENT, `jid` INTEGER, `case_name` TEXT, `api` TEXT, `result` TEXT, "
+    "`create_time` TEXT)",
+    "CREATE INDEX IF NOT EXISTS `idx_job_baseline` ON `job` (`md5_id`, `routine`, `ci`, `comment`)",
+    "CREATE INDEX IF NOT EXISTS `idx_case_jid` ON `case` (`jid`, `case_name`)",
+]
+
 
 class DB(object):
-    """DB class"""
+    """
+    DB class
+    backend由环境变量APIBM_DB_BACKEND指定: mysql(默认, 读取storage.yaml) 或 sqlite(本地文件, 路径由APIBM_DB_SQLITE指定)
+    """
 
-    def __init__(self, storage="storage.yaml"):
+    def __init__(self, storage="storage.yaml", backend=None):
         self.storage = storage
-        host, port, user, password, database = self.load_storge()
-        self.db = pymysql.connect(host=host, port=port, user=user, password=password, database=database, charset="utf8")
+        self.backend = backend or os.environ.get("APIBM_DB_BACKEND", "mysql")
+        if self.backend == "mysql":
+            import pymysql
+
+            host, port, user, password, database = self.load_storge()
+            self.db = pymysql.connect(
+                host=host, port=port, user=user, password=password, database=database, charset="utf8"
+            )
+            self.placeholder = "%s"
+        elif self.backend == "sqlite":
+            self.db = sqlite3.connect(os.environ.get("APIBM_DB_SQLITE", "api_benchmark.db"))
+            self.placeholder = "?"
+            for sql in SQLITE_SCHEMA:
+                self.db.execute(sql)
+            self.db.commit()
+        else:
+            raise Exception(f"unknown db backend: {self.backend}, only support mysql or sqlite")
         self.cursor = self.db.cursor()
 
     def load_storge(self):
@@ -47,102 +80,127 @@ class DB(object):
         """
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+    def ping(self):
+        """断线重连, sqlite无需处理"""
+        if self.backend == "mysql":
+            self.db.ping(True)
+
+    def _fetch_dicts(self):
+        """将查询结果按列名转为dict list"""
+        index_list = [column[0] for column in self.cursor.description]
+        return [dict(zip(index_list, row)) for row in self.cursor.fetchall()]
+
+    def _where(self, condition_dict):
+        """由condition_dict生成参数化的where子句"""
+        if not condition_dict:
+            return "", []
+        sql = " WHERE " + " AND ".join("`{}`={}".format(k, self.placeholder) for k in condition_dict)
+        return sql, list(condition_dict.values())
+
     def insert(self, table, data):
         """插入数据"""
         id = -1
         sql_table = "`" + table + "`"
         ls = [(k, data[k]) for k in data if data[k] is not None]
         keys = ",".join(("`" + i[0] + "`") for i in ls)
-        values = ",".join("%r" % i[1] for i in ls)
+        values = ",".join(self.placeholder for i in ls)
 
         sql = "INSERT INTO {table}({keys}) VALUES ({values})".format(table=sql_table, keys=keys, values=values)
-        # sql = 'insert %s (' % table + ','.join(('`' + i[0] + '`') for i in ls) + \
-        #       ') values (' + ','.join('%r' % i[1] for i in ls) + ')'
         try:
-            self.cursor.execute(sql)
-            id = self.db.insert_id()
+            self.cursor.execute(sql, [i[1] for i in ls])
+            id = self.cursor.lastrowid
             self.db.commit()
         except Exception as e:
             # print(traceback.format_exc())
             print(e)
         return id
 
-    def update(self, table, data, data_condition):
-        """按照data_condition 更新数据"""
+    def insert_many(self, table, data_list):
+        """
+        批量插入数据, 单条executemany语句并在同一事务内提交
+        :param data_list: dict list, 各dict的key需一致
+        :return: 插入条数, 失败返回-1
+        """
+        if not data_list:
+            return 0
         sql_table = "`" + table + "`"
-        sql = (
-            "UPDATE %s SET " % sql_table
-            + ",".join("%s=%r" % (("`" + k + "`"), data[k]) for k in data)
-            + " WHERE "
-            + " AND ".join("%s=%r" % (("`" + k + "`"), data_condition[k]) for k in data_condition)
-        )
+        key_list = list(data_list[0].keys())
+        keys = ",".join(("`" + k + "`") for k in key_list)
+        values = ",".join(self.placeholder for k in key_list)
 
+        sql = "INSERT INTO {table}({keys}) VALUES ({values})".format(table=sql_table, keys=keys, values=values)
         try:
-            self.cursor.execute(sql)
+            self.cursor.executemany(sql, [[data[k] for k in key_list] for data in data_list])
             self.db.commit()
         except Exception as e:
-            print(traceback.format_exc())
             print(e)
+            try:
+                self.db.rollback()
+            except Exception as rollback_e:  # 连接已断开时rollback同样失败, 交由调用方ping重连后重试
+                print(rollback_e)
+            return -1
+        return len(data_list)
 
-    def update_by_id(self, table, data, id):
-        """按照id 更新数据"""
+    def update(self, table, data, data_condition):
+        """按照data_condition 更新数据"""
         sql_table = "`" + table + "`"
-        sql = (
-            "UPDATE %s SET " % sql_table
-            + ",".join("%s=%r" % (("`" + k + "`"), data[k]) for k in data)
-            + " WHERE "
-            + "%s=%r" % ("`id`", id)
-        )
+        where, params = self._where(data_condition)
+        sql = "UPDATE %s SET " % sql_table + ",".join("`{}`={}".format(k, self.placeholder) for k in data) + where
 
         try:
-            self.cursor.execute(sql)
+            self.cursor.execute(sql, list(data.values()) + params)
             self.db.commit()
         except Exception as e:
             print(traceback.format_exc())
             print(e)
 
+    def update_by_id(self, table, data, id):
+        """按照id 更新数据"""
+        self.update(table=table, data=data, data_condition={"id": id})
+
     def select(self, table, condition_list):
-        """按照condition_list 查询数据"""
+        """按照condition_list 查询数据, condition_list为sql条件字符串list, 新代码请使用select_where"""
         results = []
         sql_table = "`" + table + "`"
         sql = "SELECT * FROM %s " % sql_table + " WHERE " + " AND ".join("%s" % k for k in condition_list)
 
         try:
             self.cursor.execute(sql)
-            res = self.cursor.fetchall()
-
-            index_list = self.show_list(table=table)
-            for row in res:
-                tmp = {}
-                for i, v in enumerate(row):
-                    tmp[index_list[i]] = row[i]
-                results.append(tmp)
+            results = self._fetch_dicts()
         except Exception as e:
             print(traceback.format_exc())
             print(e)
         return results
 
-    def select_by_id(self, table, id):
-        """按照id 查询数据"""
+    def select_where(self, table, condition_dict, order_by=None, desc=False, limit=None):
+        """
+        按照condition_dict 参数化查询数据
+        :param condition_dict: {列名: 值}, 条件之间为AND
+        :param order_by: 排序列名
+        :param desc: 是否降序
+        :param limit: 返回条数上限
+        """
         results = []
         sql_table = "`" + table + "`"
-        sql = "SELECT * FROM %s " % sql_table + " WHERE " + "%s=%r" % ("`id`", id)
+        where, params = self._where(condition_dict)
+        sql = "SELECT * FROM %s" % sql_table + where
+        if order_by is not None:
+            sql += " ORDER BY `{}`{}".format(order_by, " DESC" if desc else "")
+        if limit is not None:
+            sql += " LIMIT %d" % int(limit)
 
         try:
-            self.cursor.execute(sql)
-            res = self.cursor.fetchall()
-
-            tmp = {}
-            index_list = self.show_list(table=table)
-            for row in res:
-                for i, v in enumerate(row):
-                    tmp[index_list[i]] = row[i]
-                results.append(tmp)
+            self.cursor.execute(sql, params)
+            results = self._fetch_dicts()
         except Exception as e:
             print(traceback.format_exc())
             print(e)
         return results
 
+    def select_by_id(self, table, id):
+        """按照id 查询数据"""
+        return self.select_where(table=table, condition_dict={"id": id})
+
     def insert_case(self, jid, data_dict, create_time):
         """向case表中录入数据"""
         data = {
@@ -157,11 +215,34 @@ class DB(object):
             case_id = self.insert(table="case", data=data)
             if case_id == -1:
                 print("db ping again~~~")
-                self.db.ping(True)
+                self.ping()
                 continue
             else:
                 break
 
+    def insert_cases(self, jid, data_list, create_time):
+        """
+        向case表中批量录入数据, 全部case在一个事务内提交
+        :param data_list: dict list, 每个dict包含case_name, api, result
+        """
+        data_list = [
+            {
+                "jid": jid,
+                "case_name": data_dict["case_name"],
+                "api": data_dict["api"],
+                "result": data_dict["result"],
+                "create_time": create_time,
+            }
+            for data_dict in data_list
+        ]
+        retry = 3
+        for i in range(retry):
+            if self.insert_many(table="case", data_list=data_list) != -1:
+                return len(data_list)
+            print("db ping again~~~")
+            self.ping()
+        raise Exception("insert case failed after {} retries, jid: {}".format(retry, jid))
+
     # def insert_case_origin(self, jid, data_dict, create_time):
     #     """向case表中录入数据"""
     #     for k, v in data_dict["result"].items():
@@ -190,10 +271,15 @@ class DB(object):
         """返回table中的列list"""
         results = []
         sql_table = "`" + table + "`"
-        sql = "SHOW COLUMNS from {}".format(sql_table)
+        if self.backend == "sqlite":
+            sql = "PRAGMA table_info({})".format(sql_table)
+            name_index = 1
+        else:
+            sql = "SHOW COLUMNS from {}".format(sql_table)
+            name_index = 0
         try:
             self.cursor.execute(sql)
-            results = [column[0] for column in self.cursor.fetchall()]
+            results = [column[name_index] for column in self.cursor.fetchall()]
         except Exception as e:
             print(traceback.format_exc())
             print(e)
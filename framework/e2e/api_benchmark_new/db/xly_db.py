@@ -97,14 +97,15 @@ class XLYdb(DB):
 
     def ci_select_baseline_job(self, comment, routine, ci, md5_id):
         """通过comment字段、ci字段、机器唯一标识码，查找baseline数据"""
-        condition_list = [
-            "comment = '{}'".format(comment),
-            "status = 'done'",
-            "routine = '{}'".format(routine),
-            "ci = '{}'".format(ci),
-            "md5_id = '{}'".format(md5_id),
-        ]
-        res = self.select(table="job", condition_list=condition_list)
+        condition_dict = {
+            "md5_id": md5_id,
+            "routine": routine,
+            "ci": ci,
+            "comment": comment,
+            "status": "done",
+        }
+        # 只取最新的一条, 避免拉取全部历史job
+        res = self.select_where(table="job", condition_dict=condition_dict, order_by="id", desc=True, limit=1)
         baseline_job = res[-1]
         job_id = baseline_job["id"]
         return job_id
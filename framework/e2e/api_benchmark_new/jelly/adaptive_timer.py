@@ -0,0 +1,117 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+自适应采样计时器: 自动判断预热收敛, 采样直到中位数置信区间达到目标精度或达到采样上限
+"""
+import math
+import timeit
+
+
+class AdaptiveTimer(object):
+    """
+    adaptive timer
+    """
+
+    def __init__(
+        self,
+        max_samples,
+        scale=1,
+        ci_rel=0.01,
+        z=1.96,
+        min_samples=1000,
+        check_every=1000,
+        warmup_window=200,
+        warmup_tol=0.02,
+        max_warmup=None,
+    ):
+        """
+        :param max_samples: 采样次数上限, 即原固定采样次数loops * base_times
+        :param scale: 单次耗时的放大倍数, 与原逻辑保持一致为base_times
+        :param ci_rel: 中位数置信区间半宽相对中位数的目标比例
+        :param z: 置信水平对应的正态分位数, 1.96对应95%
+        :param min_samples: 最少采样次数
+        :param check_every: 每采样多少次检查一次置信区间
+        :param warmup_window: 预热时每个窗口的执行次数
+        :param warmup_tol: 相邻预热窗口中位数相对变化小于该值时认为预热收敛
+        :param max_warmup: 预热次数上限, 默认0.2 * max_samples, 与原固定预热次数一致
+        """
+        self.max_samples = int(max_samples)
+        self.scale = scale
+        self.ci_rel = ci_rel
+        self.z = z
+        self.min_samples = min(int(min_samples), self.max_samples)
+        self.check_every = max(1, int(check_every))
+        self.warmup_window = max(1, int(warmup_window))
+        self.warmup_tol = warmup_tol
+        self.max_warmup = int(0.2 * self.max_samples) if max_warmup is None else int(max_warmup)
+
+    @staticmethod
+    def _median(sorted_list):
+        """中位数"""
+        n = len(sorted_list)
+        mid = n // 2
+        if n % 2:
+            return sorted_list[mid]
+        return (sorted_list[mid - 1] + sorted_list[mid]) / 2
+
+    def median_ci(self, data_list):
+        """
+        基于次序统计量的中位数置信区间, 与分布无关
+        :return: (median, ci_low, ci_high)
+        """
+        sorted_list = sorted(data_list)
+        n = len(sorted_list)
+        half = self.z * math.sqrt(n) / 2
+        low = max(0, int(math.floor(n / 2 - half)))
+        high = min(n - 1, int(math.ceil(n / 2 + half)))
+        return self._median(sorted_list), sorted_list[low], sorted_list[high]
+
+    def warmup(self, timer):
+        """
+        分窗口预热, 相邻窗口中位数稳定后结束
+        :return: 预热执行次数
+        """
+        count = 0
+        last = None
+        while count < self.max_warmup:
+            number = min(self.warmup_window, self.max_warmup - count)
+            window = sorted(timer.timeit(number=1) for _ in range(number))
+            count += number
+            current = self._median(window)
+            if last is not None and current > 0 and abs(current - last) / current < self.warmup_tol:
+                break
+            last = current
+        return count
+
+    def run(self, func):
+        """
+        :param func: 无参可调用对象, 需在调用前解析完成
+        :return: (time_list, info), time_list为放大scale倍后的单次耗时, info为采样信息
+        """
+        timer = timeit.Timer(func)
+        warmup_count = self.warmup(timer)
+
+        time_list = []
+        median, ci_low, ci_high = 0.0, 0.0, 0.0
+        while len(time_list) < self.max_samples:
+            number = min(self.check_every, self.max_samples - len(time_list))
+            for _ in range(number):
+                time_list.append(timer.timeit(number=1) * self.scale)
+            if len(time_list) < self.min_samples:
+                continue
+            median, ci_low, ci_high = self.median_ci(time_list)
+            if median > 0 and (ci_high - ci_low) / 2 / median <= self.ci_rel:
+                break
+        if median == 0.0:
+            median, ci_low, ci_high = self.median_ci(time_list)
+
+        info = {
+            "samples": len(time_list),
+            "warmup": warmup_count,
+            "median": median,
+            "ci_low": ci_low,
+            "ci_high": ci_high,
+            "ci_rel": (ci_high - ci_low) / 2 / median if median > 0 else 0.0,
+        }
+        return time_list, info
@@ -5,7 +5,6 @@
 jelly_2 用于paddle单个产品执行
 """
 import random
-import timeit
 import os
 import json
 from inspect import isclass
@@ -14,6 +13,7 @@ import numpy as np
 from paddle import to_tensor
 from utils.logger import Logger
 from reload_config import OPERATOR_RELOAD
+from jelly.adaptive_timer import AdaptiveTimer
 
 
 PADDLE_DTYPE = {"float16": np.float16, "float32": np.float32, "float64": np.float64}
@@ -37,6 +37,8 @@ class Jelly_v2(object):
         # enable_backward=True,
         loops=50,
         base_times=1000,
+        adaptive=True,
+        ci_rel=0.01,
     ):
         """
 
@@ -44,6 +46,8 @@ class Jelly_v2(object):
         :param place:  cpu or gpu (string)
         :param card: 0 1 2 3 (int)
         :param explain: case的说明 会打印在日志中
+        :param adaptive: 是否自适应采样, 关闭时固定执行loops * base_times次
+        :param ci_rel: 自适应采样时中位数置信区间半宽的目标相对精度
         """
         self.seed = 33
         # self.enable_backward = enable_backward
@@ -56,6 +60,9 @@ class Jelly_v2(object):
         self.loops = loops
         # timeit 基础运行时间
         self.base_times = base_times
+        # 自适应采样配置, loops * base_times为采样次数上限
+        self.adaptive = adaptive
+        self.ci_rel = ci_rel
         # 设置logger
         # self.logger = logger
         self.logger = logger.get_log()
@@ -187,160 +194,94 @@ class Jelly_v2(object):
                     else:
                         self.method[key][k] = v
 
-    def paddle_forward(self):
+    def _new_timer(self):
         """
-        主体测试逻辑
+        创建计时器, adaptive为False时退化为固定预热与固定采样次数
+        """
+        max_samples = self.loops * self.base_times
+        if self.adaptive:
+            return AdaptiveTimer(max_samples=max_samples, scale=self.base_times, ci_rel=self.ci_rel)
+        return AdaptiveTimer(
+            max_samples=max_samples,
+            scale=self.base_times,
+            ci_rel=0,
+            min_samples=max_samples,
+            warmup_tol=0,
+            warmup_window=max_samples,
+        )
+
+    def _record_sampling(self, prefix, info):
+        """
+        记录采样次数与中位数置信区间
+        """
+        self.result[prefix + "_samples"] = info["samples"]
+        self.result[prefix + "_warmup"] = info["warmup"]
+        self.result[prefix + "_ci"] = [ACCURACY % info["ci_low"], ACCURACY % info["ci_high"]]
+        self.result[prefix + "_ci_rel"] = ACCURACY % info["ci_rel"]
+
+    def _reload_expression(self):
+        """
+        "reload" api的表达式只编译一次, 返回(code, 变量dict)
+        """
+        # 判断"reload" api中有一个输入还是两个输入
+        if "y" in self.data.keys():
+            expression = self.reload.get(self.api).format("x", "y")
+            variables = {"x": self.data["x"], "y": self.data["y"]}
+        else:
+            expression = self.reload.get(self.api).format("x")
+            variables = {"x": self.data["x"]}
+        return compile(expression, "<reload>", "eval"), variables
+
+    def _forward_callable(self):
+        """
+        解析前向可调用对象, 计时循环内不再做eval与参数拼装
         """
-        forward_time_list = []
         if self._layertypes(self.api) == "func":
+            api = self.api
             input_param = dict(self.data, **self.param)
-            tmp = timeit.timeit(lambda: self.api(**input_param), number=int(0.2 * self.loops * self.base_times))  # 预热
-            for i in range(self.loops * self.base_times):
-                forward_time = timeit.timeit(lambda: self.api(**input_param), number=1)
-                forward_time_list.append(forward_time * self.base_times)
+            return lambda: api(**input_param)
         elif self._layertypes(self.api) == "class":
-            # obj = self.api(**self.param)
-            # for i in range(self.loops):
-            #     forward_time = timeit.timeit(lambda: obj(*self.data.values()), number=self.base_times)
-            #     forward_time.append(forward_time)
             obj = self.api(**self.param)
-            # 预热
             if self.method == dict():
-                tmp = timeit.timeit(lambda: obj(*self.data.values()), number=int(0.2 * self.loops * self.base_times))
-            else:
-                obj_method = eval("obj" + "." + list(self.method.keys())[0])
-                method_params_dict = self.method[list(self.method.keys())[0]]
-                tmp = timeit.timeit(
-                    lambda: obj_method(**method_params_dict), number=int(0.2 * self.loops * self.base_times)
-                )
-            for i in range(self.loops * self.base_times):
-                if self.method == dict():
-                    forward_time = timeit.timeit(lambda: obj(*self.data.values()), number=1)
-                else:
-                    obj_method = eval("obj" + "." + list(self.method.keys())[0])
-                    method_params_dict = self.method[list(self.method.keys())[0]]
-                    forward_time = timeit.timeit(lambda: obj_method(**method_params_dict), number=1)
-                forward_time_list.append(forward_time * self.base_times)
+                inputs = list(self.data.values())
+                return lambda: obj(*inputs)
+            obj_method = eval("obj" + "." + list(self.method.keys())[0])
+            method_params_dict = self.method[list(self.method.keys())[0]]
+            return lambda: obj_method(**method_params_dict)
         elif self._layertypes(self.api) == "reload":
-            # 判断"reload" api中有一个输入还是两个输入
-            if "y" in self.data.keys():
-                x = self.data["x"]
-                y = self.data["y"]
-                expression = self.reload.get(self.api).format("x", "y")
-            else:
-                x = self.data["x"]
-                expression = self.reload.get(self.api).format("x")
+            code, variables = self._reload_expression()
+            return lambda: eval(code, {}, variables)
+        else:
+            raise AttributeError
 
-            def func(x, y):
-                eval(expression)
+    def _total_callable(self):
+        """
+        解析前反向可调用对象
+        """
+        forward = self._forward_callable()
+        res = forward()
+        grad_tensor = paddle.ones(res.shape, res.dtype)
 
-            def func_x(x):
-                eval(expression)
+        def total():
+            res = forward()
+            res.backward(grad_tensor)
 
-            # 预热
-            if "y" in self.data.keys():
-                tmp = timeit.timeit(lambda: func(x, y), number=int(0.2 * self.loops * self.base_times))  # 预热
-            else:
-                tmp = timeit.timeit(lambda: func_x(x), number=int(0.2 * self.loops * self.base_times))  # 预热
+        return total
 
-            for i in range(self.loops * self.base_times):
-                if "y" in self.data.keys():
-                    forward_time = timeit.timeit(lambda: func(x, y), number=1)
-                else:
-                    forward_time = timeit.timeit(lambda: func_x(x), number=1)
-                forward_time_list.append(forward_time * self.base_times)
-        else:
-            raise AttributeError
-
-        del tmp
+    def paddle_forward(self):
+        """
+        主体测试逻辑
+        """
+        forward_time_list, info = self._new_timer().run(self._forward_callable())
+        self._record_sampling("forward", info)
         return forward_time_list
 
     def paddle_total(self):
         """
         计算paddle 总体时间
         """
-        total_time_list = []
-        if self._layertypes(self.api) == "func":
-            input_param = dict(self.data, **self.param)
-            res = self.api(**input_param)
-            grad_tensor = paddle.ones(res.shape, res.dtype)
-
-            def func(input_param):
-                res = self.api(**input_param)
-                res.backward(grad_tensor)
-
-            tmp = timeit.timeit(lambda: func(input_param), number=int(0.2 * self.loops * self.base_times))  # 预热
-            for i in range(self.loops * self.base_times):
-                total_time = timeit.timeit(lambda: func(input_param), number=1)
-                total_time_list.append(total_time * self.base_times)
-        elif self._layertypes(self.api) == "class":
-            # obj = self.api(**self.param)
-            # res = obj(*self.data.values())
-            # grad_tensor = paddle.ones(res.shape, res.dtype)
-            obj = self.api(**self.param)
-            if self.method == dict():
-                res = obj(*self.data.values())
-            else:
-                obj_method = eval("obj" + "." + list(self.method.keys())[0])
-                method_params_dict = self.method[list(self.method.keys())[0]]
-                res = obj_method(**method_params_dict)
-            grad_tensor = paddle.ones(res.shape, res.dtype)
-
-            def clas(input_param):
-                res = obj(*input_param)
-                res.backward(grad_tensor)
-
-            def clas_method(input_param):
-                res = obj_method(**input_param)
-                res.backward(grad_tensor)
-
-            # 预热
-            if self.method == dict():
-                tmp = timeit.timeit(lambda: clas(self.data.values()), number=int(0.2 * self.loops * self.base_times))
-            else:
-                tmp = timeit.timeit(
-                    lambda: clas_method(method_params_dict), number=int(0.2 * self.loops * self.base_times)
-                )
-            for i in range(self.loops * self.base_times):
-                if self.method == dict():
-                    total_time = timeit.timeit(lambda: clas(self.data.values()), number=1)
-                else:
-                    total_time = timeit.timeit(lambda: clas_method(method_params_dict), number=1)
-                total_time_list.append(total_time * self.base_times)
-        elif self._layertypes(self.api) == "reload":
-            if "y" in self.data.keys():
-                x = self.data["x"]
-                y = self.data["y"]
-                expression = self.reload.get(self.api).format("x", "y")
-            else:
-                x = self.data["x"]
-                expression = self.reload.get(self.api).format("x")
-            res = eval(expression)
-            grad_tensor = paddle.ones(res.shape, res.dtype)
-
-            def func(x, y):
-                res = eval(expression)
-                res.backward(grad_tensor)
-
-            def func_x(x):
-                res = eval(expression)
-                res.backward(grad_tensor)
-
-            # 预热
-            if "y" in self.data.keys():
-                tmp = timeit.timeit(lambda: func(x, y), number=int(0.2 * self.loops * self.base_times))  # 预热
-            else:
-                tmp = timeit.timeit(lambda: func_x(x), number=int(0.2 * self.loops * self.base_times))  # 预热
-            for i in range(self.loops * self.base_times):
-                if "y" in self.data.keys():
-                    total_time = timeit.timeit(lambda: func(x, y), number=1)
-                else:
-                    total_time = timeit.timeit(lambda: func_x(x), number=1)
-                total_time_list.append(total_time * self.base_times)
-        else:
-            raise AttributeError
-
-        del tmp
+        total_time_list, info = self._new_timer().run(self._total_callable())
+        self._record_sampling("total", info)
         return total_time_list
 
     # def run(self):
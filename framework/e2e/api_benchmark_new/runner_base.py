@@ -14,6 +14,7 @@ from datetime import datetime
 
 from statistics.statistics import Statistics
 from db.db import DB
+from strategy.regression import quantile_sketch
 
 import paddle
 
@@ -137,6 +138,8 @@ class ApiBenchmarkBASE(object):
             jelly.result["backward"] = ACCURACY % backward
             jelly.result["total"] = ACCURACY % total
             jelly.result["best_total"] = ACCURACY % best_total
+            # 前向耗时分布sketch, 用于CI中基于分布的性能回归判定
+            jelly.result["forward_dist"] = quantile_sketch(data_list=forward_time_list)
 
             self._log_save(data=jelly.result, case_name=case_name, log=log)
 
@@ -372,16 +375,13 @@ class ApiBenchmarkBASE(object):
         数据库交互
         """
         # db = DB(storage=self.storage)
-        latest_case = {}
         data = dict()
         for i in os.listdir("./{}/".format(log)):
             with open("./{}/".format(log) + i) as case:
                 res = case.readline()
                 api = i.split(".")[0]
                 data[api] = res
+        latest_cases = []
         for k, v in data.items():
-            latest_case["jid"] = latest_id
-            latest_case["case_name"] = k
-            latest_case["api"] = json.loads(v).get("api")
-            latest_case["result"] = v
-            db.insert_case(jid=latest_id, data_dict=latest_case, create_time=self.now_time)
+            latest_cases.append({"case_name": k, "api": json.loads(v).get("api"), "result": v})
+        db.insert_cases(jid=latest_id, data_list=latest_cases, create_time=self.now_time)
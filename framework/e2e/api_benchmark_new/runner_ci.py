@@ -146,7 +146,7 @@ class ApiBenchmarkCI(ApiBenchmarkBASE):
             comment=self.baseline_comment, routine=1, ci=self.ci, md5_id=self.md5_id
         )
         # baseline_id = 123
-        baseline_list = db.select(table="case", condition_list=["jid = {}".format(baseline_id)])
+        baseline_list = db.select_where(table="case", condition_dict={"jid": baseline_id})
 
         # baseline_dict = {
         # 'equal_0': {
@@ -23,6 +23,7 @@ from statistics.statistics import Statistics
 from db.ci_db import CIdb
 from info.snapshot import Snapshot
 from strategy.compare import double_check, bad_check, ci_level_reveal, data_compare
+from strategy.regression import RegressionDetector
 from strategy.transdata import data_list_to_dict
 from alarm.alarm import Alarm
 
@@ -68,6 +69,11 @@ class ApiBenchmarkCI(ApiBenchmarkBASE):
         self.if_showtime = True
         self.double_check = True
         self.check_iters = 5
+        # 基于耗时分布的回归判定, 只有无法判定的case才double check重跑
+        # 尾部耗时(p90)确认增加30%以上时, 即使中位数无变化也判为doubt
+        self.detector = RegressionDetector(
+            effect=0.15, worse_effect=0.3, alpha=0.01, noise=0.05, tail_q=0.9, tail_effect=0.3
+        )
         self.now_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         # md5唯一标识码
@@ -214,7 +220,7 @@ class ApiBenchmarkCI(ApiBenchmarkBASE):
         baseline_id = db.ci_select_baseline_job(
             comment=self.baseline_comment, routine=1, ci=self.ci, md5_id=self.md5_id
         )
-        baseline_list = db.select(table="case", condition_list=["jid = {}".format(baseline_id)])
+        baseline_list = db.select_where(table="case", condition_dict={"jid": baseline_id})
 
         baseline_dict = data_list_to_dict(baseline_list)
 
@@ -260,7 +266,9 @@ class ApiBenchmarkCI(ApiBenchmarkBASE):
         for k, v in ci_dict.items():
             baseline_case = baseline_dict[k]
             latest_case = ci_dict[k]
-            compare_res = data_compare(baseline_case=baseline_case, latest_case=latest_case, case_name=k)
+            compare_res = data_compare(
+                baseline_case=baseline_case, latest_case=latest_case, case_name=k, detector=self.detector
+            )
             compare_dict[k] = compare_res[k]
             if bad_check(res=compare_res[k]):
                 bad_check_case.append(k)
@@ -288,7 +296,9 @@ class ApiBenchmarkCI(ApiBenchmarkBASE):
             for k, v in ci_dict.items():
                 baseline_case = baseline_dict[k]
                 latest_case = ci_dict[k]
-                compare_res = data_compare(baseline_case=baseline_case, latest_case=latest_case, case_name=k)
+                compare_res = data_compare(
+                    baseline_case=baseline_case, latest_case=latest_case, case_name=k, detector=self.detector
+                )
                 compare_dict[k] = compare_res[k]
             print("double_error_dict is: ", double_error_dict)
         else:
@@ -329,7 +329,7 @@ class ApiBenchmarkCI(ApiBenchmarkBASE):
             comment=self.baseline_comment, routine=1, ci=self.ci, md5_id=self.md5_id
         )
         # self.baseline_id = 123
-        self.baseline_list = self.db.select(table="case", condition_list=["jid = {}".format(self.baseline_id)])
+        self.baseline_list = self.db.select_where(table="case", condition_dict={"jid": self.baseline_id})
         self.baseline_dict = data_list_to_dict(self.baseline_list)
 
         latest_id = self.db.ci_insert_job(
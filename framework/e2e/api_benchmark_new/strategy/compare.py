@@ -8,6 +8,9 @@ compare
 
 import json
 
+# jelly记录的采样信息后缀, 数值类型但不是耗时指标
+NON_METRIC_SUFFIX = ("_samples", "_warmup", "_ci_rel")
+
 
 def base_compare(baseline, latest):
     """
@@ -29,52 +32,48 @@ def base_compare(baseline, latest):
     return res
 
 
-def data_compare(baseline_case, latest_case, case_name):
+def _parse_result(case):
+    """
+    解析case的result
+    :return: (api, 数值型指标dict, 耗时分布sketch or None)
+    """
+    if isinstance(case.get("result"), str):
+        result = json.loads(case.get("result"))
+        convert = float
+    else:
+        result = case.get("result")
+        convert = None
+    metric_dict = {}
+    for k, v in result.items():
+        # 采样次数, 预热次数, 置信区间宽度以及list/dict类型的置信区间, 分布sketch等为附加信息, 不参与比值对比
+        if k in ["api", "yaml"] or k.endswith(NON_METRIC_SUFFIX) or isinstance(v, (list, dict)):
+            continue
+        metric_dict[k] = convert(v) if convert is not None else v
+    return result.get("api"), metric_dict, result.get("forward_dist")
+
+
+def data_compare(baseline_case, latest_case, case_name, detector=None):
     """
     用于api benchmark 的 单个case性能数 据对比方法
     :param baseline_data: 基线{}
     :param latest_data: 待测{}
+    :param detector: strategy.regression.RegressionDetector, 基线与待测均有耗时分布时, 判定结果记录在stat中
     :return:
     """
     res = {}
     res[case_name] = {}
-    baseline_dict = {}
-    latest_dict = {}
-    if isinstance(baseline_case.get("result"), str):
-        baseline_result = json.loads(baseline_case.get("result"))
-        baseline_api = baseline_result.get("api")
-        baseline_dict["api"] = baseline_api
-        for k, v in baseline_result.items():
-            if k not in ["api", "yaml"]:
-                baseline_dict[k] = float(baseline_result[k])
-    else:
-        baseline_result = baseline_case.get("result")
-        baseline_api = baseline_result.get("api")
-        baseline_dict["api"] = baseline_api
-        for k, v in baseline_result.items():
-            if k not in ["api", "yaml"]:
-                baseline_dict[k] = baseline_result[k]
-
-    if isinstance(latest_case.get("result"), str):
-        latest_result = json.loads(latest_case.get("result"))
-        latest_api = latest_result.get("api")
-        latest_dict["api"] = latest_api
-        for k, v in latest_result.items():
-            if k not in ["api", "yaml"]:
-                latest_dict[k] = float(latest_result[k])
-    else:
-        latest_result = latest_case.get("result")
-        latest_api = latest_result.get("api")
-        latest_dict["api"] = latest_api
-        for k, v in latest_result.items():
-            if k not in ["api", "yaml"]:
-                latest_dict[k] = latest_result[k]
+    baseline_api, baseline_dict, baseline_dist = _parse_result(baseline_case)
+    latest_api, latest_dict, latest_dist = _parse_result(latest_case)
 
     res[case_name]["baseline_api"] = baseline_api
     res[case_name]["latest_api"] = latest_api
     for k, v in latest_dict.items():
-        if k not in ["api", "yaml"]:
+        if k in baseline_dict:
             res[case_name][k] = base_compare(baseline=baseline_dict[k], latest=latest_dict[k])
+    if detector is not None and baseline_dist is not None and latest_dist is not None:
+        stat = detector.detect(baseline=baseline_dist, latest=latest_dist)
+        if stat is not None:
+            res[case_name]["stat"] = stat
 
     return res
 
@@ -239,6 +238,9 @@ def double_check(res):
     :param res: data_compare函数输出的结果
     :return:
     """
+    if "stat" in res:
+        # 分布判定无法给出结论时才需要重跑
+        return res["stat"]["grade"] == "inconclusive"
     if performance_grade(res["best_total"]) == "doubt":
         return True
     else:
@@ -251,6 +253,8 @@ def bad_check(res):
     :param res: data_compare函数输出的结果
     :return:
     """
+    if "stat" in res:
+        return res["stat"]["grade"] in ["worse", "doubt", "inconclusive"]
     if performance_grade(res["best_total"]) == "doubt" or performance_grade(res["best_total"]) == "worse":
         return True
     else:
@@ -294,6 +298,17 @@ def performance_grade(res):
     return grade
 
 
+def case_grade(res):
+    """
+    单个case的性能等级, 分布判定有结论时以其为准, 否则按best_total比值评分
+    :param res: data_compare函数输出的结果
+    :return:
+    """
+    if "stat" in res and res["stat"]["grade"] != "inconclusive":
+        return res["stat"]["grade"]
+    return performance_grade(res["best_total"])
+
+
 def ci_level_reveal(compare_res):
     """
     等级分类
@@ -310,8 +325,12 @@ def ci_level_reveal(compare_res):
         tmp = {}
         # grade = performance_grade(res=compare_dict["forward"])
         # tmp[compare_dict["latest_api"]] = compare_dict["forward"]
-        grade = performance_grade(res=compare_dict["best_total"])
-        tmp[compare_dict["latest_api"]] = compare_dict["best_total"]
+        grade = case_grade(res=compare_dict)
+        if "stat" in compare_dict and compare_dict["stat"]["grade"] != "inconclusive":
+            # 展示中位数比值, 与base_compare的符号约定一致
+            tmp[compare_dict["latest_api"]] = base_compare(baseline=1.0, latest=compare_dict["stat"]["ratio"])
+        else:
+            tmp[compare_dict["latest_api"]] = compare_dict["best_total"]
         grade_dict[grade].append(tmp)
 
     return grade_dict
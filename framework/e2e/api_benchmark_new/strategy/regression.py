@@ -0,0 +1,133 @@
+#!/bin/env python3
+# -*- coding: utf-8 -*-
+# @author Zeref996
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+基于样本分布的性能回归判定: 每个case保存耗时分布的分位数sketch, 通过bootstrap得到中位数(以及尾部分位数)比值的置信区间,
+置信区间足以判定时直接给出结论, 无法判定时才需要double check重跑
+"""
+
+import numpy as np
+
+SKETCH_SIZE = 101
+
+
+def quantile_sketch(data_list, k=SKETCH_SIZE):
+    """
+    耗时分布的分位数sketch
+    :param data_list: 多次试验的耗时list
+    :param k: 分位点个数, 等间隔分布在[0, 1]上
+    :return: {"n": 样本数, "q": k个分位数}
+    """
+    q = np.quantile(np.asarray(data_list, dtype="float64"), np.linspace(0, 1, k))
+    return {"n": len(data_list), "q": [float("%.6g" % i) for i in q]}
+
+
+def _sketch_quantile(sketch, p):
+    """由sketch线性插值得到p分位数, p可以为数组"""
+    q = np.asarray(sketch["q"], dtype="float64")
+    return np.interp(p, np.linspace(0, 1, len(q)), q)
+
+
+def bootstrap_quantile_ratio(baseline, latest, p=0.5, n_boot=2000, alpha=0.01, seed=33):
+    """
+    latest/baseline的p分位数比值的bootstrap置信区间
+    n个样本重采样后的p分位数, 其分位位置服从Beta(p(n+1), (1-p)(n+1)), 因此只需sketch即可重采样, 无需原始样本
+    :param baseline: 基线sketch
+    :param latest: 待测sketch
+    :param p: 分位点, 0.5为中位数, 0.9/0.99等用于尾部耗时
+    :param alpha: 置信区间外的概率, 即误报率
+    :return: (ratio, ci_low, ci_high), ratio为分位数比值的点估计
+    """
+    rng = np.random.default_rng(seed)
+    quantiles = []
+    for sketch in (baseline, latest):
+        a = p * (sketch["n"] + 1)
+        b = (1 - p) * (sketch["n"] + 1)
+        quantiles.append(_sketch_quantile(sketch, rng.beta(a, b, size=n_boot)))
+    base_quantile = float(_sketch_quantile(baseline, p))
+    latest_quantile = float(_sketch_quantile(latest, p))
+    if base_quantile <= 0 or np.any(quantiles[0] <= 0):
+        return None
+    ratios = quantiles[1] / quantiles[0]
+    ci_low, ci_high = np.quantile(ratios, [alpha / 2, 1 - alpha / 2])
+    return latest_quantile / base_quantile, float(ci_low), float(ci_high)
+
+
+def bootstrap_median_ratio(baseline, latest, n_boot=2000, alpha=0.01, seed=33):
+    """
+    latest/baseline中位数比值的bootstrap置信区间
+    :return: (ratio, ci_low, ci_high), ratio为中位数比值的点估计
+    """
+    return bootstrap_quantile_ratio(baseline, latest, p=0.5, n_boot=n_boot, alpha=alpha, seed=seed)
+
+
+class RegressionDetector(object):
+    """
+    性能回归判定
+    单次任务内的样本无法反映不同任务之间的环境波动, 因此置信区间两端再按noise放宽
+    """
+
+    def __init__(
+        self, effect=0.15, worse_effect=0.3, alpha=0.01, noise=0.05, n_boot=2000, tail_q=0.9, tail_effect=None
+    ):
+        """
+        :param effect: 可容忍的性能下降比例, 与原doubt阈值(1.15倍)一致
+        :param worse_effect: 判定为worse的性能下降比例, 与原worse阈值(1.3倍)一致
+        :param alpha: 误报率, 即置信区间外的概率
+        :param noise: 不同任务之间的环境噪声比例
+        :param n_boot: bootstrap次数
+        :param tail_q: 尾部耗时分位点
+        :param tail_effect: 可容忍的尾部耗时下降比例, None表示不对尾部耗时做判定
+        """
+        self.effect = effect
+        self.worse_effect = worse_effect
+        self.alpha = alpha
+        self.noise = noise
+        self.n_boot = n_boot
+        self.tail_q = tail_q
+        self.tail_effect = tail_effect
+
+    def detect(self, baseline, latest):
+        """
+        :param baseline: 基线sketch
+        :param latest: 待测sketch
+        :return: {"grade", "ratio", "ci"}或None(sketch不可用), 开启尾部耗时判定时增加"tail": {"q", "ratio", "ci"}
+            grade: worse/doubt表示确认性能下降, equal/better表示确认无性能下降, inconclusive表示需要double check
+            中位数无性能下降但确认尾部耗时下降超过tail_effect时, grade为doubt
+        """
+        res = self._ratio_ci(baseline, latest, p=0.5)
+        if res is None:
+            return None
+        ratio, ci_low, ci_high = res
+        if ci_low > 1 + self.effect:
+            grade = "worse" if ratio >= 1 + self.worse_effect else "doubt"
+        elif ci_high <= 1 + self.effect:
+            grade = "better" if ci_high < 1 / (1 + self.effect) else "equal"
+        else:
+            grade = "inconclusive"
+        stat = {"grade": grade, "ratio": float("%.6g" % ratio), "ci": [float("%.6g" % ci_low), float("%.6g" % ci_high)]}
+
+        if self.tail_effect is not None:
+            tail = self._ratio_ci(baseline, latest, p=self.tail_q)
+            if tail is not None:
+                tail_ratio, tail_low, tail_high = tail
+                stat["tail"] = {
+                    "q": self.tail_q,
+                    "ratio": float("%.6g" % tail_ratio),
+                    "ci": [float("%.6g" % tail_low), float("%.6g" % tail_high)],
+                }
+                if grade in ["equal", "better"] and tail_low > 1 + self.tail_effect:
+                    stat["grade"] = "doubt"
+        return stat
+
+    def _ratio_ci(self, baseline, latest, p):
+        """
+        p分位数比值的置信区间, 两端按noise放宽
+        :return: (ratio, ci_low, ci_high)或None
+        """
+        res = bootstrap_quantile_ratio(baseline, latest, p=p, n_boot=self.n_boot, alpha=self.alpha)
+        if res is None:
+            return None
+        ratio, ci_low, ci_high = res
+        return ratio, ci_low / (1 + self.noise), ci_high * (1 + self.noise)
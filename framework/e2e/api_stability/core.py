@@ -14,6 +14,7 @@ import paddle
 from paddle import to_tensor
 from utils.logger import logger
 from copy import deepcopy
+from stability import StreamingChecker
 
 
 
@@ -34,10 +35,12 @@ class Core(object):
         self.types = None
         self.data = dict()
         self.param = dict()
-        self.forward_res = []
-        self.grad_res = []
         self.inputs = dict()
         self.loops = 1000
+        # 出现第一次不一致后是否停止
+        self.stop_on_mismatch = False
+        self.forward_checker = None
+        self.grad_checker = None
         self.hook()
         paddle.set_default_dtype(dtype)
 
@@ -116,23 +119,35 @@ class Core(object):
 
     def paddle_run(self):
         """
-        计算paddle 总体时间
+        多次执行api, 每轮前向和反向结果与第一轮比较, 只保留第一轮结果
+        :return: 前向和反向的StreamingChecker
         """
+        self.forward_checker = StreamingChecker("前向", stop_on_mismatch=self.stop_on_mismatch)
+        self.grad_checker = StreamingChecker("反向", stop_on_mismatch=self.stop_on_mismatch)
         self.api = eval(self.api)
         if self._layertypes(self.api) == "func":
             for i in range(self.loops):
                 input_param = dict(self.data, **self.param)
                 res = self.api(**input_param)
                 grad = paddle.grad([res], *self.data.values(), retain_graph=False)
-                self.forward_res.append(res.numpy())
-                self.grad_res.append(grad)
+                if self._check(res, grad):
+                    break
         elif self._layertypes(self.api) == "class":
             obj = self.api(**self.param)
             for i in range(self.loops):
                 res = obj(*self.data.values())
                 grad = paddle.grad([res], *self.data.values(), retain_graph=False)
-                self.forward_res.append(res.numpy())
-                self.grad_res.append(grad)
+                if self._check(res, grad):
+                    break
         else:
             raise AttributeError
-        return self.forward_res, self.grad_res
\ No newline at end of file
+        return self.forward_checker, self.grad_checker
+
+    def _check(self, res, grad):
+        """
+        检查单轮结果
+        :return: 是否需要停止
+        """
+        self.forward_checker.update(res.numpy())
+        self.grad_checker.update(grad)
+        return self.forward_checker.stopped or self.grad_checker.stopped
@@ -10,7 +10,6 @@ from utils.yaml_loader import YamlLoader
 from utils.logger import Logger
 from utils.weaktrans import WeakTrans, Framework
 from core import Core
-from stability import check_all_arrays_equal
 
 log = Logger("stability", "channel")
 logger = log.get_log()
@@ -27,14 +26,16 @@ for case_name in cases_name:
     c = Core(api_name, dtype="float32")
     c.set_paddle_param(wk.get_inputs(Framework.PADDLE), wk.get_params(Framework.PADDLE))
     forward, grad = c.paddle_run()
-    if check_all_arrays_equal(forward):
+    if forward.passed:
         logger.info(wk.get_func(Framework.PADDLE) + " 前向值全部相同")
     else:
+        logger.info(forward.report())
         # Todo: 报错api记录
         error_list.append(api_name + "前向稳定性测试失败")
-    if check_all_arrays_equal(grad):
+    if grad.passed:
         logger.info(wk.get_func(Framework.PADDLE) + " 反向值全部相同")
     else:
+        logger.info(grad.report())
         # Todo: 报错api记录
         error_list.append(api_name + "反向稳定性测试失败")
 if len(error_list) == 0:
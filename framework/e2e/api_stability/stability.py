@@ -3,36 +3,160 @@
 # @author DDDivano
 # encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
 
+"""
+稳定性检查
+"""
 
+import hashlib
 import numpy as np
 
+
+def _to_arrays(value):
+    """
+    将单轮结果展开为numpy数组list, 支持Tensor, numpy, dict, list/tuple以及None
+    """
+    if value is None:
+        return [None]
+    if isinstance(value, (np.generic, np.ndarray)):
+        return [np.asarray(value)]
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        res = []
+        for v in value:
+            res.extend(_to_arrays(v))
+        return res
+    if hasattr(value, "numpy"):
+        return [np.asarray(value.numpy())]
+    raise TypeError("返回数据类型不能够进行比较")
+
+
+def _digest(arrays):
+    """
+    按位hash, 包含shape和dtype
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for arr in arrays:
+        if arr is None:
+            h.update(b"None")
+            continue
+        h.update(str((arr.shape, arr.dtype.str)).encode())
+        if arr.size > 0:  # 空数组只比较shape和dtype
+            h.update(_bytes_view(arr).tobytes())
+    return h.digest()
+
+
+def _bytes_view(arr):
+    """
+    每个元素的字节视图, shape为[元素个数, itemsize], 0维数组视为1个元素
+    """
+    arr = np.ascontiguousarray(arr).reshape(-1)
+    return arr.view(np.uint8).reshape(arr.size, arr.dtype.itemsize)
+
+
+class StreamingChecker(object):
+    """
+    流式稳定性检查: 每轮结果与第一轮结果比较, 只保留第一轮结果和有限条不一致记录, 内存不随轮数增长
+    """
+
+    def __init__(self, name="", stop_on_mismatch=False, max_log=10):
+        """
+        :param name: 检查项名称, 用于日志
+        :param stop_on_mismatch: 出现第一次不一致后是否停止
+        :param max_log: 最多保留的不一致记录条数
+        """
+        self.name = name
+        self.stop_on_mismatch = stop_on_mismatch
+        self.max_log = max_log
+        self.reference = None
+        self.reference_digest = None
+        self.count = 0
+        self.mismatch_count = 0
+        self.mismatch_log = []
+
+    @property
+    def passed(self):
+        """
+        是否全部一致
+        """
+        return self.mismatch_count == 0
+
+    @property
+    def stopped(self):
+        """
+        是否需要停止
+        """
+        return self.stop_on_mismatch and self.mismatch_count > 0
+
+    def update(self, value):
+        """
+        检查一轮结果
+        :return: 与第一轮是否按位一致
+        """
+        arrays = _to_arrays(value)
+        digest = _digest(arrays)
+        self.count += 1
+        if self.reference is None:
+            self.reference = [None if arr is None else arr.copy() for arr in arrays]
+            self.reference_digest = digest
+            return True
+        if digest == self.reference_digest:
+            return True
+        self.mismatch_count += 1
+        if len(self.mismatch_log) < self.max_log:
+            self.mismatch_log.append(self._diff(arrays))
+        return False
+
+    def _diff(self, arrays):
+        """
+        hash不一致时逐个数组比较, 记录不一致的位置和最大差值
+        """
+        record = {"iter": self.count - 1, "diff": []}
+        if len(arrays) != len(self.reference):
+            record["diff"].append({"reason": "输出个数不一致: {} vs {}".format(len(self.reference), len(arrays))})
+            return record
+        for i, (ref, arr) in enumerate(zip(self.reference, arrays)):
+            if ref is None or arr is None:
+                if ref is not arr:
+                    record["diff"].append({"index": i, "reason": "输出为None"})
+                continue
+            if ref.shape != arr.shape or ref.dtype != arr.dtype:
+                record["diff"].append(
+                    {
+                        "index": i,
+                        "reason": "shape或dtype不一致: {}{} vs {}{}".format(ref.shape, ref.dtype, arr.shape, arr.dtype),
+                    }
+                )
+                continue
+            if ref.size == 0:  # shape和dtype一致的空数组没有可比较的元素
+                continue
+            # 按位比较, nan与nan视为一致
+            mismatch = (_bytes_view(ref) != _bytes_view(arr)).any(axis=1)
+            if not mismatch.any():
+                continue
+            position = np.unravel_index(int(np.argmax(mismatch)), ref.shape)
+            item = {"index": i, "mismatch_num": int(mismatch.sum()), "first_position": [int(p) for p in position]}
+            if np.issubdtype(ref.dtype, np.number):
+                item["max_abs_diff"] = float(np.nanmax(np.abs(ref.astype("float64") - arr.astype("float64"))))
+            record["diff"].append(item)
+        return record
+
+    def report(self):
+        """
+        检查结果描述
+        """
+        if self.passed:
+            return "{} {}轮结果全部相同".format(self.name, self.count)
+        return "{} {}轮中{}轮与第一轮不一致, 不一致记录: {}".format(self.name, self.count, self.mismatch_count, self.mismatch_log)
+
+
 def check_all_arrays_equal(lst):
-    first_array = lst[0]
-    if isinstance(first_array, (np.generic, np.ndarray)):
-        for arr in lst[1:]:
-            if not np.array_equal(first_array, arr):
-                print(first_array)
-                print(arr)
-                return False
-        return True
-    elif isinstance(first_array, dict):
-        first_array_values = [np.array(x) for x in first_array.values()]
-        for arr in lst[1:]:
-            arr = [np.array(x) for x in arr.values()]
-            if not np.array_equal(first_array_values, arr):
-                # print(first_array_values)
-                # print(arr)
-                return False
-        return True
-    elif isinstance(first_array, list):
-        # grad list
-        first_array_values = [x.numpy() for x in first_array]
-        for arr in lst[1:]:
-            arr = [x.numpy() for x in arr]
-            if not np.array_equal(first_array_values, arr):
-                # print(first_array_values)
-                # print(arr)
-                return False
-        return True
-    else:
-        raise TypeError("返回数据类型不能够进行比较")
\ No newline at end of file
+    """
+    检查list中所有结果是否与第一个相同
+    """
+    checker = StreamingChecker()
+    for arr in lst:
+        if not checker.update(arr):
+            print(checker.mismatch_log[-1])
+            return False
+    return True
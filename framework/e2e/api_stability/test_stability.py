@@ -0,0 +1,76 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+stability test
+"""
+import numpy as np
+from stability import StreamingChecker, check_all_arrays_equal
+
+
+def test_equal():
+    """
+    多轮结果按位一致
+    """
+    x = np.random.rand(3, 4).astype("float32")
+    assert check_all_arrays_equal([x, x.copy(), x.copy()])
+
+
+def test_mismatch():
+    """
+    记录不一致位置
+    """
+    x = np.zeros([2, 3], dtype="float32")
+    y = x.copy()
+    y[1, 2] = 1.0
+    checker = StreamingChecker()
+    checker.update(x)
+    assert not checker.update(y)
+    diff = checker.mismatch_log[0]["diff"][0]
+    assert diff["mismatch_num"] == 1
+    assert diff["first_position"] == [1, 2]
+    assert diff["max_abs_diff"] == 1.0
+
+
+def test_nan():
+    """
+    nan与nan视为一致
+    """
+    x = np.array([np.nan, 1.0])
+    assert check_all_arrays_equal([x, x.copy()])
+
+
+def test_empty():
+    """
+    空数组
+    """
+    x = np.zeros([0, 3], dtype="float32")
+    assert check_all_arrays_equal([x, x.copy()])
+    checker = StreamingChecker()
+    checker.update(x)
+    assert not checker.update(np.zeros([3, 0], dtype="float32"))
+    assert "shape" in checker.mismatch_log[0]["diff"][0]["reason"]
+
+
+def test_zero_dim():
+    """
+    0维数组
+    """
+    checker = StreamingChecker()
+    assert checker.update(np.array(1.5))
+    assert checker.update(np.array(1.5))
+    assert not checker.update(np.array(2.5))
+    diff = checker.mismatch_log[0]["diff"][0]
+    assert diff["first_position"] == []
+    assert diff["max_abs_diff"] == 1.0
+
+
+def test_nested():
+    """
+    dict/list以及None
+    """
+    value = {"a": [np.ones([2]), None], "b": np.zeros([0])}
+    checker = StreamingChecker()
+    checker.update(value)
+    assert checker.update({"a": [np.ones([2]), None], "b": np.zeros([0])})
+    assert not checker.update({"a": [np.ones([2]), np.ones([2])], "b": np.zeros([0])})
@@ -5,10 +5,135 @@
 yaml base
 """
 
+import os
+import hashlib
+import pickle
 import yaml
 
 # from old_design.logger import Logger, logger
 
+# 编译缓存目录, 默认为yaml所在目录下的.yaml_cache
+CACHE_DIR = os.environ.get("E2E_YAML_CACHE_DIR")
+CACHE_VERSION = 1
+
+
+def _cache_prefix(yml):
+    """
+    缓存文件路径前缀, 由yaml绝对路径决定
+    """
+    abs_path = os.path.abspath(yml)
+    cache_dir = CACHE_DIR or os.path.join(os.path.dirname(abs_path), ".yaml_cache")
+    name = os.path.basename(abs_path) + "." + hashlib.md5(abs_path.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(cache_dir, name)
+
+
+def _atomic_dump(path, data):
+    """
+    先写临时文件再替换, 兼容多进程同时编译
+    """
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class CompiledYaml(object):
+    """
+    yaml编译缓存
+    index.pkl保存case名称及其在data.pkl中的偏移, data.pkl为逐case拼接的pickle
+    缓存以yaml路径 + mtime + size为key, yaml变化后自动重新编译
+    """
+
+    def __init__(self, yml):
+        """initialize"""
+        self.source = yml
+        prefix = _cache_prefix(yml)
+        self.index_file = prefix + ".index.pkl"
+        self.data_file = prefix + ".data.pkl"
+        stat = os.stat(yml)
+        self.stamp = (CACHE_VERSION, stat.st_mtime, stat.st_size)
+        self.index = self._load_index()
+        # doc为完整文档, 非dict(空文件, list等)时不写缓存, 与yaml.load的结果一致
+        self.doc = None
+        self.loaded = False
+        if self.index is None:
+            self.doc = self._compile()
+            self.loaded = True
+
+    def _load_index(self):
+        """
+        读取缓存索引, 缓存失效返回None
+        """
+        try:
+            with open(self.index_file, "rb") as f:
+                index = pickle.load(f)
+        except Exception:
+            return None
+        if index.get("stamp") != self.stamp or not os.path.exists(self.data_file):
+            return None
+        return index
+
+    def _compile(self):
+        """
+        解析yaml并写入缓存, 缓存目录不可写时仅返回解析结果
+        """
+        with open(self.source, encoding="utf-8") as f:
+            doc = yaml.load(f, Loader=yaml.FullLoader)
+        if not isinstance(doc, dict):
+            return doc
+        offsets = {}
+        chunks = []
+        pos = 0
+        for key, value in doc.items():
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            offsets[key] = (pos, len(blob))
+            chunks.append(blob)
+            pos += len(blob)
+        index = {"stamp": self.stamp, "keys": list(doc.keys()), "offsets": offsets}
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            _atomic_dump(self.data_file, b"".join(chunks))
+            _atomic_dump(self.index_file, pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+            self.index = index
+        except OSError:
+            pass
+        return doc
+
+    def keys(self):
+        """
+        全部case名称, 与dict.keys()保持一致
+        """
+        if self.loaded:
+            return self.doc.keys()
+        return dict.fromkeys(self.index["keys"]).keys()
+
+    def get(self, case_name):
+        """
+        只反序列化单个case
+        """
+        if self.loaded:
+            return self.doc.get(case_name)
+        offset = self.index["offsets"].get(case_name)
+        if offset is None:
+            return None
+        with open(self.data_file, "rb") as f:
+            f.seek(offset[0])
+            return pickle.loads(f.read(offset[1]))
+
+    def load(self):
+        """
+        完整文档
+        """
+        if not self.loaded:
+            with open(self.data_file, "rb") as f:
+                data = f.read()
+            self.doc = {}
+            for key in self.index["keys"]:
+                pos, length = self.index["offsets"][key]
+                self.doc[key] = pickle.loads(data[pos : pos + length])
+            self.loaded = True
+        return self.doc
+
 
 class YamlLoader(object):
     """
@@ -17,13 +142,20 @@ class YamlLoader(object):
 
     def __init__(self, yml):
         """initialize"""
+        self.compiled = None
         try:
-            with open(yml, encoding="utf-8") as f:
-                self.yml = yaml.load(f, Loader=yaml.FullLoader)
+            self.compiled = CompiledYaml(yml)
         except Exception as e:
             print(e)
         # self.logger = logger
 
+    @property
+    def yml(self):
+        """完整yaml内容, 首次访问时才加载"""
+        if self.compiled is None:
+            return None
+        return self.compiled.load()
+
     def __str__(self):
         """str"""
         return str(self.yml)
@@ -33,11 +165,11 @@ class YamlLoader(object):
         get case info
         """
         # self.logger.get_log().info("get ->{}<- case profile".format(case_name))
-        return {"info": self.yml.get(case_name), "name": case_name}
+        return {"info": self.compiled.get(case_name), "name": case_name}
 
     def get_all_case_name(self):
         """
         get all case name
         """
         # 获取全部case name
-        return self.yml.keys()
+        return self.compiled.keys()
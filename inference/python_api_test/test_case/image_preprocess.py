@@ -153,6 +153,38 @@ def normalize(num):
         return num
 
 
+def normalize_array(array):
+    """
+    vectorized normalize, same result as np.vectorize(normalize)
+    Args:
+        array(numpy array): input array
+    Returns:
+        array(numpy array): return array
+    """
+    array = np.asarray(array)
+    abs_value = np.abs(array)
+    assert not np.any(np.isinf(abs_value)), "cannot normalize inf value"
+    mask = abs_value > 10
+    if not np.any(mask):
+        return array.copy()
+    # integer digits of abs value, equal to len(str(int(abs_value)))
+    int_part = np.floor(abs_value[mask].astype(np.float64))
+    length = np.floor(np.log10(int_part)) + 1
+    length[10.0**length <= int_part] += 1
+    length[10.0 ** (length - 1) > int_part] -= 1
+    scale = 10.0 ** np.where(length >= 3, length - 2, length - 1)
+    if np.issubdtype(array.dtype, np.floating):
+        res = array.copy()
+        res[mask] = array[mask] / scale.astype(array.dtype)
+        return res
+    res = array.astype(np.float64)
+    res[mask] = array[mask] / scale
+    if abs(array.flat[0]) <= 10:
+        # np.vectorize takes the output dtype from the first element, keep that behavior
+        res = res.astype(array.dtype)
+    return res
+
+
 def sig_fig_compare(array1, array2, delta=5, det_top_bbox=False, need_sort=False, det_top_bbox_threshold=0.75):
     """
     compare significant figure
@@ -179,20 +211,45 @@ def sig_fig_compare(array1, array2, delta=5, det_top_bbox=False, need_sort=False
             # 部分检测模型输出检测框数量，在trt fp16下可能与关闭优化的检测框数量不同，跳过，只关注高置信度检测框
             return
     if np.any(abs(array2) > 100):
-        normalize_func = np.vectorize(normalize)
-        array1_normal = normalize_func(array1)
-        array2_normal = normalize_func(array2)
+        array1_normal = normalize_array(array1)
+        array2_normal = normalize_array(array2)
     else:
         array1_normal = array1
         array2_normal = array2
     diff = np.abs(array1_normal - array2_normal)
-    diff_count = np.sum(diff > delta)
+    diff_mask = diff > delta
+    diff_count = np.sum(diff_mask)
     print(f"total: {np.size(diff)} diff count:{diff_count} max:{np.max(diff)} delta:{delta}")
     print("output max: ", np.max(abs(array1)), "output min: ", np.min(abs(array1)))
-    print("output value debug: ", array1)
-    print("output diff array: ", array1[diff > delta])
-    print("truth diff array:  ", array2[diff > delta])
+    if diff_count > 0:
+        print(mismatch_report(array1, array2, diff, diff_mask))
     assert diff_count == 0, f"total: {np.size(diff)} diff count:{diff_count} max:{np.max(diff)} delta:{delta}"
     # end = time.time()
     # print(f"精度校验cost：{(end - start) * 1000}ms")
     return diff
+
+
+def mismatch_report(array1, array2, diff, diff_mask, top_k=10):
+    """
+    bounded mismatch report, only the first top_k offending elements are listed
+    Args:
+        array1(numpy array): output array
+        array2(numpy array): truth array
+        diff(numpy array): abs diff after normalize
+        diff_mask(numpy array): offending elements mask
+    Returns:
+        report(str): mismatch report
+    """
+    abs_diff = np.abs(np.asarray(array1, dtype=np.float64) - np.asarray(array2, dtype=np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel_diff = abs_diff / np.abs(np.asarray(array2, dtype=np.float64))
+    offending = np.argwhere(diff_mask)[:top_k]
+    lines = [
+        f"mismatch count: {np.sum(diff_mask)}, "
+        f"max abs diff: {np.nanmax(abs_diff[diff_mask])}, max rel diff: {np.nanmax(rel_diff[diff_mask])}",
+        f"first {len(offending)} offending elements (index: output / truth / diff):",
+    ]
+    for index in offending:
+        index = tuple(index)
+        lines.append(f"  {index}: {array1[index]} / {array2[index]} / {diff[index]}")
+    return "\n".join(lines)
@@ -25,6 +25,7 @@ from paddle.inference import convert_to_mixed_precision
 from pynvml.smi import nvidia_smi
 from .image_preprocess import read_images_path, get_images_npy, read_npy_path, preprocess, sig_fig_compare
 from .text_preprocess import ernie_data as text_pre
+from .truth_cache import TruthCache, cache_enabled
 
 _gpu_mem_lists = []
 
@@ -43,6 +44,7 @@ class InferenceTest(object):
         __init__
         """
         self.errors = queue.Queue()
+        self.model_files = []
 
     def load_config(self, **kwargs):
         """
@@ -61,15 +63,22 @@ class InferenceTest(object):
         if model_path:
             assert os.path.exists(model_path)
             self.pd_config = paddle_infer.Config(model_path)
+            self.model_files = [
+                os.path.join(model_path, name)
+                for name in os.listdir(model_path)
+                if os.path.isfile(os.path.join(model_path, name))
+            ]
         elif model_file:
             assert os.path.exists(params_file)
             self.pd_config = paddle_infer.Config(model_file, params_file)
+            self.model_files = [model_file, params_file]
         else:
             raise Exception(f"model file path is not exist, [{model_path}] or [{model_file}] invalid!")
 
     def get_truth_val(self, input_data_dict: dict, device: str, gpu_mem=1000) -> dict:
         """
-        get truth value calculated by target device kernel
+        get truth value calculated by target device kernel,
+        results are cached by model files + input data + device, set INFER_TRUTH_CACHE=0 to disable
         Args:
             input_data_dict(dict): input data constructed as dictionary
         Returns:
@@ -83,6 +92,23 @@ class InferenceTest(object):
         else:
             raise Exception(f"{device} not support in current test codes")
         self.pd_config.switch_ir_optim(False)
+
+        truth_cache = None
+        if cache_enabled() and self.model_files:
+            truth_cache = TruthCache()
+            cache_key = truth_cache.make_key(
+                self.model_files,
+                input_data_dict,
+                device=device,
+                paddle_version=paddle.version.full_version,
+                paddle_commit=paddle.version.commit,
+                cuda_visible_devices=os.environ.get("CUDA_VISIBLE_DEVICES") if device == "gpu" else None,
+            )
+            output_data_dict = truth_cache.load(cache_key)
+            if output_data_dict is not None:
+                logger.info("load truth value from cache: %s", cache_key)
+                return output_data_dict
+
         predictor = paddle_infer.create_predictor(self.pd_config)
 
         input_names = predictor.get_input_names()
@@ -98,6 +124,8 @@ class InferenceTest(object):
             output_handle = predictor.get_output_handle(output_data_name)
             output_data = output_handle.copy_to_cpu()
             output_data_dict[output_data_name] = output_data
+        if truth_cache is not None:
+            truth_cache.save(cache_key, output_data_dict)
         return output_data_dict
 
     def collect_shape_info(self, model_path: str, input_data_dict: dict, device: str = "gpu") -> None:
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+truth value cache, outputs of get_truth_val are stored as npy files
+keyed by hash of model files + input data + device + paddle build
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+CACHE_VERSION = 1
+
+
+def cache_enabled():
+    """
+    truth cache switch, set INFER_TRUTH_CACHE=0 to disable
+    """
+    return os.environ.get("INFER_TRUTH_CACHE", "1") not in ("0", "False", "false")
+
+
+def cache_dir():
+    """
+    truth cache dir, shared by all test suites and runs
+    """
+    return os.environ.get(
+        "INFER_TRUTH_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "paddle_infer_truth")
+    )
+
+
+class TruthCache(object):
+    """
+    content-addressed truth value cache
+    """
+
+    def __init__(self, root=None):
+        """
+        __init__
+        """
+        self.root = root or cache_dir()
+        self.stamp_file = os.path.join(self.root, "model_hash.json")
+        self._stamps = None
+
+    def _load_stamps(self):
+        """
+        model file hash memo, {abs_path: [mtime, size, md5]}
+        """
+        if self._stamps is None:
+            try:
+                with open(self.stamp_file, "r") as f:
+                    self._stamps = json.load(f)
+            except (OSError, ValueError):
+                self._stamps = {}
+        return self._stamps
+
+    def _save_stamps(self):
+        """
+        save model file hash memo
+        """
+        tmp_file = f"{self.stamp_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(tmp_file, "w") as f:
+                json.dump(self._stamps, f)
+            os.replace(tmp_file, self.stamp_file)
+        except OSError:
+            pass
+
+    def file_hash(self, file_path):
+        """
+        md5 of model file, recomputed only when mtime or size changed
+        Args:
+            file_path(str): model file path
+        Returns:
+            md5(str): file md5
+        """
+        abs_path = os.path.abspath(file_path)
+        stat = os.stat(abs_path)
+        stamps = self._load_stamps()
+        stamp = stamps.get(abs_path)
+        if stamp is not None and stamp[0] == stat.st_mtime and stamp[1] == stat.st_size:
+            return stamp[2]
+        md5 = hashlib.md5()
+        with open(abs_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                md5.update(chunk)
+        stamps[abs_path] = [stat.st_mtime, stat.st_size, md5.hexdigest()]
+        self._save_stamps()
+        return md5.hexdigest()
+
+    def make_key(self, model_files: list, input_data_dict: dict, **config) -> str:
+        """
+        cache key
+        Args:
+            model_files(list): model files, all files under model dir for uncombined model
+            input_data_dict(dict): input data constructed as dictionary
+            config(dict): other settings that affect truth value, such as device and paddle version
+        Returns:
+            key(str): sha256 hex digest
+        """
+        sha = hashlib.sha256()
+        sha.update(f"version:{CACHE_VERSION}".encode("utf-8"))
+        for file_path in sorted(model_files):
+            sha.update(f"model:{os.path.basename(file_path)}:{self.file_hash(file_path)}".encode("utf-8"))
+        for name in sorted(input_data_dict):
+            data = np.ascontiguousarray(input_data_dict[name])
+            sha.update(f"input:{name}:{data.dtype.str}:{data.shape}".encode("utf-8"))
+            sha.update(data.tobytes())
+        sha.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+        return sha.hexdigest()
+
+    def load(self, key: str):
+        """
+        load truth value, arrays are memory-mapped copy-on-write
+        Args:
+            key(str): cache key
+        Returns:
+            output_data_dict(dict): None if not cached
+        """
+        entry_dir = os.path.join(self.root, key)
+        try:
+            with open(os.path.join(entry_dir, "outputs.json"), "r") as f:
+                output_names = json.load(f)
+            return {
+                name: np.load(os.path.join(entry_dir, f"{i}.npy"), mmap_mode="c") for i, name in enumerate(output_names)
+            }
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key: str, output_data_dict: dict) -> None:
+        """
+        save truth value, written to a temp dir then renamed, safe for parallel runs
+        Args:
+            key(str): cache key
+            output_data_dict(dict): truth value, output order is kept
+        Returns:
+            None
+        """
+        entry_dir = os.path.join(self.root, key)
+        if os.path.exists(entry_dir):
+            return
+        tmp_dir = None
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(prefix=f".{key}.", dir=self.root)
+            for i, output_data in enumerate(output_data_dict.values()):
+                np.save(os.path.join(tmp_dir, f"{i}.npy"), output_data)
+            with open(os.path.join(tmp_dir, "outputs.json"), "w") as f:
+                json.dump(list(output_data_dict.keys()), f)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # another process already saved the same key, or cache dir is not writable
+            if tmp_dir is not None:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
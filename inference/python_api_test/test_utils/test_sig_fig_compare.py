@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# encoding=utf-8 vi:ts=4:sw=4:expandtab:ft=python
+"""
+test vectorized sig_fig_compare, results must be the same as the legacy implementation
+"""
+
+import os
+import importlib.util
+
+import pytest
+import numpy as np
+
+# load image_preprocess directly, test_case/__init__.py imports paddle
+_spec = importlib.util.spec_from_file_location(
+    "image_preprocess",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_case", "image_preprocess.py"),
+)
+image_preprocess = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(image_preprocess)
+
+
+def legacy_sig_fig_compare(array1, array2, delta=5):
+    """
+    legacy implementation, element-wise normalize by np.vectorize
+    """
+    if np.any(abs(array2) > 100):
+        normalize_func = np.vectorize(image_preprocess.normalize)
+        array1_normal = normalize_func(array1)
+        array2_normal = normalize_func(array2)
+    else:
+        array1_normal = array1
+        array2_normal = array2
+    diff = np.abs(array1_normal - array2_normal)
+    diff_count = np.sum(diff > delta)
+    assert diff_count == 0, f"total: {np.size(diff)} diff count:{diff_count} max:{np.max(diff)} delta:{delta}"
+    return diff
+
+
+def run_compare(func, array1, array2, delta):
+    """
+    return (passed, diff)
+    """
+    try:
+        return True, func(array1, array2, delta)
+    except AssertionError:
+        return False, None
+    except OverflowError:  # legacy normalize raises OverflowError on inf
+        return False, None
+
+
+def random_array(rng, shape, dtype):
+    """
+    random array mixing zeros, negatives, small and large magnitudes
+    """
+    scale = 10.0 ** rng.integers(-3, 8, size=shape)
+    array = rng.standard_normal(shape) * scale
+    array[rng.random(shape) < 0.05] = 0
+    # boundary values of normalize
+    mask = rng.random(shape) < 0.1
+    array[mask] = rng.choice([10, -10, 10.5, 99.9999, 100, -1000, 1e6], size=np.sum(mask))
+    return array.astype(dtype)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64, np.int64])
+@pytest.mark.parametrize("seed", range(20))
+def test_normalize_array(seed, dtype):
+    """
+    normalize_array is the same as np.vectorize(normalize)
+    """
+    rng = np.random.default_rng(seed)
+    array = random_array(rng, (7, 13), dtype)
+    expect = np.vectorize(image_preprocess.normalize)(array)
+    result = image_preprocess.normalize_array(array)
+    assert result.dtype == expect.dtype
+    np.testing.assert_array_equal(result, expect)
+
+
+@pytest.mark.parametrize("delta", [1e-5, 1e-3, 0.1, 5])
+@pytest.mark.parametrize("seed", range(20))
+def test_sig_fig_compare(seed, delta):
+    """
+    pass/fail and diff are the same as the legacy implementation
+    """
+    rng = np.random.default_rng(seed)
+    array2 = random_array(rng, (3, 50), np.float32)
+    noise = rng.standard_normal(array2.shape) * rng.choice([0, 1e-6, 1e-2, 1])
+    array1 = (array2 * (1 + noise)).astype(np.float32)
+    if seed % 4 == 1:
+        array1[0, rng.integers(50)] = np.nan
+    expect_pass, expect_diff = run_compare(legacy_sig_fig_compare, array1, array2, delta)
+    result_pass, result_diff = run_compare(image_preprocess.sig_fig_compare, array1, array2, delta)
+    assert result_pass == expect_pass
+    if expect_pass:
+        np.testing.assert_array_equal(result_diff, expect_diff)
+
+
+@pytest.mark.parametrize("position", [0, 5])
+def test_sig_fig_compare_inf(position):
+    """
+    inf in normalize path fails as before
+    """
+    array2 = np.full((10,), 1000.0, dtype=np.float32)
+    array1 = array2.copy()
+    array1[position] = np.inf
+    assert not run_compare(legacy_sig_fig_compare, array1, array2, 5)[0]
+    assert not run_compare(image_preprocess.sig_fig_compare, array1, array2, 5)[0]
+
+
+def test_sig_fig_compare_all_nan():
+    """
+    all nan output fails
+    """
+    array1 = np.full((4, 4), np.nan, dtype=np.float32)
+    array2 = np.ones((4, 4), dtype=np.float32)
+    with pytest.raises(AssertionError):
+        image_preprocess.sig_fig_compare(array1, array2)
+
+
+def test_mismatch_report_bounded():
+    """
+    report only lists the first offending elements
+    """
+    array2 = np.zeros((100, 100), dtype=np.float32)
+    array1 = array2 + 1
+    with pytest.raises(AssertionError):
+        image_preprocess.sig_fig_compare(array1, array2, delta=0.5)
+    report = image_preprocess.mismatch_report(array1, array2, np.abs(array1 - array2), array1 > 0.5)
+    assert "mismatch count: 10000" in report
+    assert len(report.splitlines()) == 12
@@ -8,53 +8,36 @@ import json
 import logging
 import numpy as np
 
+try:
+    from .log_parser import parse_kpis, regex_extractor, prediction_extractor
+except ImportError:
+    # 直接执行本文件调试时, 从models_restruct/common中加载; CE部署后log_parser.py已拷贝到tools目录下
+    import os
+    import sys
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+    from log_parser import parse_kpis, regex_extractor, prediction_extractor
+
 logger = logging.getLogger("ce")
 
 
+def make_extractor(kpi_name):
+    """
+    kpi对应的extractor, 预测结果类kpi使用自定义extractor, 其余按数值正则解析
+    """
+    if kpi_name == "class_ids":
+        return prediction_extractor(nan_replace=("nan", "'nan'"))
+    # 只要有值就行，部分模型可能因为学习率的问题导致后几轮的loss为nan, 不在保存-1
+    return regex_extractor(kpi_name)
+
+
 def paddlelas_imagenet_parse(log_content, kpi_name):
     """
     从log中解析出想要的kpi
     """
     # logger.info("###log_content: {}".format(log_content))
     # logger.info("###kpi_name: {}".format(kpi_name))
-    kpi_value_all = []
-    f = open(log_content, encoding="utf-8", errors="ignore")
-    for line in f.readlines():
-        if kpi_name == "class_ids":
-            if "class_ids" in line and ": [" in line:
-                # 增加对nan的处理
-                line = line.replace("nan", "'nan'")
-                if line.count("class_ids") > 1:  # 存在多个标签时
-                    kpi_value_all.append(
-                        ast.literal_eval(line.replace("[{", "{").replace("}]", "}").strip())[0]["class_ids"]
-                    )
-                else:
-                    kpi_value_all.append(
-                        ast.literal_eval(line.replace("[{", "{").replace("}]", "}").strip())["class_ids"]
-                    )
-            elif "bbox" in line and ": [" in line:
-                if line.count("bbox") > 1:
-                    kpi_value_all.append(
-                        ast.literal_eval(line.replace("[{", "{").replace("}]", "}").strip())[0]["bbox"]
-                    )
-                else:
-                    kpi_value_all.append(ast.literal_eval(line.replace("[{", "{").replace("}]", "}").strip())["bbox"])
-            elif "class id(s)" in line and ": [" in line:
-                line = line[line.rfind("class id(s): ") : line.rfind(", score(s):")]
-                kpi_value_all.append(line[line.rfind("[") :])
-            elif "attributes" in line and ": [" in line:
-                line = line[line.rfind("'output': ") : line.rfind("}")]
-                kpi_value_all.append(line[line.rfind("[") :])
-        else:
-            if kpi_name + ":" in line:
-                regexp = r"%s:(\s*\d+(?:\.\d+)?)" % kpi_name
-                # 如果解析不到符合格式到指标，默认值设置为-1
-                r = re.findall(regexp, line)
-                # kpi_value = float(r[0].strip()) if len(r) > 0 else -1
-                # kpi_value_all.append(kpi_value)
-                if len(re.findall(regexp, line)) > 0:  # 只要有值就行，部分模型可能因为学习率的问题导致后几轮的loss为nan, 不在保存-1
-                    kpi_value_all.append(float(r[0].strip()))
-    f.close()
+    kpi_value_all = parse_kpis(log_content, [kpi_name], make_extractor)[kpi_name]
 
     # logger.info("###kpi_value_all: {}".format(kpi_value_all))
     # if "-1" in kpi_value_all or kpi_value_all == []: #前几轮是正常后面loss出nan的情况暂时不考虑，后续变化能直接感知
@@ -8,45 +8,46 @@ import json
 import logging
 import numpy as np
 import sys
+
+try:
+    from .log_parser import parse_kpis, regex_extractor
+except ImportError:
+    # 直接执行本文件调试时, 从models_restruct/common中加载; CE部署后log_parser.py已拷贝到tools目录下
+    import os
+    import sys
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+    from log_parser import parse_kpis, regex_extractor
+
 logger = logging.getLogger("ce")
 
 
+def make_extractor(kpi_name):
+    """
+    kpi对应的extractor, kpi_name格式为 阶段标识|kpi名称, 例如 [Train]|loss
+    """
+    stage, kpi_name = kpi_name.split("|", 1)
+    # 修改正则表达式以支持带有"."的KPI名称
+    return regex_extractor(kpi_name, value_regexp=r"\s*([0-9.]+)", require=stage, escape=True)
+
+
 def paddlelas_imagenet_parse(log_content, kpi_name):
-    # 定义一个空列表来存储提取到的KPI值
-    kpi_value_all = []
-
-    # 打开日志文件
-    with open(log_content, 'r') as f:
-        # 逐行读取日志内容
-        for line in f.readlines():
-            # 使用正则表达式匹配KPI名称和对应的数值，将提取到的数值添加到kpi_value_all中
-            if kpi_name + ":" in line and "[Train]" in line:
-                regexp = r"%s:\s*([0-9.]+)" % re.escape(kpi_name)  # 修改正则表达式以支持带有"."的KPI名称
-                r = re.findall(regexp, line)
-                if len(r) > 0:
-                    kpi_value_all.append(float(r[0].strip()))
-    
+    """
+    从log中解析出想要的kpi, 训练阶段和eval阶段的指标在同一次读取中解析
+    """
+    train_kpi = "[Train]|" + kpi_name
+    eval_kpi = "[Eval]|" + kpi_name
+    kpi_value_all = parse_kpis(log_content, [train_kpi, eval_kpi], make_extractor)
     # 如果没有提取到任何KPI值，则提取eval阶段的指标
-    if len(kpi_value_all) == 0:
-        # 打开日志文件
-        with open(log_content, 'r') as f:
-            # 逐行读取日志内容
-            for line in f.readlines():
-                # 使用正则表达式匹配KPI名称和对应的数值，将提取到的数值添加到kpi_value_all中
-                if kpi_name + ":" in line and "[Eval]" in line:
-                    regexp = r"%s:\s*([0-9.]+)" % re.escape(kpi_name)  # 修改正则表达式以支持带有"."的KPI名称
-                    r = re.findall(regexp, line)
-                    if len(r) > 0:
-                        kpi_value_all.append(float(r[0].strip()))
-    if len(kpi_value_all) == 0:
+    kpi_value_list = kpi_value_all[train_kpi] or kpi_value_all[eval_kpi]
+    if len(kpi_value_list) == 0:
         kpi_value = sys.maxsize
-    else:    
-        kpi_value = kpi_value_all[-1]
+    else:
+        kpi_value = kpi_value_list[-1]
 
     # 返回最终的KPI值
     return kpi_value
 
-
 if __name__ == "__main__":
     log_content = "/ssd2/sjx/sjx_cuda11.8_py310/PaddleScience_test/PaddleScience/test_0618.log"
     kpi_name = "loss"
@@ -8,29 +8,52 @@ import json
 import logging
 import numpy as np
 
+try:
+    from .log_parser import parse_kpis
+except ImportError:
+    # 直接执行本文件调试时, 从models_restruct/common中加载; CE部署后log_parser.py已拷贝到tools目录下
+    import os
+    import sys
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+    from log_parser import parse_kpis
+
 logger = logging.getLogger("ce")
 
 
+def make_extractor(kpi_name):
+    """
+    解析 PTQ with mse/mse_channel_wise: ... = top1/top5 行
+    """
+
+    def extractor(line):
+        """解析单行"""
+        if "PTQ with mse/mse_channel_wise:" not in line:
+            return None
+        values = line.split("=")[-1]
+        values = values.strip()
+        values = values.split("/")
+        if kpi_name + "/" in line:
+            return values[0].strip("%")
+        elif "/" + kpi_name + " =" in line:
+            return values[1].strip("%")
+        return None
+
+    return extractor
+
+
 def paddleslim_quat_ptq_parse(log_content, kpi_name):
     """
     从log中解析出想要的kpi
     """
-    f = open(log_content, encoding="utf-8", errors="ignore")
-    for line in f.readlines():
-        if "PTQ with mse/mse_channel_wise:" in line:
-            try:
-                values = line.split("=")[-1]
-                values = values.strip()
-                values = values.split("/")
-                if kpi_name + "/" in line:
-                    kpi_value = values[0].strip("%")
-                elif "/" + kpi_name + " =" in line:
-                    kpi_value = values[1].strip("%")
-            except:
-                return -1
-    f.close()
-
-    return kpi_value
+    try:
+        kpi_value_all = parse_kpis(log_content, [kpi_name], make_extractor)[kpi_name]
+    except Exception:
+        return -1
+    if len(kpi_value_all) == 0:
+        return -1
+
+    return kpi_value_all[-1]
 
 
 if __name__ == "__main__":
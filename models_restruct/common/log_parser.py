@@ -0,0 +1,132 @@
+"""
+公共日志解析: 单次流式读取log, 一次性解析出传入的全部kpi
+各repo的tools/parse_log.py提供make_extractor, 部署时models_env脚本将本文件拷贝到repo的tools目录下
+"""
+# encoding: utf-8
+import re
+import ast
+
+NUMBER_REGEXP = r"(\s*\d+(?:\.\d+)?)"
+
+
+def regex_extractor(kpi_name, value_regexp=NUMBER_REGEXP, require=None, escape=False):
+    """
+    生成按正则解析数值kpi的extractor
+    :param kpi_name: kpi名称, 行内需包含 kpi_name + ":"
+    :param value_regexp: 数值部分的正则, 需包含一个分组
+    :param require: 行内必须包含的字符串, 例如"[Train]"
+    :param escape: kpi名称是否按字面量转义
+    :return: extractor(line) -> float or None
+    """
+    key = kpi_name + ":"
+    pattern = re.compile((re.escape(kpi_name) if escape else kpi_name) + ":" + value_regexp)
+
+    def extractor(line):
+        """解析单行"""
+        if key not in line or (require is not None and require not in line):
+            return None
+        r = pattern.search(line)
+        if r is None:
+            return None
+        return float(r.group(1).strip())
+
+    return extractor
+
+
+def prediction_extractor(nan_replace=("nan ", "'nan '"), strip_prefix=None):
+    """
+    生成解析预测结果(class_ids, bbox, class id(s), attributes)的extractor
+    :param nan_replace: 对nan的替换, 保证ast.literal_eval可以解析
+    :param strip_prefix: 行内存在该前缀时只保留其后的内容, 例如"INFO: "
+    :return: extractor(line) -> value or None
+    """
+
+    def literal(line, name):
+        """解析单个或多个标签的预测结果"""
+        value = ast.literal_eval(line.replace("[{", "{").replace("}]", "}").strip())
+        if line.count(name) > 1:  # 存在多个标签时
+            return value[0][name]
+        return value[name]
+
+    def extractor(line):
+        """解析单行"""
+        if ": [" not in line:
+            return None
+        if "class_ids" in line:
+            # 增加对nan的处理
+            line = line.replace(*nan_replace)
+            if strip_prefix is not None and strip_prefix in line:
+                line = line.split(strip_prefix, 1)[1]
+            return literal(line, "class_ids")
+        elif "bbox" in line:
+            return literal(line, "bbox")
+        elif "class id(s)" in line:
+            line = line[line.rfind("class id(s): ") : line.rfind(", score(s):")]
+            return line[line.rfind("[") :]
+        elif "attributes" in line:
+            line = line[line.rfind("'output': ") : line.rfind("}")]
+            return line[line.rfind("[") :]
+        return None
+
+    return extractor
+
+
+class KpiLogParser(object):
+    """
+    单次流式解析log
+    每个kpi对应一个extractor(line) -> value or None, 返回None表示该行不包含此kpi
+    各repo可以在parse_log.py中注册自定义extractor
+    """
+
+    def __init__(self, extractors, keep_last=False):
+        """
+        :param extractors: dict, {kpi_name: extractor}
+        :param keep_last: 只保留每个kpi最后一个值, 内存占用与log大小无关
+        """
+        self.extractors = list(extractors.items())
+        self.keep_last = keep_last
+
+    def parse(self, log_content):
+        """
+        :param log_content: log文件路径
+        :return: (kpi_value_all, errors)
+            kpi_value_all: dict, {kpi_name: [values]}, keep_last时只保留最后一个值
+            errors: dict, {kpi_name: exception}, extractor抛出异常后不再解析该kpi, 不影响其他kpi
+        """
+        kpi_value_all = {name: [] for name, _ in self.extractors}
+        errors = {}
+        extractors = list(self.extractors)
+        with open(log_content, encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                for name, extractor in extractors:
+                    try:
+                        value = extractor(line)
+                    except Exception as e:
+                        errors[name] = e
+                        continue
+                    if value is None:
+                        continue
+                    if self.keep_last:
+                        kpi_value_all[name] = [value]
+                    else:
+                        kpi_value_all[name].append(value)
+                if errors:
+                    extractors = [item for item in extractors if item[0] not in errors]
+        return kpi_value_all, errors
+
+
+def parse_kpis(log_content, kpi_names, make_extractor, keep_last=True):
+    """
+    一次读取log解析出kpi_names中的全部kpi
+    :param log_content: log文件路径
+    :param kpi_names: 需要的kpi名称list
+    :param make_extractor: kpi_name -> extractor, 由各repo的parse_log.py提供
+    :param keep_last: 只保留每个kpi最后一个值
+    :return: dict, {kpi_name: [values]}, 某个kpi解析出错时抛出对应异常
+    """
+    extractors = {kpi_name: make_extractor(kpi_name) for kpi_name in kpi_names}
+    kpi_value_all, errors = KpiLogParser(extractors, keep_last=keep_last).parse(log_content)
+    for kpi_name in kpi_names:
+        if kpi_name in errors:
+            raise errors[kpi_name]
+    return kpi_value_all
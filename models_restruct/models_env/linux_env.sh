@@ -335,6 +335,10 @@ else
   echo "PaddleX is False"
   cp -r ./task/${models_name}/${reponame}/.  ./${CE_version_name}/
 fi
+#公共日志解析模块拷贝到repo的tools目录下, 供tools/parse_log.py使用
+if [[ -d ./${CE_version_name}/tools ]];then
+  cp ./task/${models_name}/common/log_parser.py ./${CE_version_name}/tools/
+fi
 
 ls ./${CE_version_name}/
 cd ./${CE_version_name}/
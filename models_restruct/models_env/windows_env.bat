@@ -315,6 +315,10 @@ chdir
 dir
 rem copy file
 xcopy  .\task\%models_name%\%reponame%\. .\%CE_version_name%\ /s /e
+rem copy common log parser to repo tools
+if exist .\%CE_version_name%\tools (
+    copy /y .\task\%models_name%\common\log_parser.py .\%CE_version_name%\tools\
+)
 cd .\%CE_version_name%\
 dir
 